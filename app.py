@@ -29,7 +29,7 @@ def create_app():
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
             "allow_headers": ["Content-Type", "Authorization", "X-Requested-With"],
             "supports_credentials": True,
-            "expose_headers": ["Content-Type", "Authorization"],
+            "expose_headers": ["Content-Type", "Authorization", "Server-Timing", "ETag"],
             "max_age": 3600
         }
     })
@@ -44,6 +44,31 @@ def create_app():
 
     jwt = JWTManager(app)
 
+    # request.remote_addr = IP que agregó el proxy de confianza (no la primera de X-Forwarded-For)
+    if Config.PROXY_SALTOS:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.PROXY_SALTOS)
+
+    # JSON de respuestas con orjson y soporte para columnas TIME (timedelta) y DECIMAL
+    from utils.serializacion import init_app as init_json
+    init_json(app)
+
+    # Latencia y consultas SQL por endpoint (/api/metrics y header Server-Timing)
+    from utils.metrics import init_app as init_metrics
+    init_metrics(app)
+
+    # Conexión MySQL por request, devuelta al pool al terminar
+    from utils.db import init_app as init_db
+    init_db(app)
+
+    # Comando CLI para poblar el CECO resuelto por actividad
+    from utils.ceco import init_app as init_ceco
+    init_ceco(app)
+
+    # Comando CLI para reconstruir las horas por colaborador y día
+    from utils.colaborador_dia import init_app as init_colaborador_dia
+    init_colaborador_dia(app)
+
     # Registrar los blueprints
     from blueprints.usuarios import usuarios_bp
     from blueprints.actividades import actividades_bp
@@ -67,6 +92,7 @@ def create_app():
     from blueprints.tarja_propio import tarja_propio_bp
     from blueprints.cambio_porcentaje import cambio_porcentaje_bp
     from blueprints.cierre_tarja import cierre_tarja_bp
+    from blueprints.sync import sync_bp
 
     
     # Registrar blueprints
@@ -92,6 +118,7 @@ def create_app():
     app.register_blueprint(tarja_propio_bp, url_prefix='/api/tarja-propio')
     app.register_blueprint(cambio_porcentaje_bp, url_prefix='/api/cambio-porcentaje')
     app.register_blueprint(cierre_tarja_bp, url_prefix='/api/cierre-tarjas')
+    app.register_blueprint(sync_bp, url_prefix='/api/sync')
     
     # Crear un nuevo blueprint para las rutas raíz
     root_bp = Blueprint('root_bp', __name__)
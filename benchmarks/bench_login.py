@@ -0,0 +1,118 @@
+"""
+Ráfaga de logins (inicio de turno) contra una API en ejecución, midiendo al mismo tiempo la
+latencia de un endpoint liviano. Sirve para comprobar que bcrypt no bloquea el resto de la API.
+
+    python benchmarks/bench_login.py --url http://localhost:8080 --usuario demo --clave demo \
+        --logins 40 --concurrencia 20
+
+Compara la latencia de /api/health sin carga y durante la ráfaga. Con el worker sync y bcrypt
+en el hilo del request, cada login retiene el único hilo ~250 ms y /api/health espera en cola;
+con el worker gthread y el pool de claves, la latencia de /api/health casi no cambia.
+Solo usa la biblioteca estándar.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def _post_json(url, cuerpo, timeout):
+    req = urllib.request.Request(
+        url, data=json.dumps(cuerpo).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}, method='POST'
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def _get(url, timeout):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def _percentil(valores, p):
+    if not valores:
+        return float('nan')
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _resumen(nombre, latencias):
+    ms = [v * 1000 for v in latencias]
+    print(f"{nombre:<28} n={len(ms):<5} p50={_percentil(ms, 50):8.1f} ms  "
+          f"p95={_percentil(ms, 95):8.1f} ms  max={max(ms, default=float('nan')):8.1f} ms  "
+          f"media={statistics.fmean(ms) if ms else float('nan'):8.1f} ms")
+
+
+def _sondear(url, detener, latencias, intervalo, timeout):
+    while not detener.is_set():
+        inicio = time.perf_counter()
+        _get(url, timeout)
+        latencias.append(time.perf_counter() - inicio)
+        time.sleep(intervalo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8080')
+    parser.add_argument('--usuario', required=True)
+    parser.add_argument('--clave', required=True)
+    parser.add_argument('--logins', type=int, default=40, help='Logins totales de la ráfaga')
+    parser.add_argument('--concurrencia', type=int, default=20, help='Logins simultáneos')
+    parser.add_argument('--sondeo', default='/api/health', help='Endpoint liviano a medir durante la ráfaga')
+    parser.add_argument('--intervalo', type=float, default=0.02, help='Segundos entre sondeos')
+    parser.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+
+    url_sondeo = args.url.rstrip('/') + args.sondeo
+    url_login = args.url.rstrip('/') + '/api/auth/login'
+
+    # Línea base: el endpoint liviano sin carga
+    base = []
+    for _ in range(50):
+        inicio = time.perf_counter()
+        _get(url_sondeo, args.timeout)
+        base.append(time.perf_counter() - inicio)
+
+    # Ráfaga de logins con el sondeo corriendo en paralelo
+    detener = threading.Event()
+    durante = []
+    sondeo = threading.Thread(target=_sondear, args=(url_sondeo, detener, durante, args.intervalo, args.timeout))
+    sondeo.start()
+
+    def _login(_):
+        inicio = time.perf_counter()
+        estado = _post_json(url_login, {'usuario': args.usuario, 'clave': args.clave}, args.timeout)
+        return estado, time.perf_counter() - inicio
+
+    inicio_rafaga = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+        resultados = list(pool.map(_login, range(args.logins)))
+    duracion = time.perf_counter() - inicio_rafaga
+    detener.set()
+    sondeo.join()
+
+    estados = {}
+    for estado, _ in resultados:
+        estados[estado] = estados.get(estado, 0) + 1
+
+    print(f"Ráfaga: {args.logins} logins, {args.concurrencia} simultáneos, {duracion:.2f} s, estados {estados}")
+    _resumen(f"{args.sondeo} sin carga", base)
+    _resumen(f"{args.sondeo} durante ráfaga", durante)
+    _resumen("login", [latencia for _, latencia in resultados])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,75 @@
+import base64
 import datetime
 from flask import Blueprint, jsonify, request
 from utils.db import get_db_connection
+from utils.ceco import refrescar_ceco_actividad, eliminar_ceco_actividad, insertar_cecos_actividad, quitar_cecos_actividad
+from utils.sucursal import obtener_sucursal_activa
+from utils.cambios import registrar_cambio, ELIMINACION
+from utils.colaborador_dia import dias_de_actividades, refrescar_colaborador_dia
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
+import uuid
 
 
 actividades_bp = Blueprint('actividades_bp', __name__)
 
+# Máximo de actividades por página en el modo paginado
+LIMITE_MAXIMO_PAGINA = 500
+
+
+def _codificar_cursor(fecha, id_actividad):
+    return base64.urlsafe_b64encode(f"{fecha}|{id_actividad}".encode()).decode().rstrip('=')
+
+
+def _decodificar_cursor(cursor_pagina):
+    """Devuelve (fecha, id) del cursor; ValueError si no es válido"""
+    relleno = '=' * (-len(cursor_pagina) % 4)
+    fecha, id_actividad = base64.urlsafe_b64decode(cursor_pagina + relleno).decode().split('|', 1)
+    return datetime.strptime(fecha, '%Y-%m-%d').date(), id_actividad
+
+
 # 🚀 Endpoint para obtener actividades por sucursal
+# Sin `limite` devuelve la lista completa ordenada por labor (comportamiento original).
+# Con `limite` pagina por (fecha, id) descendente y responde {"actividades": [...], "next_cursor": ...}
 @actividades_bp.route('/sucursal/<string:id_sucursal>', methods=['GET'])
 @jwt_required()
 def obtener_actividades_por_sucursal(id_sucursal):
     try:
+        fecha_desde = request.args.get('fecha_desde')
+        fecha_hasta = request.args.get('fecha_hasta')
+        estado = request.args.get('estado')
+        limite = request.args.get('limite')
+        cursor_pagina = request.args.get('cursor')
+
+        # Estados a listar: por defecto 1: creada, 2: revisada, 3: aprobada
+        try:
+            estados = [int(e) for e in estado.split(',') if e.strip()] if estado else [1, 2, 3]
+        except ValueError:
+            return jsonify({"error": "estado debe ser una lista de enteros separados por coma"}), 400
+        if not estados:
+            return jsonify({"error": "estado debe ser una lista de enteros separados por coma"}), 400
+
+        try:
+            if fecha_desde:
+                datetime.strptime(fecha_desde, '%Y-%m-%d')
+            if fecha_hasta:
+                datetime.strptime(fecha_hasta, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({"error": "Formato de fecha inválido. Use YYYY-MM-DD"}), 400
+
+        paginado = limite is not None or cursor_pagina is not None
+        if paginado:
+            try:
+                limite = min(int(limite or 100), LIMITE_MAXIMO_PAGINA)
+            except ValueError:
+                return jsonify({"error": "limite debe ser un número entero"}), 400
+            if limite <= 0:
+                return jsonify({"error": "limite debe ser mayor que 0"}), 400
+
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
 
+        # Todos los JOIN son por clave primaria: una fila por actividad, sin GROUP BY
         sql = """
             SELECT 
                 a.id, 
@@ -38,26 +93,11 @@ def obtener_actividades_por_sucursal(id_sucursal):
                 tc.nombre AS nombre_tipoceco,
                 CONCAT(usr.nombre, ' ', usr.apellido_paterno, 
                        CASE WHEN usr.apellido_materno IS NOT NULL THEN CONCAT(' ', usr.apellido_materno) ELSE '' END) AS nombre_usuario,
-                CASE 
-                    WHEN a.id_tipoceco = 1 THEN (SELECT ce.nombre FROM tarja_fact_cecoadministrativo ca JOIN general_dim_ceco ce ON ca.id_ceco = ce.id WHERE ca.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 2 THEN (SELECT ce.nombre FROM tarja_fact_cecoproductivo cp JOIN general_dim_ceco ce ON cp.id_ceco = ce.id WHERE cp.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 3 THEN (SELECT ce.nombre FROM tarja_fact_cecomaquinaria cm JOIN general_dim_ceco ce ON cm.id_ceco = ce.id WHERE cm.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 4 THEN (SELECT ce.nombre FROM tarja_fact_cecoinversion ci JOIN general_dim_ceco ce ON ci.id_ceco = ce.id WHERE ci.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 5 THEN (SELECT ce.nombre FROM tarja_fact_cecoriego cr JOIN general_dim_ceco ce ON cr.id_ceco = ce.id WHERE cr.id_actividad = a.id LIMIT 1)
-                    ELSE NULL
-                END AS nombre_ceco,
-                EXISTS (
-                    SELECT 1 
-                    FROM tarja_fact_rendimientopropio rp 
-                    WHERE rp.id_actividad = a.id
-                    UNION
-                    SELECT 1 
-                    FROM tarja_fact_rendimientocontratista rc 
-                    WHERE rc.id_actividad = a.id
-                    UNION
-                    SELECT 1 
-                    FROM tarja_fact_redimientogrupal rg 
-                    WHERE rg.id_actividad = a.id
+                ce.nombre AS nombre_ceco,
+                (
+                    EXISTS (SELECT 1 FROM tarja_fact_rendimientopropio rp WHERE rp.id_actividad = a.id)
+                    OR EXISTS (SELECT 1 FROM tarja_fact_rendimientocontratista rc WHERE rc.id_actividad = a.id)
+                    OR EXISTS (SELECT 1 FROM tarja_fact_redimientogrupal rg WHERE rg.id_actividad = a.id)
                 ) AS tiene_rendimiento
             FROM tarja_fact_actividad a
             LEFT JOIN general_dim_labor l ON a.id_labor = l.id
@@ -66,28 +106,53 @@ def obtener_actividades_por_sucursal(id_sucursal):
             LEFT JOIN tarja_dim_tiporendimiento tr ON a.id_tiporendimiento = tr.id
             LEFT JOIN general_dim_cecotipo tc ON a.id_tipoceco = tc.id
             LEFT JOIN general_dim_usuario usr ON a.id_usuario = usr.id
+            LEFT JOIN tarja_fact_actividad_ceco ac ON ac.id_actividad = a.id
+            LEFT JOIN general_dim_ceco ce ON ce.id = ac.id_ceco
 
             WHERE a.id_sucursalactiva = %s
-            AND (a.id_estadoactividad = 1 OR a.id_estadoactividad = 2 OR a.id_estadoactividad = 3)  -- 1: creada, 2: revisada, 3: aprobada
-            GROUP BY a.id
-            ORDER BY l.nombre ASC
-        """
+            AND a.id_estadoactividad IN ({})
+        """.format(', '.join(['%s'] * len(estados)))
+        params = [id_sucursal] + estados
+
+        if fecha_desde:
+            sql += " AND a.fecha >= %s"
+            params.append(fecha_desde)
+        if fecha_hasta:
+            sql += " AND a.fecha <= %s"
+            params.append(fecha_hasta)
+
+        if paginado:
+            # Keyset sobre (fecha, id), apoyado en idx_actividad_sucursal_estado_fecha
+            if cursor_pagina:
+                try:
+                    fecha_cursor, id_cursor = _decodificar_cursor(cursor_pagina)
+                except Exception:
+                    return jsonify({"error": "Cursor inválido"}), 400
+                sql += " AND (a.fecha < %s OR (a.fecha = %s AND a.id < %s))"
+                params.extend([fecha_cursor, fecha_cursor, id_cursor])
+            sql += " ORDER BY a.fecha DESC, a.id DESC LIMIT %s"
+            params.append(limite + 1)
+        else:
+            sql += " ORDER BY l.nombre ASC"
 
-        cursor.execute(sql, (id_sucursal,))
+        cursor.execute(sql, tuple(params))
         actividades = cursor.fetchall()
 
+        next_cursor = None
+        if paginado and len(actividades) > limite:
+            actividades = actividades[:limite]
+            ultima = actividades[-1]
+            next_cursor = _codificar_cursor(ultima['fecha'].strftime('%Y-%m-%d'), ultima['id'])
+
         for actividad in actividades:
             if 'fecha' in actividad and isinstance(actividad['fecha'], (date, datetime)):
                 actividad['fecha'] = actividad['fecha'].strftime('%Y-%m-%d')
 
-            if isinstance(actividad['hora_inicio'], timedelta):
-                actividad['hora_inicio'] = str(actividad['hora_inicio'])
-            if isinstance(actividad['hora_fin'], timedelta):
-                actividad['hora_fin'] = str(actividad['hora_fin'])
-
         cursor.close()
         conn.close()
 
+        if paginado:
+            return jsonify({"actividades": actividades, "next_cursor": next_cursor}), 200
         return jsonify(actividades), 200
 
     except Exception as e:
@@ -152,10 +217,18 @@ def editar_actividad(actividad_id):
                   id_contratista, id_tiporendimiento, hora_inicio,
                   hora_fin, id_estadoactividad, tarifa, id_tipoceco, actividad_id, usuario_id)
 
+        # La fecha puede cambiar: las horas por día de sus colaboradores se recalculan en ambos días
+        dias_antes = dias_de_actividades(cursor, actividad_id)
         cursor.execute(sql, valores)
+        actualizadas = cursor.rowcount
+        # id_tipoceco puede haber cambiado: recalcular su CECO resuelto
+        refrescar_ceco_actividad(cursor, actividad_id)
+        if actualizadas:
+            refrescar_colaborador_dia(cursor, dias_antes | dias_de_actividades(cursor, actividad_id))
+            registrar_cambio(cursor, 'actividad', actividad_id)
         conn.commit()
 
-        if cursor.rowcount == 0:
+        if actualizadas == 0:
             cursor.close()
             conn.close()
             return jsonify({"error": "Actividad no encontrada o no tienes permiso para editarla"}), 404
@@ -186,15 +259,13 @@ def cambiar_estado_actividad(actividad_id):
         cursor = conn.cursor(dictionary=True)
 
         # Obtener la sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
 
-        if not usuario or usuario['id_sucursalactiva'] is None:
+        if id_sucursal is None:
             cursor.close()
             conn.close()
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
 
-        id_sucursal = usuario['id_sucursalactiva']
 
         # Verificar que la actividad existe y pertenece a la sucursal del usuario
         cursor.execute("""
@@ -224,10 +295,13 @@ def cambiar_estado_actividad(actividad_id):
             SET id_estadoactividad = %s
             WHERE id = %s AND id_sucursalactiva = %s
         """, (nuevo_estado, actividad_id, id_sucursal))
+        actualizadas = cursor.rowcount
+        if actualizadas:
+            registrar_cambio(cursor, 'actividad', actividad_id)
 
         conn.commit()
 
-        if cursor.rowcount == 0:
+        if actualizadas == 0:
             cursor.close()
             conn.close()
             return jsonify({"error": "No se pudo actualizar el estado de la actividad"}), 500
@@ -240,6 +314,113 @@ def cambiar_estado_actividad(actividad_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Transiciones permitidas en el cambio de estado masivo (1: creada, 2: revisada, 3: aprobada, 4: finalizada):
+# un paso hacia adelante o uno hacia atrás
+TRANSICIONES_ESTADO = {
+    1: {2},
+    2: {1, 3},
+    3: {2, 4},
+    4: {3},
+}
+MAXIMO_ACTIVIDADES_ESTADO = 1000
+
+
+# 🚀 Endpoint para cambiar el estado de muchas actividades a la vez
+@actividades_bp.route('/estado', methods=['PUT'])
+@jwt_required()
+def cambiar_estado_actividades():
+    try:
+        usuario_id = get_jwt_identity()
+        data = request.json or {}
+        ids = data.get('ids')
+        nuevo_estado = data.get('id_estadoactividad')
+
+        if not isinstance(ids, list) or not ids:
+            return jsonify({"error": "ids debe ser una lista no vacía"}), 400
+        if len(ids) > MAXIMO_ACTIVIDADES_ESTADO:
+            return jsonify({"error": f"Máximo {MAXIMO_ACTIVIDADES_ESTADO} actividades por solicitud"}), 400
+        try:
+            nuevo_estado = int(nuevo_estado)
+        except (TypeError, ValueError):
+            return jsonify({"error": "El campo id_estadoactividad es requerido"}), 400
+        if nuevo_estado not in TRANSICIONES_ESTADO:
+            return jsonify({"error": "Estado de actividad no válido"}), 400
+
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if id_sucursal is None:
+            return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
+
+        ids = list(dict.fromkeys(str(i) for i in ids))
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        # Estado y sucursal de todas las actividades en una sola consulta
+        placeholders = ', '.join(['%s'] * len(ids))
+        cursor.execute(f"""
+            SELECT id, id_sucursalactiva, id_estadoactividad
+            FROM tarja_fact_actividad
+            WHERE id IN ({placeholders})
+        """, tuple(ids))
+        actuales = {fila['id']: fila for fila in cursor.fetchall()}
+
+        rechazadas = []
+        validas = []
+        for id_actividad in ids:
+            actividad = actuales.get(id_actividad)
+            if not actividad:
+                rechazadas.append({"id": id_actividad, "motivo": "Actividad no encontrada"})
+            elif actividad['id_sucursalactiva'] != id_sucursal:
+                rechazadas.append({"id": id_actividad, "motivo": "La actividad no pertenece a tu sucursal"})
+            elif actividad['id_estadoactividad'] == nuevo_estado:
+                rechazadas.append({"id": id_actividad, "motivo": "La actividad ya está en ese estado"})
+            elif nuevo_estado not in TRANSICIONES_ESTADO.get(actividad['id_estadoactividad'], set()):
+                rechazadas.append({
+                    "id": id_actividad,
+                    "motivo": f"Transición no permitida: {actividad['id_estadoactividad']} → {nuevo_estado}"
+                })
+            else:
+                validas.append(id_actividad)
+
+        actualizadas = []
+        if validas:
+            # La condición de estado evita pisar un cambio concurrente entre la consulta y el UPDATE
+            origenes = [e for e, destinos in TRANSICIONES_ESTADO.items() if nuevo_estado in destinos]
+            placeholders = ', '.join(['%s'] * len(validas))
+            cursor.execute(f"""
+                UPDATE tarja_fact_actividad
+                SET id_estadoactividad = %s
+                WHERE id IN ({placeholders}) AND id_sucursalactiva = %s
+                AND id_estadoactividad IN ({', '.join(['%s'] * len(origenes))})
+            """, (nuevo_estado, *validas, id_sucursal, *origenes))
+
+            if cursor.rowcount == len(validas):
+                actualizadas = validas
+            else:
+                cursor.execute(f"""
+                    SELECT id FROM tarja_fact_actividad
+                    WHERE id IN ({placeholders}) AND id_estadoactividad = %s
+                """, (*validas, nuevo_estado))
+                cambiadas = {fila['id'] for fila in cursor.fetchall()}
+                actualizadas = [i for i in validas if i in cambiadas]
+                rechazadas.extend(
+                    {"id": i, "motivo": "La actividad cambió de estado durante la operación"}
+                    for i in validas if i not in cambiadas
+                )
+            registrar_cambio(cursor, 'actividad', actualizadas)
+            conn.commit()
+
+        cursor.close()
+        conn.close()
+
+        return jsonify({
+            "id_estadoactividad": nuevo_estado,
+            "actualizadas": actualizadas,
+            "rechazadas": rechazadas
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # 🚀 Endpoint para eliminar una actividad existente
 @actividades_bp.route('/<string:actividad_id>', methods=['DELETE'])
 @jwt_required()
@@ -248,13 +429,20 @@ def eliminar_actividad(actividad_id):
         usuario_id = get_jwt_identity()
         conn = get_db_connection()
         cursor = conn.cursor()
+        # Tombstone para /api/sync/changes: va antes del DELETE y se deshace si no se elimina nada
+        registrar_cambio(cursor, 'actividad', actividad_id, ELIMINACION)
+        dias = dias_de_actividades(cursor, actividad_id)
         # Solo permitir eliminar si la actividad es del usuario
         cursor.execute("DELETE FROM tarja_fact_actividad WHERE id = %s AND id_usuario = %s", (actividad_id, usuario_id))
-        conn.commit()
-        if cursor.rowcount == 0:
+        eliminadas = cursor.rowcount
+        if eliminadas == 0:
+            conn.rollback()
             cursor.close()
             conn.close()
             return jsonify({"error": "Actividad no encontrada o no tienes permiso para eliminarla"}), 404
+        eliminar_ceco_actividad(cursor, actividad_id)
+        refrescar_colaborador_dia(cursor, dias)
+        conn.commit()
         cursor.close()
         conn.close()
         return jsonify({"message": "Actividad eliminada correctamente"}), 200
@@ -262,3 +450,149 @@ def eliminar_actividad(actividad_id):
         return jsonify({"error": str(e)}), 500
 
 
+# Campos de la actividad en los endpoints compuestos (los mismos que exige PUT /<actividad_id>)
+CAMPOS_ACTIVIDAD = (
+    'fecha', 'id_labor', 'id_unidad', 'id_tipotrabajador', 'id_contratista', 'id_tiporendimiento',
+    'hora_inicio', 'hora_fin', 'id_estadoactividad', 'tarifa', 'id_tipoceco'
+)
+CAMPOS_REQUERIDOS_ACTIVIDAD = (
+    'fecha', 'id_tipotrabajador', 'id_tiporendimiento', 'id_labor',
+    'id_unidad', 'id_tipoceco', 'tarifa', 'hora_inicio', 'hora_fin'
+)
+
+
+def _valores_actividad(data):
+    """Valida la parte de actividad del body compuesto; ValueError con el mensaje para el cliente"""
+    for campo in CAMPOS_REQUERIDOS_ACTIVIDAD:
+        if data.get(campo) in (None, ''):
+            raise ValueError(f"El campo {campo} es requerido")
+    valores = {campo: data.get(campo) for campo in CAMPOS_ACTIVIDAD}
+    valores['id_estadoactividad'] = valores['id_estadoactividad'] or 1
+    # id_contratista solo aplica si id_tipotrabajador es 2
+    if int(valores['id_tipotrabajador']) == 2:
+        if not valores['id_contratista']:
+            raise ValueError("El campo id_contratista es requerido cuando id_tipotrabajador es 2")
+    else:
+        valores['id_contratista'] = None
+    return valores
+
+
+def _cecos_del_body(data):
+    """`ceco` (un objeto) o `cecos` (lista) con los campos de la tabla del id_tipoceco de la actividad"""
+    cecos = data.get('cecos')
+    if cecos is None and data.get('ceco') is not None:
+        cecos = [data['ceco']]
+    if not isinstance(cecos, list) or not cecos:
+        raise ValueError("Debe enviar ceco o una lista cecos no vacía")
+    return cecos
+
+
+# 🚀 Crear una actividad junto con su asignación de CECO en una sola transacción
+@actividades_bp.route('/con-ceco', methods=['POST'])
+@jwt_required()
+def crear_actividad_con_ceco():
+    try:
+        data = request.json or {}
+        usuario_id = get_jwt_identity()
+        try:
+            valores = _valores_actividad(data)
+            cecos = _cecos_del_body(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
+            return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
+
+        # El cliente puede enviar su propio UUID (creación offline)
+        actividad_id = data.get('id') or str(uuid.uuid4())
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        columnas = ('id', 'id_usuario', 'id_sucursalactiva') + CAMPOS_ACTIVIDAD
+        cursor.execute(
+            f"INSERT INTO tarja_fact_actividad ({', '.join(columnas)}) VALUES ({', '.join(['%s'] * len(columnas))})",
+            (actividad_id, usuario_id, id_sucursal) + tuple(valores[c] for c in CAMPOS_ACTIVIDAD)
+        )
+        try:
+            ids_ceco = insertar_cecos_actividad(cursor, actividad_id, valores['id_tipoceco'], cecos)
+        except ValueError as e:
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            return jsonify({"error": str(e)}), 400
+        refrescar_ceco_actividad(cursor, actividad_id)
+        registrar_cambio(cursor, 'actividad', actividad_id)
+        conn.commit()
+
+        cursor.close()
+        conn.close()
+
+        return jsonify({
+            "message": "Actividad creada correctamente",
+            "id": actividad_id,
+            "ids_ceco": ids_ceco
+        }), 201
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# 🚀 Editar una actividad y reemplazar su asignación de CECO en una sola transacción
+@actividades_bp.route('/<string:actividad_id>/con-ceco', methods=['PUT'])
+@jwt_required()
+def editar_actividad_con_ceco(actividad_id):
+    try:
+        data = request.json or {}
+        usuario_id = get_jwt_identity()
+        try:
+            valores = _valores_actividad(data)
+            cecos = _cecos_del_body(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        # Bloquear la actividad mientras se reemplazan sus CECO
+        cursor.execute(
+            "SELECT id FROM tarja_fact_actividad WHERE id = %s AND id_usuario = %s FOR UPDATE",
+            (actividad_id, usuario_id)
+        )
+        if not cursor.fetchone():
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            return jsonify({"error": "Actividad no encontrada o no tienes permiso para editarla"}), 404
+
+        dias_antes = dias_de_actividades(cursor, actividad_id)
+        cursor.execute(
+            f"UPDATE tarja_fact_actividad SET {', '.join(f'{c} = %s' for c in CAMPOS_ACTIVIDAD)} WHERE id = %s",
+            tuple(valores[c] for c in CAMPOS_ACTIVIDAD) + (actividad_id,)
+        )
+        # El tipo de CECO puede haber cambiado: se quitan las asignaciones de todas las tablas
+        quitar_cecos_actividad(cursor, actividad_id)
+        try:
+            ids_ceco = insertar_cecos_actividad(cursor, actividad_id, valores['id_tipoceco'], cecos)
+        except ValueError as e:
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            return jsonify({"error": str(e)}), 400
+        refrescar_ceco_actividad(cursor, actividad_id)
+        refrescar_colaborador_dia(cursor, dias_antes | dias_de_actividades(cursor, actividad_id))
+        registrar_cambio(cursor, 'actividad', actividad_id)
+        conn.commit()
+
+        cursor.close()
+        conn.close()
+
+        return jsonify({
+            "message": "Actividad actualizada correctamente",
+            "id": actividad_id,
+            "ids_ceco": ids_ceco
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
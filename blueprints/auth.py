@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
-import bcrypt
 from config import Config
 from utils.db import get_db_connection
+from utils.sucursal import invalidar_sucursal_activa
+from utils.claves import (
+    hashear_clave, verificar_clave, necesita_rehash, rehashear_en_segundo_plano,
+    limitador_login, ServicioClavesOcupado, DemasiadosIntentos
+)
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, create_refresh_token
 from datetime import date
 
@@ -22,24 +26,25 @@ def register():
     if not correo or not clave or not usuario or not id_sucursalactiva:
         return jsonify({"error": "Correo, clave, usuario y sucursal son requeridos"}), 400
 
-    # Generar hash de la contraseña
-    salt = bcrypt.gensalt()
-    clave_encriptada = bcrypt.hashpw(clave.encode('utf-8'), salt)
-
     try:
+        # Generar hash de la contraseña
+        clave_encriptada = hashear_clave(clave)
+
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute(
             """INSERT INTO general_dim_usuario 
                (id, usuario, correo, clave, id_sucursalactiva, id_estado, id_rol, id_perfil, fecha_creacion) 
                VALUES (UUID(), %s, %s, %s, %s, %s, %s, %s, %s)""",
-            (usuario, correo, clave_encriptada.decode('utf-8'), id_sucursalactiva, 
+            (usuario, correo, clave_encriptada, id_sucursalactiva, 
              id_estado, id_rol, id_perfil, date.today())
         )
         conn.commit()
         cursor.close()
         conn.close()
         return jsonify({"message": "Usuario registrado correctamente"}), 201
+    except ServicioClavesOcupado as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -54,6 +59,13 @@ def login():
         if not usuario or not clave:
             return jsonify({"error": "Faltan datos de usuario o clave"}), 400
 
+        # Intentos fallidos por IP y por par (usuario, IP). La IP es la que agregó el proxy
+        # (ProxyFix en app.py), no una que el cliente pueda inventar en cada intento. No se
+        # limita por usuario solo: cualquiera podría bloquear una cuenta ajena con claves erradas
+        ip = request.remote_addr
+        claves_limite = (f"usuario_ip:{usuario}|{ip}", f"ip:{ip}")
+        limitador_login.verificar(*claves_limite)
+
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
 
@@ -77,11 +89,17 @@ def login():
         cursor.execute(sql, (usuario,))
         user = cursor.fetchone()
 
-        if not user or not bcrypt.checkpw(clave.encode('utf-8'), user['clave'].encode('utf-8')):
+        if not user or not verificar_clave(clave, user['clave']):
+            limitador_login.registrar_fallo(*claves_limite)
             cursor.close()
             conn.close()
             return jsonify({"error": "Usuario o clave incorrectos"}), 401
 
+        limitador_login.limpiar(claves_limite[0])
+        # Hash con otro costo que BCRYPT_COSTO: se recalcula sin demorar la respuesta
+        if necesita_rehash(user['clave']):
+            rehashear_en_segundo_plano(user['id'], clave, user['clave'])
+
         # Crear token con información adicional
         access_token = create_access_token(
             identity=user['id'],
@@ -111,6 +129,10 @@ def login():
             "id_perfil": user['id_perfil']
         }), 200
 
+    except DemasiadosIntentos as e:
+        return jsonify({"error": str(e)}), 429, {"Retry-After": str(e.reintentar_en)}
+    except ServicioClavesOcupado as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -197,18 +219,17 @@ def cambiar_clave():
         cursor.execute("SELECT clave FROM general_dim_usuario WHERE id = %s", (usuario_id,))
         user = cursor.fetchone()
 
-        if not user or not bcrypt.checkpw(clave_actual.encode('utf-8'), user['clave'].encode('utf-8')):
+        if not user or not verificar_clave(clave_actual, user['clave']):
             cursor.close()
             conn.close()
             return jsonify({"error": "Clave actual incorrecta"}), 401
 
         # Generar nuevo hash con bcrypt
-        salt = bcrypt.gensalt()
-        nueva_clave_hash = bcrypt.hashpw(nueva_clave.encode('utf-8'), salt)
+        nueva_clave_hash = hashear_clave(nueva_clave)
 
         # Actualizar clave
         cursor.execute("UPDATE general_dim_usuario SET clave = %s WHERE id = %s", 
-                      (nueva_clave_hash.decode('utf-8'), usuario_id))
+                      (nueva_clave_hash, usuario_id))
         conn.commit()
 
         cursor.close()
@@ -216,6 +237,8 @@ def cambiar_clave():
 
         return jsonify({"message": "Clave actualizada correctamente"}), 200
 
+    except ServicioClavesOcupado as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -254,6 +277,7 @@ def cambiar_sucursal():
         """, (nueva_sucursal_id, usuario_id))
         
         conn.commit()
+        invalidar_sucursal_activa(usuario_id)
 
         # Obtener el nombre de la sucursal para la respuesta
         cursor.execute("""
@@ -276,6 +300,17 @@ def cambiar_sucursal():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def sucursales_de_usuario(cursor, usuario_id):
+    """Sucursales permitidas para el usuario (también usado por /api/opciones/bootstrap)"""
+    cursor.execute("""
+        SELECT DISTINCT s.id, s.nombre, s.ubicacion
+        FROM general_dim_sucursal s
+        JOIN usuario_pivot_sucursal_usuario p ON s.id = p.id_sucursal
+        WHERE p.id_usuario = %s
+        ORDER BY s.nombre ASC
+    """, (usuario_id,))
+    return cursor.fetchall()
+
 # Obtener sucursales del usuario logueado
 @auth_bp.route('/sucursales', methods=['GET', 'OPTIONS'])
 @jwt_required()
@@ -288,15 +323,7 @@ def obtener_sucursales():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursales permitidas para el usuario
-        cursor.execute("""
-            SELECT DISTINCT s.id, s.nombre, s.ubicacion
-            FROM general_dim_sucursal s
-            JOIN usuario_pivot_sucursal_usuario p ON s.id = p.id_sucursal
-            WHERE p.id_usuario = %s
-            ORDER BY s.nombre ASC
-        """, (usuario_id,))
-
-        sucursales = cursor.fetchall()
+        sucursales = sucursales_de_usuario(cursor, usuario_id)
         cursor.close()
         conn.close()
 
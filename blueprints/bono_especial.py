@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.db import get_db_connection
+from utils.sucursal import obtener_sucursal_activa
 import uuid
 from datetime import datetime
 
@@ -16,12 +17,10 @@ def listar_bonos_especiales():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Parámetros de filtrado
         id_colaborador = request.args.get('id_colaborador')
@@ -79,12 +78,10 @@ def obtener_bono_especial(bono_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Obtener bono especial específico
         cursor.execute("""
@@ -135,12 +132,10 @@ def crear_bono_especial():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que el colaborador pertenece a la sucursal
         cursor.execute("""
@@ -198,12 +193,10 @@ def editar_bono_especial(bono_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que el bono especial existe y pertenece a la sucursal
         cursor.execute("""
@@ -255,12 +248,10 @@ def eliminar_bono_especial(bono_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que el bono especial existe y pertenece a la sucursal
         cursor.execute("""
@@ -294,12 +285,10 @@ def obtener_resumen_bonos_especiales_colaborador():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Parámetros de filtrado
         fecha_inicio = request.args.get('fecha_inicio')
@@ -1,6 +1,8 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.db import get_db_connection
+from utils.sucursal import obtener_sucursal_activa
+from utils.cambios import registrar_cambio
 from datetime import date, datetime
 from flask_cors import cross_origin
 
@@ -24,15 +26,13 @@ def obtener_rendimientos_porcentaje():
         cursor = conn.cursor(dictionary=True)
 
         # Obtener la sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
 
-        if not usuario or usuario['id_sucursalactiva'] is None:
+        if id_sucursal is None:
             cursor.close()
             conn.close()
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
 
-        id_sucursal = usuario['id_sucursalactiva']
 
         sql = """
             SELECT 
@@ -110,15 +110,13 @@ def editar_porcentaje_rendimiento(rendimiento_id):
         cursor = conn.cursor(dictionary=True)
 
         # Obtener la sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
 
-        if not usuario or usuario['id_sucursalactiva'] is None:
+        if id_sucursal is None:
             cursor.close()
             conn.close()
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
 
-        id_sucursal = usuario['id_sucursalactiva']
 
         # Verificar que el rendimiento existe, obtener el estado de la actividad y verificar la sucursal
         cursor.execute("""
@@ -170,6 +168,7 @@ def editar_porcentaje_rendimiento(rendimiento_id):
             SET id_porcentaje_individual = %s
             WHERE id = %s
         """, (id_porcentaje_individual, rendimiento_id))
+        registrar_cambio(cursor, 'rendimiento_contratista', rendimiento_id)
 
         conn.commit()
         cursor.close()
@@ -184,3 +183,126 @@ def editar_porcentaje_rendimiento(rendimiento_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+
+
+# 🚀 Endpoint para cambiar el porcentaje de muchos rendimientos a la vez
+@cambio_porcentaje_bp.route('/bulk', methods=['PUT'])
+@cross_origin()
+@jwt_required()
+def editar_porcentaje_rendimientos():
+    """
+    Cambia el id_porcentaje_individual de varios rendimientos de contratista en un solo UPDATE.
+    Acepta {id_porcentaje_individual, ids: [...]} o un filtro con al menos uno de
+    id_actividad, id_trabajador, fecha (YYYY-MM-DD).
+    Solo se actualizan rendimientos de actividades de la sucursal del usuario en estado 1 (CREADA)
+    o 2 (REVISADA); con ids, los demás se informan en "rechazados".
+    """
+    try:
+        usuario_id = get_jwt_identity()
+        data = request.get_json()
+
+        if not data or 'id_porcentaje_individual' not in data:
+            return jsonify({"error": "Se requiere el campo id_porcentaje_individual"}), 400
+
+        # Validar que id_porcentaje_individual sea un entero
+        try:
+            id_porcentaje_individual = int(data['id_porcentaje_individual'])
+        except (ValueError, TypeError):
+            return jsonify({"error": "id_porcentaje_individual debe ser un número entero"}), 400
+
+        ids = data.get('ids')
+        filtros = {c: data[c] for c in ('id_actividad', 'id_trabajador', 'fecha') if data.get(c)}
+        if ids is None and not filtros:
+            return jsonify({"error": "Envíe ids o al menos un filtro: id_actividad, id_trabajador, fecha"}), 400
+        if ids is not None and (not isinstance(ids, list) or not ids):
+            return jsonify({"error": "ids debe ser una lista no vacía"}), 400
+
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        # Obtener la sucursal activa del usuario
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+
+        if id_sucursal is None:
+            cursor.close()
+            conn.close()
+            return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
+
+        # Verificar que el porcentaje existe
+        cursor.execute("""
+            SELECT id FROM general_dim_porcentajecontratista 
+            WHERE id = %s
+        """, (id_porcentaje_individual,))
+
+        if not cursor.fetchone():
+            cursor.close()
+            conn.close()
+            return jsonify({"error": "Porcentaje no encontrado"}), 400
+
+        rechazados = []
+        if ids is not None:
+            # Estado y sucursal de todos los rendimientos en una sola consulta
+            ids = list(dict.fromkeys(str(i) for i in ids))
+            cursor.execute(f"""
+                SELECT rc.id, a.id_estadoactividad, a.id_sucursalactiva
+                FROM tarja_fact_rendimientocontratista rc
+                INNER JOIN tarja_fact_actividad a ON rc.id_actividad = a.id
+                WHERE rc.id IN ({', '.join(['%s'] * len(ids))})
+            """, tuple(ids))
+            rendimientos = {fila['id']: fila for fila in cursor.fetchall()}
+
+            validos = []
+            for rendimiento_id in ids:
+                rendimiento = rendimientos.get(rendimiento_id)
+                if not rendimiento:
+                    rechazados.append({"id": rendimiento_id, "motivo": "Rendimiento no encontrado"})
+                elif rendimiento['id_sucursalactiva'] != id_sucursal:
+                    rechazados.append({"id": rendimiento_id, "motivo": "El rendimiento no pertenece a tu sucursal"})
+                elif rendimiento['id_estadoactividad'] not in (1, 2):
+                    rechazados.append({
+                        "id": rendimiento_id,
+                        "motivo": "La actividad debe estar en estado CREADA (1) o REVISADA (2)"
+                    })
+                else:
+                    validos.append(rendimiento_id)
+        else:
+            # El filtro ya restringe a la sucursal y a los estados 1 y 2
+            sql = """
+                SELECT rc.id
+                FROM tarja_fact_rendimientocontratista rc
+                INNER JOIN tarja_fact_actividad a ON rc.id_actividad = a.id
+                WHERE a.id_sucursalactiva = %s
+                AND a.id_estadoactividad IN (1, 2)
+            """
+            params = [id_sucursal]
+            columnas = {'id_actividad': 'rc.id_actividad', 'id_trabajador': 'rc.id_trabajador', 'fecha': 'a.fecha'}
+            for campo, valor in filtros.items():
+                sql += f" AND {columnas[campo]} = %s"
+                params.append(valor)
+            cursor.execute(sql, tuple(params))
+            validos = [fila['id'] for fila in cursor.fetchall()]
+
+        if validos:
+            cursor.execute(f"""
+                UPDATE tarja_fact_rendimientocontratista rc
+                INNER JOIN tarja_fact_actividad a ON rc.id_actividad = a.id
+                SET rc.id_porcentaje_individual = %s
+                WHERE rc.id IN ({', '.join(['%s'] * len(validos))})
+                AND a.id_sucursalactiva = %s
+                AND a.id_estadoactividad IN (1, 2)
+            """, (id_porcentaje_individual, *validos, id_sucursal))
+            registrar_cambio(cursor, 'rendimiento_contratista', validos)
+            conn.commit()
+
+        cursor.close()
+        conn.close()
+
+        return jsonify({
+            "message": f"Porcentaje actualizado en {len(validos)} rendimientos",
+            "id_porcentaje_individual": id_porcentaje_individual,
+            "actualizados": validos,
+            "rechazados": rechazados
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,6 +1,8 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.db import get_db_connection
+from utils.sucursal import obtener_sucursal_activa
+from utils.cambios import registrar_cambio
 from datetime import date, datetime
 from flask_cors import cross_origin
 
@@ -23,15 +25,13 @@ def obtener_actividades_cierre():
         cursor = conn.cursor(dictionary=True)
 
         # Obtener la sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
 
-        if not usuario or usuario['id_sucursalactiva'] is None:
+        if id_sucursal is None:
             cursor.close()
             conn.close()
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
 
-        id_sucursal = usuario['id_sucursalactiva']
 
         sql = """
             SELECT 
@@ -45,14 +45,7 @@ def obtener_actividades_cierre():
                         ELSE '' 
                     END
                 ) AS usuario,
-                CASE 
-                    WHEN a.id_tipoceco = 1 THEN (SELECT ce.nombre FROM tarja_fact_cecoadministrativo ca JOIN general_dim_ceco ce ON ca.id_ceco = ce.id WHERE ca.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 2 THEN (SELECT ce.nombre FROM tarja_fact_cecoproductivo cp JOIN general_dim_ceco ce ON cp.id_ceco = ce.id WHERE cp.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 3 THEN (SELECT ce.nombre FROM tarja_fact_cecomaquinaria cm JOIN general_dim_ceco ce ON cm.id_ceco = ce.id WHERE cm.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 4 THEN (SELECT ce.nombre FROM tarja_fact_cecoinversion ci JOIN general_dim_ceco ce ON ci.id_ceco = ce.id WHERE ci.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 5 THEN (SELECT ce.nombre FROM tarja_fact_cecoriego cr JOIN general_dim_ceco ce ON cr.id_ceco = ce.id WHERE cr.id_actividad = a.id LIMIT 1)
-                    ELSE NULL
-                END AS ceco,
+                ce.nombre AS ceco,
                 l.nombre AS labor,
                 u.nombre AS unidad,
                 COALESCE(co.nombre, 'N/A') AS contratista,
@@ -67,6 +60,8 @@ def obtener_actividades_cierre():
             INNER JOIN tarja_dim_tiporendimiento tr ON a.id_tiporendimiento = tr.id
             INNER JOIN general_dim_usuario usr ON a.id_usuario = usr.id
             INNER JOIN tarja_dim_estadoactividad ea ON a.id_estadoactividad = ea.id
+            LEFT JOIN tarja_fact_actividad_ceco ac ON ac.id_actividad = a.id
+            LEFT JOIN general_dim_ceco ce ON ce.id = ac.id_ceco
             WHERE a.id_estadoactividad IN (3, 4)
             AND a.id_sucursalactiva = %s
             GROUP BY a.id
@@ -120,15 +115,13 @@ def editar_oc_actividad(actividad_id):
         cursor = conn.cursor(dictionary=True)
 
         # Obtener la sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
 
-        if not usuario or usuario['id_sucursalactiva'] is None:
+        if id_sucursal is None:
             cursor.close()
             conn.close()
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
 
-        id_sucursal = usuario['id_sucursalactiva']
 
         # Verificar que la actividad existe, obtener el estado y verificar la sucursal
         cursor.execute("""
@@ -166,6 +159,7 @@ def editar_oc_actividad(actividad_id):
             SET oc = %s
             WHERE id = %s
         """, (oc, actividad_id))
+        registrar_cambio(cursor, 'actividad', actividad_id)
 
         conn.commit()
         cursor.close()
@@ -180,3 +174,114 @@ def editar_oc_actividad(actividad_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+
+
+# 🚀 Endpoint para asignar el mismo oc a muchas actividades
+@cierre_tarja_bp.route('/oc', methods=['PUT'])
+@cross_origin()
+@jwt_required()
+def asignar_oc_actividades():
+    """
+    Asigna un oc a varias actividades en una sola sentencia.
+    Acepta {oc, ids: [...]} o un filtro {oc, id_contratista, fecha_desde, fecha_hasta}.
+    Solo se actualizan actividades de la sucursal del usuario en estado 3 (aprobada) o 4 (finalizada);
+    las demás se informan en "rechazadas".
+    """
+    try:
+        usuario_id = get_jwt_identity()
+        data = request.get_json()
+
+        if not data or 'oc' not in data:
+            return jsonify({"error": "Se requiere el campo oc"}), 400
+
+        oc = data['oc']
+
+        # Validar que oc sea un entero o None
+        if oc is not None:
+            try:
+                oc = int(oc)
+            except (ValueError, TypeError):
+                return jsonify({"error": "oc debe ser un número entero o null"}), 400
+
+        ids = data.get('ids')
+        por_filtro = ids is None
+        if por_filtro:
+            faltantes = [c for c in ('id_contratista', 'fecha_desde', 'fecha_hasta') if not data.get(c)]
+            if faltantes:
+                return jsonify({
+                    "error": f"Envíe ids o el filtro completo. Falta: {', '.join(faltantes)}"
+                }), 400
+        elif not isinstance(ids, list) or not ids:
+            return jsonify({"error": "ids debe ser una lista no vacía"}), 400
+
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        # Obtener la sucursal activa del usuario
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+
+        if id_sucursal is None:
+            cursor.close()
+            conn.close()
+            return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
+
+        rechazadas = []
+        if por_filtro:
+            # El filtro ya restringe a la sucursal y a los estados 3 y 4
+            cursor.execute("""
+                SELECT id
+                FROM tarja_fact_actividad
+                WHERE id_sucursalactiva = %s
+                AND id_estadoactividad IN (3, 4)
+                AND id_contratista = %s
+                AND fecha BETWEEN %s AND %s
+            """, (id_sucursal, data['id_contratista'], data['fecha_desde'], data['fecha_hasta']))
+            validas = [fila['id'] for fila in cursor.fetchall()]
+        else:
+            # Estado y sucursal de todas las actividades en una sola consulta
+            ids = list(dict.fromkeys(str(i) for i in ids))
+            cursor.execute(f"""
+                SELECT id, id_estadoactividad, id_sucursalactiva
+                FROM tarja_fact_actividad
+                WHERE id IN ({', '.join(['%s'] * len(ids))})
+            """, tuple(ids))
+            actividades = {fila['id']: fila for fila in cursor.fetchall()}
+
+            validas = []
+            for actividad_id in ids:
+                actividad = actividades.get(actividad_id)
+                if not actividad:
+                    rechazadas.append({"id": actividad_id, "motivo": "Actividad no encontrada"})
+                elif actividad['id_sucursalactiva'] != id_sucursal:
+                    rechazadas.append({"id": actividad_id, "motivo": "La actividad no pertenece a tu sucursal"})
+                elif actividad['id_estadoactividad'] not in (3, 4):
+                    rechazadas.append({
+                        "id": actividad_id,
+                        "motivo": "La actividad debe estar en estado APROBADA (3) o FINALIZADA (4)"
+                    })
+                else:
+                    validas.append(actividad_id)
+
+        if validas:
+            cursor.execute(f"""
+                UPDATE tarja_fact_actividad
+                SET oc = %s
+                WHERE id IN ({', '.join(['%s'] * len(validas))})
+                AND id_sucursalactiva = %s
+                AND id_estadoactividad IN (3, 4)
+            """, (oc, *validas, id_sucursal))
+            registrar_cambio(cursor, 'actividad', validas)
+            conn.commit()
+
+        cursor.close()
+        conn.close()
+
+        return jsonify({
+            "message": f"OC asignado a {len(validas)} actividades",
+            "oc": oc,
+            "actualizadas": validas,
+            "rechazadas": rechazadas
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,6 +1,9 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.db import get_db_connection
+from utils.paralelo import consultar_en_paralelo
+from utils.sucursal import obtener_sucursal_activa
+from utils.cambios import registrar_cambio, ELIMINACION
 from utils.validar_rut import validar_rut
 import uuid
 
@@ -15,11 +18,9 @@ def listar_colaboradores():
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
-        id_sucursal = usuario['id_sucursalactiva']
         # Listar colaboradores de la sucursal con información relacionada
         cursor.execute("""
             SELECT 
@@ -72,11 +73,9 @@ def crear_colaborador():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Validar que la sucursal existe
         cursor.execute("SELECT id FROM general_dim_sucursal WHERE id = %s", (id_sucursal,))
@@ -142,6 +141,7 @@ def crear_colaborador():
             data.get('fecha_finiquito'),
             id_sueldobaseactivo
         ))
+        registrar_cambio(cursor, 'colaborador', colaborador_id)
         conn.commit()
         cursor.close()
         conn.close()
@@ -160,13 +160,12 @@ def editar_colaborador(colaborador_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
         # Obtener colaborador actual
-        cursor.execute("SELECT * FROM general_dim_colaborador WHERE id = %s AND id_sucursal = %s", (colaborador_id, usuario['id_sucursalactiva']))
+        cursor.execute("SELECT * FROM general_dim_colaborador WHERE id = %s AND id_sucursal = %s", (colaborador_id, id_sucursal))
         colaborador_actual = cursor.fetchone()
         if not colaborador_actual:
             return jsonify({"error": "Colaborador no encontrado"}), 404
@@ -244,6 +243,7 @@ def editar_colaborador(colaborador_id):
             id_sueldobaseactivo,
             colaborador_id
         ))
+        registrar_cambio(cursor, 'colaborador', colaborador_id)
         conn.commit()
         cursor.close()
         conn.close()
@@ -261,9 +261,8 @@ def obtener_colaborador_por_id(colaborador_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
         cursor.execute("""
@@ -286,7 +285,7 @@ def obtener_colaborador_por_id(colaborador_id):
             LEFT JOIN general_dim_estado e ON c.id_estado = e.id
             LEFT JOIN rrhh_fact_sueldobase sb ON c.id_sueldobaseactivo = sb.id
             WHERE c.id = %s AND c.id_sucursal = %s
-        """, (colaborador_id, usuario['id_sucursalactiva']))
+        """, (colaborador_id, id_sucursal))
         
         colaborador = cursor.fetchone()
         cursor.close()
@@ -300,44 +299,22 @@ def obtener_colaborador_por_id(colaborador_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Catálogos del formulario de colaborador (consultas independientes, se corren en paralelo)
+CONSULTAS_OPCIONES_COLABORADOR = {
+    'sucursales': ("SELECT id, nombre FROM general_dim_sucursal ORDER BY nombre", None),
+    'cargos': ("SELECT id, nombre FROM rrhh_dim_cargo ORDER BY nombre", None),
+    'previsiones': ("SELECT id, nombre FROM rrhh_dim_prevision ORDER BY nombre", None),
+    'afps': ("SELECT id, nombre FROM rrhh_dim_afp ORDER BY nombre", None),
+    # Estados sin filtrar por id_tipo_estado
+    'estados': ("SELECT id, nombre FROM general_dim_estado ORDER BY nombre", None),
+}
+
 # Obtener opciones para crear colaborador
 @colaboradores_bp.route('/opciones-crear', methods=['GET'])
 @jwt_required()
 def obtener_opciones_crear_colaborador():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Obtener sucursales
-        cursor.execute("SELECT id, nombre FROM general_dim_sucursal ORDER BY nombre")
-        sucursales = cursor.fetchall()
-        
-        # Obtener cargos
-        cursor.execute("SELECT id, nombre FROM rrhh_dim_cargo ORDER BY nombre")
-        cargos = cursor.fetchall()
-        
-        # Obtener previsiones
-        cursor.execute("SELECT id, nombre FROM rrhh_dim_prevision ORDER BY nombre")
-        previsiones = cursor.fetchall()
-        
-        # Obtener AFPs
-        cursor.execute("SELECT id, nombre FROM rrhh_dim_afp ORDER BY nombre")
-        afps = cursor.fetchall()
-        
-        # Obtener estados (sin filtrar por id_tipo_estado)
-        cursor.execute("SELECT id, nombre FROM general_dim_estado ORDER BY nombre")
-        estados = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            'sucursales': sucursales,
-            'cargos': cargos,
-            'previsiones': previsiones,
-            'afps': afps,
-            'estados': estados
-        }), 200
+        return jsonify(consultar_en_paralelo(CONSULTAS_OPCIONES_COLABORADOR)), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -347,44 +324,15 @@ def obtener_opciones_crear_colaborador():
 @jwt_required()
 def obtener_opciones_editar_colaborador(colaborador_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Verificar que el colaborador existe
-        cursor.execute("SELECT id FROM general_dim_colaborador WHERE id = %s", (colaborador_id,))
-        if not cursor.fetchone():
+        # La verificación del colaborador corre junto con los catálogos
+        resultados = consultar_en_paralelo({
+            'colaborador': ("SELECT id FROM general_dim_colaborador WHERE id = %s", (colaborador_id,)),
+            **CONSULTAS_OPCIONES_COLABORADOR
+        })
+        if not resultados.pop('colaborador'):
             return jsonify({"error": "Colaborador no encontrado"}), 404
         
-        # Obtener sucursales
-        cursor.execute("SELECT id, nombre FROM general_dim_sucursal ORDER BY nombre")
-        sucursales = cursor.fetchall()
-        
-        # Obtener cargos
-        cursor.execute("SELECT id, nombre FROM rrhh_dim_cargo ORDER BY nombre")
-        cargos = cursor.fetchall()
-        
-        # Obtener previsiones
-        cursor.execute("SELECT id, nombre FROM rrhh_dim_prevision ORDER BY nombre")
-        previsiones = cursor.fetchall()
-        
-        # Obtener AFPs
-        cursor.execute("SELECT id, nombre FROM rrhh_dim_afp ORDER BY nombre")
-        afps = cursor.fetchall()
-        
-        # Obtener estados (sin filtrar por id_tipo_estado)
-        cursor.execute("SELECT id, nombre FROM general_dim_estado ORDER BY nombre")
-        estados = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            'sucursales': sucursales,
-            'cargos': cargos,
-            'previsiones': previsiones,
-            'afps': afps,
-            'estados': estados
-        }), 200
+        return jsonify(resultados), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -406,17 +354,17 @@ def eliminar_colaborador(colaborador_id):
         
         # Verificar que el usuario tiene permisos para eliminar colaboradores de la sucursal
         usuario_id = get_jwt_identity()
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
         
-        if not usuario or not usuario['id_sucursalactiva']:
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
         # Verificar que el colaborador pertenece a la sucursal activa del usuario
-        if colaborador['id_sucursal'] != usuario['id_sucursalactiva']:
+        if colaborador['id_sucursal'] != id_sucursal:
             return jsonify({"error": "No tienes permisos para eliminar este colaborador"}), 403
         
         # Eliminar el colaborador
+        registrar_cambio(cursor, 'colaborador', colaborador_id, ELIMINACION)
         cursor.execute("DELETE FROM general_dim_colaborador WHERE id = %s", (colaborador_id,))
         conn.commit()
         
@@ -448,16 +396,15 @@ def listar_sueldos_base_colaborador(colaborador_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
         # Verificar que el colaborador existe y pertenece a la sucursal del usuario
         cursor.execute("""
             SELECT id FROM general_dim_colaborador 
             WHERE id = %s AND id_sucursal = %s
-        """, (colaborador_id, usuario['id_sucursalactiva']))
+        """, (colaborador_id, id_sucursal))
         if not cursor.fetchone():
             return jsonify({"error": "Colaborador no encontrado"}), 404
         
@@ -492,16 +439,15 @@ def crear_sueldo_base_colaborador(colaborador_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
         # Verificar que el colaborador existe y pertenece a la sucursal del usuario
         cursor.execute("""
             SELECT id FROM general_dim_colaborador 
             WHERE id = %s AND id_sucursal = %s
-        """, (colaborador_id, usuario['id_sucursalactiva']))
+        """, (colaborador_id, id_sucursal))
         if not cursor.fetchone():
             return jsonify({"error": "Colaborador no encontrado"}), 404
         
@@ -564,9 +510,8 @@ def editar_sueldo_base(sueldo_base_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
         # Verificar que el sueldo base existe y el colaborador pertenece a la sucursal del usuario
@@ -575,7 +520,7 @@ def editar_sueldo_base(sueldo_base_id):
             FROM rrhh_fact_sueldobase sb
             JOIN general_dim_colaborador c ON sb.id_colaborador = c.id
             WHERE sb.id = %s AND c.id_sucursal = %s
-        """, (sueldo_base_id, usuario['id_sucursalactiva']))
+        """, (sueldo_base_id, id_sucursal))
         
         sueldo_base_actual = cursor.fetchone()
         if not sueldo_base_actual:
@@ -635,9 +580,8 @@ def eliminar_sueldo_base(sueldo_base_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
         # Verificar que el sueldo base existe y el colaborador pertenece a la sucursal del usuario
@@ -646,7 +590,7 @@ def eliminar_sueldo_base(sueldo_base_id):
             FROM rrhh_fact_sueldobase sb
             JOIN general_dim_colaborador c ON sb.id_colaborador = c.id
             WHERE sb.id = %s AND c.id_sucursal = %s
-        """, (sueldo_base_id, usuario['id_sucursalactiva']))
+        """, (sueldo_base_id, id_sucursal))
         
         sueldo_base = cursor.fetchone()
         if not sueldo_base:
@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, request
 from utils.db import get_db_connection
+from utils.sucursal import obtener_sucursal_activa
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import uuid
 from utils.validar_rut import validar_rut
@@ -19,11 +20,9 @@ def obtener_contratistas():
 
         # Si no se pasa id_sucursal, usar la sucursal activa del usuario
         if not id_sucursal:
-            cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-            usuario = cursor.fetchone()
-            if not usuario or usuario['id_sucursalactiva'] is None:
+            id_sucursal = obtener_sucursal_activa(usuario_id)
+            if id_sucursal is None:
                 return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
-            id_sucursal = usuario['id_sucursalactiva']
 
         # Obtener contratistas de la sucursal con cantidad de trabajadores activos
         cursor.execute("""
@@ -63,15 +62,13 @@ def crear_contratista():
         cursor = conn.cursor(dictionary=True)
 
         # Obtener la sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
 
-        if not usuario or not usuario['id_sucursalactiva']:
+        if not id_sucursal:
             cursor.close()
             conn.close()
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
 
-        id_sucursal = usuario['id_sucursalactiva']
 
         # Crear contratista
         contratista_id = str(uuid.uuid4())
@@ -113,12 +110,10 @@ def editar_contratista(contratista_id):
         cursor = conn.cursor(dictionary=True)
 
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
 
         # Verificar que el contratista existe y pertenece a la sucursal del usuario
         cursor.execute("""
@@ -175,12 +170,10 @@ def obtener_contratista_por_id(contratista_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Obtener contratista específico de la sucursal del usuario
         cursor.execute("""
@@ -208,12 +201,10 @@ def eliminar_contratista(contratista_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que el contratista existe y pertenece a la sucursal del usuario
         cursor.execute("""
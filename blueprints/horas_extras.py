@@ -1,12 +1,17 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.db import get_db_connection
+from utils.sucursal import obtener_sucursal_activa
+from utils.cambios import registrar_cambio
+from utils.colaborador_dia import refrescar_dias_de_rendimientos, resumen_colaborador_dia, detalle_colaborador_dia
+from utils.catalogos import respuesta_catalogo
+from blueprints.rendimientos import TIPOS_RENDIMIENTO, valor_columna_rendimiento
 import uuid
 from datetime import datetime
 
 horas_extras_bp = Blueprint('horas_extras_bp', __name__)
 
-# Listar rendimientos propios agrupados por colaborador y día
+# Listar horas de rendimientos propios agrupadas por colaborador y día (desde tarja_colaborador_dia)
 @horas_extras_bp.route('/rendimientos', methods=['GET'])
 @jwt_required()
 def listar_rendimientos_propios():
@@ -16,120 +21,45 @@ def listar_rendimientos_propios():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
+        # Totales ya agregados por colaborador y día; el detalle se pide por día
+        rendimientos = resumen_colaborador_dia(
+            cursor, id_sucursal,
+            fecha_inicio=request.args.get('fecha_inicio'),
+            fecha_fin=request.args.get('fecha_fin'),
+            id_colaborador=request.args.get('id_colaborador')
+        )
         
-        # Parámetros de filtrado
-        id_colaborador = request.args.get('id_colaborador')
-        fecha_inicio = request.args.get('fecha_inicio')
-        fecha_fin = request.args.get('fecha_fin')
-        
-        # Construir query para obtener actividades agrupadas por colaborador y día
-        sql = """
-            SELECT 
-                c.id as id_colaborador,
-                CONCAT(c.nombre, ' ', c.apellido_paterno, 
-                       CASE WHEN c.apellido_materno IS NOT NULL THEN CONCAT(' ', c.apellido_materno) ELSE '' END) as colaborador,
-                a.fecha,
-                DAYNAME(a.fecha) as nombre_dia,
-                SUM(rp.horas_trabajadas) as total_horas_trabajadas,
-                SUM(rp.horas_extras) as total_horas_extras,
-                h.horas_dia as horas_esperadas,
-                (SUM(rp.horas_trabajadas) - h.horas_dia) as diferencia_horas,
-                CASE 
-                    WHEN SUM(rp.horas_trabajadas) > h.horas_dia THEN 'MÁS'
-                    WHEN SUM(rp.horas_trabajadas) < h.horas_dia THEN 'MENOS'
-                    ELSE 'EXACTO'
-                END as estado_trabajo,
-                COUNT(DISTINCT a.id) as cantidad_actividades,
-                JSON_ARRAYAGG(
-                    JSON_OBJECT(
-                        'id_rendimiento', rp.id,
-                        'id_actividad', a.id,
-                        'labor', l.nombre,
-                        'ceco', CASE 
-                            WHEN rp.id_ceco IS NOT NULL THEN (SELECT ce.nombre FROM general_dim_ceco ce WHERE ce.id = rp.id_ceco)
-                            WHEN a.id_tipoceco = 1 THEN (SELECT ce.nombre FROM tarja_fact_cecoadministrativo ca JOIN general_dim_ceco ce ON ca.id_ceco = ce.id WHERE ca.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 2 THEN (SELECT ce.nombre FROM tarja_fact_cecoproductivo cp JOIN general_dim_ceco ce ON cp.id_ceco = ce.id WHERE cp.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 3 THEN (SELECT ce.nombre FROM tarja_fact_cecomaquinaria cm JOIN general_dim_ceco ce ON cm.id_ceco = ce.id WHERE cm.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 4 THEN (SELECT ce.nombre FROM tarja_fact_cecoinversion ci JOIN general_dim_ceco ce ON ci.id_ceco = ce.id WHERE ci.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 5 THEN (SELECT ce.nombre FROM tarja_fact_cecoriego cr JOIN general_dim_ceco ce ON cr.id_ceco = ce.id WHERE cr.id_actividad = a.id LIMIT 1)
-                            ELSE NULL
-                        END,
-                        'nombre_ceco', CASE 
-                            WHEN rp.id_ceco IS NOT NULL THEN (SELECT ce.nombre FROM general_dim_ceco ce WHERE ce.id = rp.id_ceco)
-                            WHEN a.id_tipoceco = 1 THEN (SELECT ce.nombre FROM tarja_fact_cecoadministrativo ca JOIN general_dim_ceco ce ON ca.id_ceco = ce.id WHERE ca.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 2 THEN (SELECT ce.nombre FROM tarja_fact_cecoproductivo cp JOIN general_dim_ceco ce ON cp.id_ceco = ce.id WHERE cp.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 3 THEN (SELECT ce.nombre FROM tarja_fact_cecomaquinaria cm JOIN general_dim_ceco ce ON cm.id_ceco = ce.id WHERE cm.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 4 THEN (SELECT ce.nombre FROM tarja_fact_cecoinversion ci JOIN general_dim_ceco ce ON ci.id_ceco = ce.id WHERE ci.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 5 THEN (SELECT ce.nombre FROM tarja_fact_cecoriego cr JOIN general_dim_ceco ce ON cr.id_ceco = ce.id WHERE cr.id_actividad = a.id LIMIT 1)
-                            ELSE NULL
-                        END,
-                        'id_ceco', COALESCE(rp.id_ceco, 
-                            CASE 
-                                WHEN a.id_tipoceco = 1 THEN (SELECT ca.id_ceco FROM tarja_fact_cecoadministrativo ca WHERE ca.id_actividad = a.id LIMIT 1)
-                                WHEN a.id_tipoceco = 2 THEN (SELECT cp.id_ceco FROM tarja_fact_cecoproductivo cp WHERE cp.id_actividad = a.id LIMIT 1)
-                                WHEN a.id_tipoceco = 3 THEN (SELECT cm.id_ceco FROM tarja_fact_cecomaquinaria cm WHERE cm.id_actividad = a.id LIMIT 1)
-                                WHEN a.id_tipoceco = 4 THEN (SELECT ci.id_ceco FROM tarja_fact_cecoinversion ci WHERE ci.id_actividad = a.id LIMIT 1)
-                                WHEN a.id_tipoceco = 5 THEN (SELECT cr.id_ceco FROM tarja_fact_cecoriego cr WHERE cr.id_actividad = a.id LIMIT 1)
-                                ELSE NULL
-                            END),
-                        'horas_trabajadas', rp.horas_trabajadas,
-                        'horas_extras', rp.horas_extras,
-                        'rendimiento', rp.rendimiento,
-                        'hora_inicio', a.hora_inicio,
-                        'hora_fin', a.hora_fin,
-                        'id_bono', rp.id_bono,
-                        'nombre_bono', b.nombre
-                    )
-                ) as actividades_detalle
-            FROM tarja_fact_rendimientopropio rp
-            INNER JOIN tarja_fact_actividad a ON rp.id_actividad = a.id
-            INNER JOIN general_dim_colaborador c ON rp.id_colaborador = c.id
-            INNER JOIN general_dim_sucursal s ON c.id_sucursal = s.id
-            LEFT JOIN general_dim_labor l ON a.id_labor = l.id
-            LEFT JOIN general_dim_bono b ON rp.id_bono = b.id
-            LEFT JOIN tarja_dim_horaspordia h ON h.id_empresa = s.id_empresa 
-                AND h.nombre_dia = CASE 
-                    WHEN DAYNAME(a.fecha) = 'Monday' THEN 'Lunes'
-                    WHEN DAYNAME(a.fecha) = 'Tuesday' THEN 'Martes'
-                    WHEN DAYNAME(a.fecha) = 'Wednesday' THEN 'Miércoles'
-                    WHEN DAYNAME(a.fecha) = 'Thursday' THEN 'Jueves'
-                    WHEN DAYNAME(a.fecha) = 'Friday' THEN 'Viernes'
-                    WHEN DAYNAME(a.fecha) = 'Saturday' THEN 'Sábado'
-                    WHEN DAYNAME(a.fecha) = 'Sunday' THEN 'Domingo'
-                END
-            WHERE c.id_sucursal = %s
-        """
-        params = [id_sucursal]
-        
-        # Agregar filtros
-        if fecha_inicio:
-            sql += " AND a.fecha >= %s"
-            params.append(fecha_inicio)
+        cursor.close()
+        conn.close()
         
-        if fecha_fin:
-            sql += " AND a.fecha <= %s"
-            params.append(fecha_fin)
+        return jsonify(rendimientos), 200
         
-        if id_colaborador:
-            sql += " AND c.id = %s"
-            params.append(id_colaborador)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Obtener los rendimientos propios de un colaborador en un día
+@horas_extras_bp.route('/rendimientos/<string:id_colaborador>/<string:fecha>', methods=['GET'])
+@jwt_required()
+def obtener_rendimientos_colaborador_dia(id_colaborador, fecha):
+    try:
+        usuario_id = get_jwt_identity()
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
         
-        # Agrupar por colaborador y fecha
-        sql += " GROUP BY c.id, c.nombre, c.apellido_paterno, c.apellido_materno, a.fecha, h.horas_dia ORDER BY a.fecha DESC, c.nombre ASC"
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
+            return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        cursor.execute(sql, tuple(params))
-        rendimientos = cursor.fetchall()
+        detalle = detalle_colaborador_dia(cursor, id_sucursal, id_colaborador, fecha)
         
         cursor.close()
         conn.close()
         
-        return jsonify(rendimientos), 200
+        return jsonify(detalle), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -144,12 +74,10 @@ def obtener_rendimiento_propio(rendimiento_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Obtener rendimiento específico
         cursor.execute("""
@@ -162,14 +90,7 @@ def obtener_rendimiento_propio(rendimiento_id):
                 rp.horas_extras,
                 rp.id_bono,
                 l.nombre as labor,
-                CASE 
-                    WHEN a.id_tipoceco = 1 THEN (SELECT ce.nombre FROM tarja_fact_cecoadministrativo ca JOIN general_dim_ceco ce ON ca.id_ceco = ce.id WHERE ca.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 2 THEN (SELECT ce.nombre FROM tarja_fact_cecoproductivo cp JOIN general_dim_ceco ce ON cp.id_ceco = ce.id WHERE cp.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 3 THEN (SELECT ce.nombre FROM tarja_fact_cecomaquinaria cm JOIN general_dim_ceco ce ON cm.id_ceco = ce.id WHERE cm.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 4 THEN (SELECT ce.nombre FROM tarja_fact_cecoinversion ci JOIN general_dim_ceco ce ON ci.id_ceco = ce.id WHERE ci.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 5 THEN (SELECT ce.nombre FROM tarja_fact_cecoriego cr JOIN general_dim_ceco ce ON cr.id_ceco = ce.id WHERE cr.id_actividad = a.id LIMIT 1)
-                    ELSE NULL
-                END as ceco,
+                ce.nombre as ceco,
                 a.fecha as fecha_actividad,
                 c.nombre as nombre_colaborador,
                 c.apellido_paterno,
@@ -180,6 +101,8 @@ def obtener_rendimiento_propio(rendimiento_id):
             INNER JOIN general_dim_colaborador c ON rp.id_colaborador = c.id
             LEFT JOIN general_dim_labor l ON a.id_labor = l.id
             LEFT JOIN general_dim_bono b ON rp.id_bono = b.id
+            LEFT JOIN tarja_fact_actividad_ceco ac ON ac.id_actividad = a.id
+            LEFT JOIN general_dim_ceco ce ON ce.id = ac.id_ceco
             WHERE rp.id = %s AND c.id_sucursal = %s
         """, (rendimiento_id, id_sucursal))
         
@@ -215,12 +138,10 @@ def asignar_horas_extras(rendimiento_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que el rendimiento existe y pertenece a la sucursal
         cursor.execute("""
@@ -238,6 +159,8 @@ def asignar_horas_extras(rendimiento_id):
             SET horas_extras = %s
             WHERE id = %s
         """, (horas_extras, rendimiento_id))
+        registrar_cambio(cursor, 'rendimiento_propio', rendimiento_id)
+        refrescar_dias_de_rendimientos(cursor, rendimiento_id)
         
         conn.commit()
         cursor.close()
@@ -258,12 +181,10 @@ def obtener_actividades_colaborador(id_colaborador):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que el colaborador pertenece a la sucursal
         cursor.execute("""
@@ -280,14 +201,7 @@ def obtener_actividades_colaborador(id_colaborador):
                 a.id,
                 l.nombre as labor,
                 a.fecha,
-                CASE 
-                    WHEN a.id_tipoceco = 1 THEN (SELECT ce.nombre FROM tarja_fact_cecoadministrativo ca JOIN general_dim_ceco ce ON ca.id_ceco = ce.id WHERE ca.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 2 THEN (SELECT ce.nombre FROM tarja_fact_cecoproductivo cp JOIN general_dim_ceco ce ON cp.id_ceco = ce.id WHERE cp.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 3 THEN (SELECT ce.nombre FROM tarja_fact_cecomaquinaria cm JOIN general_dim_ceco ce ON cm.id_ceco = ce.id WHERE cm.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 4 THEN (SELECT ce.nombre FROM tarja_fact_cecoinversion ci JOIN general_dim_ceco ce ON ci.id_ceco = ce.id WHERE ci.id_actividad = a.id LIMIT 1)
-                    WHEN a.id_tipoceco = 5 THEN (SELECT ce.nombre FROM tarja_fact_cecoriego cr JOIN general_dim_ceco ce ON cr.id_ceco = ce.id WHERE cr.id_actividad = a.id LIMIT 1)
-                    ELSE NULL
-                END as ceco,
+                ce.nombre as ceco,
                 rp.id as rendimiento_id,
                 rp.rendimiento,
                 rp.horas_trabajadas,
@@ -295,6 +209,8 @@ def obtener_actividades_colaborador(id_colaborador):
             FROM tarja_fact_actividad a
             LEFT JOIN general_dim_labor l ON a.id_labor = l.id
             LEFT JOIN tarja_fact_rendimientopropio rp ON a.id = rp.id_actividad AND rp.id_colaborador = %s
+            LEFT JOIN tarja_fact_actividad_ceco ac ON ac.id_actividad = a.id
+            LEFT JOIN general_dim_ceco ce ON ce.id = ac.id_ceco
             WHERE a.id_usuario = %s
             ORDER BY a.fecha DESC
         """, (id_colaborador, id_colaborador))
@@ -326,12 +242,10 @@ def crear_rendimiento_propio():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que el colaborador pertenece a la sucursal
         cursor.execute("""
@@ -376,9 +290,11 @@ def crear_rendimiento_propio():
             data['id_colaborador'],
             data['rendimiento'],
             data['horas_trabajadas'],
-            data.get('horas_extras', 0),
+            valor_columna_rendimiento(TIPOS_RENDIMIENTO['propio'], data, 'horas_extras'),
             data.get('id_bono')
         ))
+        registrar_cambio(cursor, 'rendimiento_propio', rendimiento_id)
+        refrescar_dias_de_rendimientos(cursor, rendimiento_id)
         
         conn.commit()
         cursor.close()
@@ -394,16 +310,7 @@ def crear_rendimiento_propio():
 @jwt_required()
 def obtener_bonos():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("SELECT id, nombre FROM general_dim_bono ORDER BY nombre ASC")
-        bonos = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify(bonos), 200
+        return respuesta_catalogo('bonos')
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1,6 +1,9 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.db import get_db_connection
+from utils.paralelo import consultar_en_paralelo
+from utils.sucursal import obtener_sucursal_activa
+from utils.catalogos import respuesta_catalogo
 import uuid
 from datetime import datetime
 
@@ -16,12 +19,10 @@ def listar_horas_extras_otroscecos():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Parámetros de filtrado
         id_colaborador = request.args.get('id_colaborador')
@@ -95,12 +96,10 @@ def obtener_horas_extras_otroscecos(he_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Obtener horas extras específicas
         cursor.execute("""
@@ -157,12 +156,10 @@ def crear_horas_extras_otroscecos():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que el colaborador pertenece a la sucursal
         cursor.execute("""
@@ -265,12 +262,10 @@ def editar_horas_extras_otroscecos(he_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que las horas extras existen y pertenecen a la sucursal
         cursor.execute("""
@@ -342,12 +337,10 @@ def eliminar_horas_extras_otroscecos(he_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que las horas extras existen y pertenecen a la sucursal
         cursor.execute("""
@@ -377,17 +370,8 @@ def eliminar_horas_extras_otroscecos(he_id):
 @jwt_required()
 def obtener_tipos_ceco():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Obtener tipos de CECO
-        cursor.execute("SELECT id, nombre FROM general_dim_cecotipo ORDER BY nombre")
-        tipos_ceco = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify(tipos_ceco), 200
+        # Obtener tipos de CECO (catálogo en caché)
+        return respuesta_catalogo('tipos_ceco')
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -402,13 +386,11 @@ def obtener_cecos_por_tipo(id_tipo_ceco):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener la sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
         
-        if not usuario or usuario['id_sucursalactiva'] is None:
+        if id_sucursal is None:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Obtener CECOs del tipo seleccionado y de la sucursal del usuario
         cursor.execute("""
@@ -432,24 +414,13 @@ def obtener_cecos_por_tipo(id_tipo_ceco):
 @jwt_required()
 def obtener_opciones_horas_extras_otroscecos():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Obtener tipos de CECO
-        cursor.execute("SELECT id, nombre FROM general_dim_cecotipo ORDER BY nombre")
-        tipos_ceco = cursor.fetchall()
-        
-        # Obtener CECOs
-        cursor.execute("SELECT id, nombre FROM general_dim_ceco ORDER BY nombre")
-        cecos = cursor.fetchall()
+        # Tipos de CECO y CECOs se consultan en paralelo
+        opciones = consultar_en_paralelo({
+            'tipos_ceco': ("SELECT id, nombre FROM general_dim_cecotipo ORDER BY nombre", None),
+            'cecos': ("SELECT id, nombre FROM general_dim_ceco ORDER BY nombre", None),
+        })
         
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            'tipos_ceco': tipos_ceco,
-            'cecos': cecos
-        }), 200
+        return jsonify(opciones), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1,12 +1,15 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.db import get_db_connection
+from utils.sucursal import obtener_sucursal_activa
+from utils.cambios import registrar_cambio
+from utils.colaborador_dia import refrescar_dias_de_rendimientos, resumen_colaborador_dia, detalle_colaborador_dia
 import uuid
 from datetime import datetime, date
 
 horas_trabajadas_bp = Blueprint('horas_trabajadas_bp', __name__)
 
-# Obtener resumen de horas diarias por colaborador desde rendimiento propio
+# Obtener resumen de horas diarias por colaborador (desde tarja_colaborador_dia)
 @horas_trabajadas_bp.route('/resumen-diario-colaborador', methods=['GET'])
 @jwt_required()
 def obtener_resumen_horas_diarias_colaborador():
@@ -16,113 +19,18 @@ def obtener_resumen_horas_diarias_colaborador():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener la sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
         
-        if not usuario or usuario['id_sucursalactiva'] is None:
+        if id_sucursal is None:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
-        
-        # Parámetros de filtrado
-        fecha_inicio = request.args.get('fecha_inicio')
-        fecha_fin = request.args.get('fecha_fin')
-        id_colaborador = request.args.get('id_colaborador')
-        
-        # Construir consulta para obtener actividades agrupadas por colaborador y día
-        sql = """
-            SELECT 
-                c.id as id_colaborador,
-                CONCAT(c.nombre, ' ', c.apellido_paterno, 
-                       CASE WHEN c.apellido_materno IS NOT NULL THEN CONCAT(' ', c.apellido_materno) ELSE '' END) as colaborador,
-                a.fecha,
-                DAYNAME(a.fecha) as nombre_dia,
-                SUM(rp.horas_trabajadas) as total_horas_trabajadas,
-                SUM(rp.horas_extras) as total_horas_extras,
-                h.horas_dia as horas_esperadas,
-                (SUM(rp.horas_trabajadas) - h.horas_dia) as diferencia_horas,
-                CASE 
-                    WHEN SUM(rp.horas_trabajadas) > h.horas_dia THEN 'MÁS'
-                    WHEN SUM(rp.horas_trabajadas) < h.horas_dia THEN 'MENOS'
-                    ELSE 'EXACTO'
-                END as estado_trabajo,
-                COUNT(DISTINCT a.id) as cantidad_actividades,
-                JSON_ARRAYAGG(
-                    JSON_OBJECT(
-                        'id_actividad', a.id,
-                        'rendimiento_id', rp.id,
-                        'labor', l.nombre,
-                        'ceco', CASE 
-                            WHEN rp.id_ceco IS NOT NULL THEN (SELECT ce.nombre FROM general_dim_ceco ce WHERE ce.id = rp.id_ceco)
-                            WHEN a.id_tipoceco = 1 THEN (SELECT ce.nombre FROM tarja_fact_cecoadministrativo ca JOIN general_dim_ceco ce ON ca.id_ceco = ce.id WHERE ca.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 2 THEN (SELECT ce.nombre FROM tarja_fact_cecoproductivo cp JOIN general_dim_ceco ce ON cp.id_ceco = ce.id WHERE cp.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 3 THEN (SELECT ce.nombre FROM tarja_fact_cecomaquinaria cm JOIN general_dim_ceco ce ON cm.id_ceco = ce.id WHERE cm.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 4 THEN (SELECT ce.nombre FROM tarja_fact_cecoinversion ci JOIN general_dim_ceco ce ON ci.id_ceco = ce.id WHERE ci.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 5 THEN (SELECT ce.nombre FROM tarja_fact_cecoriego cr JOIN general_dim_ceco ce ON cr.id_ceco = ce.id WHERE cr.id_actividad = a.id LIMIT 1)
-                            ELSE NULL
-                        END,
-                        'nombre_ceco', CASE 
-                            WHEN rp.id_ceco IS NOT NULL THEN (SELECT ce.nombre FROM general_dim_ceco ce WHERE ce.id = rp.id_ceco)
-                            WHEN a.id_tipoceco = 1 THEN (SELECT ce.nombre FROM tarja_fact_cecoadministrativo ca JOIN general_dim_ceco ce ON ca.id_ceco = ce.id WHERE ca.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 2 THEN (SELECT ce.nombre FROM tarja_fact_cecoproductivo cp JOIN general_dim_ceco ce ON cp.id_ceco = ce.id WHERE cp.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 3 THEN (SELECT ce.nombre FROM tarja_fact_cecomaquinaria cm JOIN general_dim_ceco ce ON cm.id_ceco = ce.id WHERE cm.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 4 THEN (SELECT ce.nombre FROM tarja_fact_cecoinversion ci JOIN general_dim_ceco ce ON ci.id_ceco = ce.id WHERE ci.id_actividad = a.id LIMIT 1)
-                            WHEN a.id_tipoceco = 5 THEN (SELECT ce.nombre FROM tarja_fact_cecoriego cr JOIN general_dim_ceco ce ON cr.id_ceco = ce.id WHERE cr.id_actividad = a.id LIMIT 1)
-                            ELSE NULL
-                        END,
-                        'id_ceco', COALESCE(rp.id_ceco, 
-                            CASE 
-                                WHEN a.id_tipoceco = 1 THEN (SELECT ca.id_ceco FROM tarja_fact_cecoadministrativo ca WHERE ca.id_actividad = a.id LIMIT 1)
-                                WHEN a.id_tipoceco = 2 THEN (SELECT cp.id_ceco FROM tarja_fact_cecoproductivo cp WHERE cp.id_actividad = a.id LIMIT 1)
-                                WHEN a.id_tipoceco = 3 THEN (SELECT cm.id_ceco FROM tarja_fact_cecomaquinaria cm WHERE cm.id_actividad = a.id LIMIT 1)
-                                WHEN a.id_tipoceco = 4 THEN (SELECT ci.id_ceco FROM tarja_fact_cecoinversion ci WHERE ci.id_actividad = a.id LIMIT 1)
-                                WHEN a.id_tipoceco = 5 THEN (SELECT cr.id_ceco FROM tarja_fact_cecoriego cr WHERE cr.id_actividad = a.id LIMIT 1)
-                                ELSE NULL
-                            END),
-                        'horas_trabajadas', rp.horas_trabajadas,
-                        'horas_extras', rp.horas_extras,
-                        'rendimiento', rp.rendimiento,
-                        'hora_inicio', a.hora_inicio,
-                        'hora_fin', a.hora_fin
-                    )
-                ) as actividades_detalle
-            FROM tarja_fact_rendimientopropio rp
-            INNER JOIN tarja_fact_actividad a ON rp.id_actividad = a.id
-            INNER JOIN general_dim_colaborador c ON rp.id_colaborador = c.id
-            INNER JOIN general_dim_sucursal s ON c.id_sucursal = s.id
-            LEFT JOIN general_dim_labor l ON a.id_labor = l.id
-            LEFT JOIN tarja_dim_horaspordia h ON h.id_empresa = s.id_empresa 
-                AND h.nombre_dia = CASE 
-                    WHEN DAYNAME(a.fecha) = 'Monday' THEN 'Lunes'
-                    WHEN DAYNAME(a.fecha) = 'Tuesday' THEN 'Martes'
-                    WHEN DAYNAME(a.fecha) = 'Wednesday' THEN 'Miércoles'
-                    WHEN DAYNAME(a.fecha) = 'Thursday' THEN 'Jueves'
-                    WHEN DAYNAME(a.fecha) = 'Friday' THEN 'Viernes'
-                    WHEN DAYNAME(a.fecha) = 'Saturday' THEN 'Sábado'
-                    WHEN DAYNAME(a.fecha) = 'Sunday' THEN 'Domingo'
-                END
-            WHERE c.id_sucursal = %s
-        """
-        params = [id_sucursal]
-        
-        # Agregar filtros
-        if fecha_inicio:
-            sql += " AND a.fecha >= %s"
-            params.append(fecha_inicio)
-        
-        if fecha_fin:
-            sql += " AND a.fecha <= %s"
-            params.append(fecha_fin)
-        
-        if id_colaborador:
-            sql += " AND c.id = %s"
-            params.append(id_colaborador)
-        
-        # Agrupar por colaborador y fecha
-        sql += " GROUP BY c.id, c.nombre, c.apellido_paterno, c.apellido_materno, a.fecha, h.horas_dia ORDER BY a.fecha DESC, c.nombre ASC"
-        
-        cursor.execute(sql, tuple(params))
-        resultados = cursor.fetchall()
+        # Totales ya agregados por colaborador y día; el detalle se pide por día
+        resultados = resumen_colaborador_dia(
+            cursor, id_sucursal,
+            fecha_inicio=request.args.get('fecha_inicio'),
+            fecha_fin=request.args.get('fecha_fin'),
+            id_colaborador=request.args.get('id_colaborador')
+        )
         
         cursor.close()
         conn.close()
@@ -132,6 +40,32 @@ def obtener_resumen_horas_diarias_colaborador():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Obtener el detalle de actividades de un colaborador en un día
+@horas_trabajadas_bp.route('/resumen-diario-colaborador/<string:id_colaborador>/<string:fecha>', methods=['GET'])
+@jwt_required()
+def obtener_detalle_horas_diarias_colaborador(id_colaborador, fecha):
+    try:
+        usuario_id = get_jwt_identity()
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if id_sucursal is None:
+            return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
+        
+        detalle = detalle_colaborador_dia(cursor, id_sucursal, id_colaborador, fecha)
+        # Nombre del id que usaba actividades_detalle en este endpoint
+        for fila in detalle:
+            fila['rendimiento_id'] = fila['id_rendimiento']
+        
+        cursor.close()
+        conn.close()
+        
+        return jsonify(detalle), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # Editar horas trabajadas de un colaborador
 @horas_trabajadas_bp.route('/editar/<string:rendimiento_id>', methods=['PUT'])
 @jwt_required()
@@ -158,13 +92,11 @@ def editar_horas_trabajadas(rendimiento_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener la sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
         
-        if not usuario or usuario['id_sucursalactiva'] is None:
+        if id_sucursal is None:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Buscar el rendimiento por su ID y verificar permisos de sucursal
         cursor.execute("""
@@ -187,6 +119,8 @@ def editar_horas_trabajadas(rendimiento_id):
             SET horas_trabajadas = %s, horas_extras = %s
             WHERE id = %s
         """, (horas_trabajadas, horas_extras, rendimiento_id))
+        registrar_cambio(cursor, 'rendimiento_propio', rendimiento_id)
+        refrescar_dias_de_rendimientos(cursor, rendimiento_id)
         
         conn.commit()
         cursor.close()
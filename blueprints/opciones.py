@@ -1,6 +1,11 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.db import get_db_connection
+from utils.sucursal import obtener_sucursal_activa
+from utils.ceco import refrescar_ceco_actividad, id_actividad_de_ceco
+from utils.cambios import registrar_cambio
+from utils.catalogos import obtener_catalogos, calcular_etag, respuesta_con_etag, respuesta_catalogo
+from blueprints.auth import sucursales_de_usuario
 #from blueprints.auth import token_requerido
 import uuid
 
@@ -13,26 +18,17 @@ def opciones_root():
     if request.method == 'OPTIONS':
         return '', 200
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        cursor.execute("SELECT id, nombre FROM general_dim_labor ORDER BY nombre ASC")
-        labores = cursor.fetchall() or []
-
-        cursor.execute("SELECT id, nombre FROM tarja_dim_unidad WHERE id_estado = 1 ORDER BY nombre ASC")
-        unidades = cursor.fetchall() or []
-
-        cursor.execute("SELECT id, nombre FROM general_dim_cecotipo ORDER BY nombre ASC")
-        tipoCecos = cursor.fetchall() or []
-
-        cursor.close()
-        conn.close()
+        # Los catálogos vencidos en caché se consultan en paralelo
+        catalogos = obtener_catalogos('labores', 'unidades', 'tipos_ceco')
+        labores, etag_labores = catalogos['labores']
+        unidades, etag_unidades = catalogos['unidades']
+        tipoCecos, etag_tipos = catalogos['tipos_ceco']
 
-        return jsonify({
+        return respuesta_con_etag({
             "labores": labores,
             "unidades": unidades,
             "tipoCecos": tipoCecos
-        }), 200
+        }, calcular_etag([etag_labores, etag_unidades, etag_tipos]))
     except Exception as e:
         return jsonify({
             "labores": [],
@@ -49,31 +45,15 @@ def obtener_especies():
         return '', 200
     try:
         usuario_id = get_jwt_identity()
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
 
         # 🔹 Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
 
-        if not usuario or not usuario['id_sucursalactiva']:
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
 
-        # Obtener todas las especies
-        cursor.execute("""
-            SELECT id, nombre, caja_equivalente
-            FROM general_dim_especie 
-            ORDER BY nombre ASC
-        """)
-
-        especies = cursor.fetchall()
-        cursor.close()
-        conn.close()
-
-        if not especies:
-            return jsonify([]), 200
-
-        return jsonify(especies), 200
+        # Obtener todas las especies (catálogo en caché)
+        return respuesta_catalogo('especies')
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -100,6 +80,26 @@ def obtener_variedades_filtradas():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
+def _cecos_sucursal(cursor, id_sucursal):
+    cursor.execute("""
+        SELECT c.id, c.nombre, c.id_cecotipo, t.nombre as nombre_tipo
+        FROM general_dim_ceco c
+        LEFT JOIN general_dim_cecotipo t ON c.id_cecotipo = t.id
+        WHERE c.id_sucursal = %s
+        ORDER BY c.nombre ASC
+    """, (id_sucursal,))
+    return cursor.fetchall()
+
+def _contratistas_sucursal(cursor, id_sucursal):
+    cursor.execute("""
+        SELECT DISTINCT c.id, c.nombre, c.rut, c.codigo_verificador
+        FROM general_dim_contratista c
+        JOIN general_pivot_contratista_sucursal p ON c.id = p.id_contratista
+        WHERE p.id_sucursal = %s AND c.id_estado = 1
+        ORDER BY c.nombre ASC
+    """, (id_sucursal,))
+    return cursor.fetchall()
+
     # Obtener cecos
 @opciones_bp.route('/cecos', methods=['GET', 'OPTIONS'])
 @jwt_required()
@@ -112,24 +112,14 @@ def obtener_cecos():
         cursor = conn.cursor(dictionary=True)
 
         # 🔹 Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
 
-        if not usuario or not usuario['id_sucursalactiva']:
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
 
-        id_sucursal = usuario['id_sucursalactiva']
 
         # Obtener CECOs según sucursal activa
-        cursor.execute("""
-            SELECT c.id, c.nombre, c.id_cecotipo, t.nombre as nombre_tipo
-            FROM general_dim_ceco c
-            LEFT JOIN general_dim_cecotipo t ON c.id_cecotipo = t.id
-            WHERE c.id_sucursal = %s
-            ORDER BY c.nombre ASC
-        """, (id_sucursal,))
-
-        cecos = cursor.fetchall()
+        cecos = _cecos_sucursal(cursor, id_sucursal)
         cursor.close()
         conn.close()
 
@@ -145,24 +135,8 @@ def obtener_cecos():
 @jwt_required()
 def obtener_tipotrabajador():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Obtener tipos de trabajador
-        cursor.execute("""
-            SELECT id, nombre 
-            FROM general_dim_tipotrabajador 
-            ORDER BY nombre ASC
-        """)
-        
-        tipotrabajador = cursor.fetchall()
-        cursor.close()
-        conn.close()
-
-        if not tipotrabajador:
-            return jsonify([]), 200
-
-        return jsonify(tipotrabajador), 200
+        # Obtener tipos de trabajador (catálogo en caché)
+        return respuesta_catalogo('tipos_trabajador')
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -177,24 +151,14 @@ def obtener_contratistas():
         cursor = conn.cursor(dictionary=True)
 
         # 🔹 Obtener sucursal_activa del usuario autenticado
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
 
-        if not usuario or not usuario['id_sucursalactiva']:
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
 
-        id_sucursal = usuario['id_sucursalactiva']
 
         # 🔹 Obtener contratistas de la sucursal activa
-        cursor.execute("""
-            SELECT DISTINCT c.id, c.nombre, c.rut, c.codigo_verificador
-            FROM general_dim_contratista c
-            JOIN general_pivot_contratista_sucursal p ON c.id = p.id_contratista
-            WHERE p.id_sucursal = %s AND c.id_estado = 1
-            ORDER BY c.nombre ASC
-        """, (id_sucursal,))
-
-        contratistas = cursor.fetchall()
+        contratistas = _contratistas_sucursal(cursor, id_sucursal)
 
         cursor.close()
         conn.close()
@@ -212,24 +176,8 @@ def obtener_contratistas():
 @jwt_required()
 def obtener_tiporendimiento():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Obtener tipos de rendimiento
-        cursor.execute("""
-            SELECT id, nombre 
-            FROM tarja_dim_tiporendimiento 
-            ORDER BY nombre ASC
-        """)
-        
-        tiporendimiento = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        if not tiporendimiento:
-            return jsonify([]), 200
-            
-        return jsonify(tiporendimiento), 200
+        # Obtener tipos de rendimiento (catálogo en caché)
+        return respuesta_catalogo('tipos_rendimiento')
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -239,16 +187,55 @@ def obtener_tiporendimiento():
 @jwt_required()
 def obtener_porcentajes():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        return respuesta_catalogo('porcentajes')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        cursor.execute("SELECT id, porcentaje FROM Porcentaje_trabajador ORDER BY porcentaje ASC")
-        porcentajes = cursor.fetchall()
+# Todos los catálogos que necesita el cliente de tarjas en una sola respuesta.
+# El cliente puede enviar {"hashes": {"seccion": "hash"}} (POST) y solo recibe las secciones que cambiaron.
+@opciones_bp.route('/bootstrap', methods=['GET', 'POST'])
+@jwt_required()
+def bootstrap():
+    try:
+        usuario_id = get_jwt_identity()
+        hashes_cliente = {}
+        if request.method == 'POST':
+            cuerpo = request.get_json(silent=True) or {}
+            hashes_cliente = (cuerpo.get('hashes') if isinstance(cuerpo, dict) else None) or {}
+            if not isinstance(cuerpo, dict) or not isinstance(hashes_cliente, dict):
+                return jsonify({"error": "hashes debe ser un objeto {seccion: hash}"}), 400
+
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
+            return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
 
+        # Catálogos globales: desde la caché, con su hash ya calculado
+        secciones = obtener_catalogos(
+            'labores', 'unidades', 'tipos_ceco', 'especies', 'tipos_trabajador',
+            'tipos_rendimiento', 'porcentajes', 'bonos'
+        )
+
+        # Secciones que dependen de la sucursal o del usuario
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        por_sucursal = {
+            'cecos': _cecos_sucursal(cursor, id_sucursal),
+            'contratistas': _contratistas_sucursal(cursor, id_sucursal),
+            'sucursales': sucursales_de_usuario(cursor, usuario_id),
+        }
         cursor.close()
         conn.close()
+        for nombre, datos in por_sucursal.items():
+            secciones[nombre] = (datos, calcular_etag(datos))
 
-        return jsonify(porcentajes), 200
+        return jsonify({
+            "id_sucursal": id_sucursal,
+            "hashes": {nombre: etag for nombre, (_, etag) in secciones.items()},
+            "secciones": {
+                nombre: datos for nombre, (datos, etag) in secciones.items()
+                if hashes_cliente.get(nombre) != etag
+            }
+        }), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -262,14 +249,12 @@ def obtener_cecos_administrativos():
         cursor = conn.cursor(dictionary=True)
 
         # Obtener la sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             cursor.close()
             conn.close()
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
 
-        id_sucursal = usuario['id_sucursalactiva']
 
         # Obtener los CECOs administrativos de la sucursal activa
         cursor.execute("""
@@ -309,6 +294,9 @@ def crear_cecoadministrativo():
             data['id_ceco']
         ))
 
+        # Mantener el CECO resuelto de la actividad en la misma transacción
+        refrescar_ceco_actividad(cursor, data['id_actividad'])
+        registrar_cambio(cursor, 'actividad', data['id_actividad'])
         conn.commit()
         cursor.close()
         conn.close()
@@ -333,10 +321,14 @@ def eliminar_cecoadministrativo(id):
         cursor = conn.cursor()
         
         # Eliminar CECO administrativo
+        id_actividad = id_actividad_de_ceco(cursor, 'tarja_fact_cecoadministrativo', id)
         cursor.execute("DELETE FROM tarja_fact_cecoadministrativo WHERE id = %s", (id,))
+        eliminados = cursor.rowcount
+        refrescar_ceco_actividad(cursor, id_actividad)
+        registrar_cambio(cursor, 'actividad', id_actividad)
         conn.commit()
         
-        if cursor.rowcount == 0:
+        if eliminados == 0:
             cursor.close()
             conn.close()
             return jsonify({"error": "Ceco administrativo no encontrado"}), 404
@@ -402,6 +394,9 @@ def crear_cecoinversion():
             data['id_ceco']
         ))
 
+        # Mantener el CECO resuelto de la actividad en la misma transacción
+        refrescar_ceco_actividad(cursor, data['id_actividad'])
+        registrar_cambio(cursor, 'actividad', data['id_actividad'])
         conn.commit()
         cursor.close()
         conn.close()
@@ -426,10 +421,14 @@ def eliminar_cecoinversion(id):
         cursor = conn.cursor()
         
         # Eliminar CECO de inversión
+        id_actividad = id_actividad_de_ceco(cursor, 'tarja_fact_cecoinversion', id)
         cursor.execute("DELETE FROM tarja_fact_cecoinversion WHERE id = %s", (id,))
+        eliminados = cursor.rowcount
+        refrescar_ceco_actividad(cursor, id_actividad)
+        registrar_cambio(cursor, 'actividad', id_actividad)
         conn.commit()
         
-        if cursor.rowcount == 0:
+        if eliminados == 0:
             cursor.close()
             conn.close()
             return jsonify({"error": "Ceco inversión no encontrado"}), 404
@@ -495,6 +494,9 @@ def crear_cecomaquinaria():
             data['id_ceco']
         ))
 
+        # Mantener el CECO resuelto de la actividad en la misma transacción
+        refrescar_ceco_actividad(cursor, data['id_actividad'])
+        registrar_cambio(cursor, 'actividad', data['id_actividad'])
         conn.commit()
         cursor.close()
         conn.close()
@@ -519,10 +521,14 @@ def eliminar_cecomaquinaria(id):
         cursor = conn.cursor()
         
         # Eliminar CECO de maquinaria
+        id_actividad = id_actividad_de_ceco(cursor, 'tarja_fact_cecomaquinaria', id)
         cursor.execute("DELETE FROM tarja_fact_cecomaquinaria WHERE id = %s", (id,))
+        eliminados = cursor.rowcount
+        refrescar_ceco_actividad(cursor, id_actividad)
+        registrar_cambio(cursor, 'actividad', id_actividad)
         conn.commit()
         
-        if cursor.rowcount == 0:
+        if eliminados == 0:
             cursor.close()
             conn.close()
             return jsonify({"error": "Ceco maquinaria no encontrado"}), 404
@@ -591,6 +597,9 @@ def crear_cecoproductivo():
             data['id_ceco']
         ))
 
+        # Mantener el CECO resuelto de la actividad en la misma transacción
+        refrescar_ceco_actividad(cursor, data['id_actividad'])
+        registrar_cambio(cursor, 'actividad', data['id_actividad'])
         conn.commit()
         cursor.close()
         conn.close()
@@ -615,10 +624,14 @@ def eliminar_cecoproductivo(id):
         cursor = conn.cursor()
         
         # Eliminar CECO productivo
+        id_actividad = id_actividad_de_ceco(cursor, 'tarja_fact_cecoproductivo', id)
         cursor.execute("DELETE FROM tarja_fact_cecoproductivo WHERE id = %s", (id,))
+        eliminados = cursor.rowcount
+        refrescar_ceco_actividad(cursor, id_actividad)
+        registrar_cambio(cursor, 'actividad', id_actividad)
         conn.commit()
         
-        if cursor.rowcount == 0:
+        if eliminados == 0:
             cursor.close()
             conn.close()
             return jsonify({"error": "Ceco productivo no encontrado"}), 404
@@ -687,6 +700,9 @@ def crear_cecoriego():
             data['id_ceco']
         ))
 
+        # Mantener el CECO resuelto de la actividad en la misma transacción
+        refrescar_ceco_actividad(cursor, data['id_actividad'])
+        registrar_cambio(cursor, 'actividad', data['id_actividad'])
         conn.commit()
         cursor.close()
         conn.close()
@@ -711,10 +727,14 @@ def eliminar_cecoriego(id):
         cursor = conn.cursor()
         
         # Eliminar CECO de riego
+        id_actividad = id_actividad_de_ceco(cursor, 'tarja_fact_cecoriego', id)
         cursor.execute("DELETE FROM tarja_fact_cecoriego WHERE id = %s", (id,))
+        eliminados = cursor.rowcount
+        refrescar_ceco_actividad(cursor, id_actividad)
+        registrar_cambio(cursor, 'actividad', id_actividad)
         conn.commit()
         
-        if cursor.rowcount == 0:
+        if eliminados == 0:
             cursor.close()
             conn.close()
             return jsonify({"error": "Ceco riego no encontrado"}), 404
@@ -739,15 +759,7 @@ def obtener_tiposceco():
     if request.method == 'OPTIONS':
         return '', 200
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id, nombre FROM general_dim_cecotipo ORDER BY nombre ASC")
-        tipos = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        if not tipos:
-            return jsonify([]), 200
-        return jsonify(tipos), 200
+        return respuesta_catalogo('tipos_ceco')
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -771,13 +783,11 @@ def obtener_cecos_productivos():
         usuario_id = get_jwt_identity()
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             cursor.close()
             conn.close()
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
-        id_sucursal = usuario['id_sucursalactiva']
         cursor.execute("""
             SELECT id, nombre
             FROM general_dim_ceco
@@ -799,13 +809,11 @@ def obtener_cecos_maquinaria():
         usuario_id = get_jwt_identity()
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             cursor.close()
             conn.close()
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
-        id_sucursal = usuario['id_sucursalactiva']
         cursor.execute("""
             SELECT id, nombre
             FROM general_dim_ceco
@@ -827,13 +835,11 @@ def obtener_cecos_inversion():
         usuario_id = get_jwt_identity()
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             cursor.close()
             conn.close()
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
-        id_sucursal = usuario['id_sucursalactiva']
         cursor.execute("""
             SELECT id, nombre
             FROM general_dim_ceco
@@ -855,13 +861,11 @@ def obtener_cecos_riego():
         usuario_id = get_jwt_identity()
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             cursor.close()
             conn.close()
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
-        id_sucursal = usuario['id_sucursalactiva']
         cursor.execute("""
             SELECT id, nombre
             FROM general_dim_ceco
@@ -1089,18 +1093,7 @@ def obtener_cecosmaquinaria_por_actividad(id_actividad, id_tipomaquinaria, id_ma
 @jwt_required()
 def obtener_unidades():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id, nombre
-            FROM tarja_dim_unidad
-            WHERE id_estado = 1
-            ORDER BY nombre ASC
-        """)
-        unidades = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify(unidades), 200
+        return respuesta_catalogo('unidades')
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from utils.db import get_db_connection
+from utils.permisos import obtener_permisos, invalidar_permisos
 from datetime import datetime, date
 import uuid
 
@@ -11,33 +12,25 @@ def format_fecha(fecha):
         return fecha.strftime('%Y-%m-%d')
     return fecha
 
+# Tipo de rol según el nombre del permiso (el primero que coincida)
+TIPOS_ROL = [
+    ('revisador', 'revisador'),
+    ('aprobador', 'aprobador'),
+    ('gestionador', 'gestionador'),
+    ('admin', 'administrador'),
+]
+
+def tipo_rol(nombre):
+    nombre = (nombre or '').lower()
+    return next((tipo for patron, tipo in TIPOS_ROL if patron in nombre), 'otro')
+
 # 📌 Obtener permisos del usuario autenticado
 @permisos_bp.route('/usuario/actual', methods=['GET'])
 @jwt_required()
 def obtener_permisos_usuario_actual():
     try:
-        usuario_id = get_jwt_identity()
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Obtener permisos del usuario autenticado
-        cursor.execute("""
-            SELECT 
-                p.id,
-                p.nombre,
-                p.id_app,
-                p.id_estado
-            FROM usuario_dim_permiso p
-            JOIN usuario_pivot_permiso_usuario ppu ON p.id = ppu.id_permiso
-            WHERE ppu.id_usuario = %s AND p.id_estado = 1
-            ORDER BY p.nombre ASC
-        """, (usuario_id,))
-        permisos = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify(permisos), 200
+        contexto = obtener_permisos()
+        return jsonify(contexto.activos if contexto else []), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -46,31 +39,9 @@ def obtener_permisos_usuario_actual():
 @jwt_required()
 def verificar_permiso_usuario(nombre_permiso):
     try:
-        usuario_id = get_jwt_identity()
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Verificar si el usuario tiene el permiso específico
-        cursor.execute("""
-            SELECT 
-                p.id,
-                p.nombre,
-                p.id_app,
-                p.id_estado
-            FROM usuario_dim_permiso p
-            JOIN usuario_pivot_permiso_usuario ppu ON p.id = ppu.id_permiso
-            WHERE ppu.id_usuario = %s AND p.nombre = %s AND p.id_estado = 1
-        """, (usuario_id, nombre_permiso))
-        permiso = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
-        
-        if permiso:
-            return jsonify({"tiene_permiso": True, "permiso": permiso}), 200
-        else:
-            return jsonify({"tiene_permiso": False, "permiso": None}), 200
-            
+        contexto = obtener_permisos()
+        permiso = contexto.permiso(nombre_permiso) if contexto else None
+        return jsonify({"tiene_permiso": permiso is not None, "permiso": permiso}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -85,39 +56,17 @@ def verificar_multiples_permisos():
         if not permisos_a_verificar:
             return jsonify({"error": "Debe proporcionar una lista de permisos a verificar"}), 400
         
-        usuario_id = get_jwt_identity()
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Crear placeholders para la consulta IN
-        placeholders = ','.join(['%s'] * len(permisos_a_verificar))
-        
-        # Verificar múltiples permisos del usuario
-        cursor.execute(f"""
-            SELECT 
-                p.nombre,
-                p.id,
-                p.id_app,
-                p.id_estado
-            FROM usuario_dim_permiso p
-            JOIN usuario_pivot_permiso_usuario ppu ON p.id = ppu.id_permiso
-            WHERE ppu.id_usuario = %s AND p.nombre IN ({placeholders}) AND p.id_estado = 1
-        """, (usuario_id, *permisos_a_verificar))
-        
-        permisos_encontrados = cursor.fetchall()
-        nombres_permisos_encontrados = [p['nombre'] for p in permisos_encontrados]
+        contexto = obtener_permisos()
         
         # Crear respuesta con todos los permisos solicitados
         resultado = {}
         for permiso in permisos_a_verificar:
+            encontrado = contexto.permiso(permiso) if contexto else None
             resultado[permiso] = {
-                "tiene_permiso": permiso in nombres_permisos_encontrados,
-                "permiso": next((p for p in permisos_encontrados if p['nombre'] == permiso), None)
+                "tiene_permiso": encontrado is not None,
+                "permiso": encontrado
             }
         
-        cursor.close()
-        conn.close()
-        
         return jsonify(resultado), 200
         
     except Exception as e:
@@ -128,42 +77,13 @@ def verificar_multiples_permisos():
 @jwt_required()
 def obtener_roles_usuario():
     try:
-        usuario_id = get_jwt_identity()
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Obtener permisos del usuario agrupados por tipo de rol
-        cursor.execute("""
-            SELECT 
-                p.nombre,
-                p.id,
-                p.id_app,
-                p.id_estado,
-                CASE 
-                    WHEN p.nombre LIKE '%revisador%' THEN 'revisador'
-                    WHEN p.nombre LIKE '%aprobador%' THEN 'aprobador'
-                    WHEN p.nombre LIKE '%gestionador%' THEN 'gestionador'
-                    WHEN p.nombre LIKE '%admin%' THEN 'administrador'
-                    ELSE 'otro'
-                END as tipo_rol
-            FROM usuario_dim_permiso p
-            JOIN usuario_pivot_permiso_usuario ppu ON p.id = ppu.id_permiso
-            WHERE ppu.id_usuario = %s AND p.id_estado = 1
-            ORDER BY p.nombre ASC
-        """, (usuario_id,))
-        
-        permisos = cursor.fetchall()
+        contexto = obtener_permisos()
+        permisos = [dict(p, tipo_rol=tipo_rol(p['nombre'])) for p in (contexto.activos if contexto else [])]
         
         # Agrupar por tipo de rol
         roles = {}
         for permiso in permisos:
-            tipo_rol = permiso['tipo_rol']
-            if tipo_rol not in roles:
-                roles[tipo_rol] = []
-            roles[tipo_rol].append(permiso)
-        
-        cursor.close()
-        conn.close()
+            roles.setdefault(permiso['tipo_rol'], []).append(permiso)
         
         return jsonify({
             "roles": roles,
@@ -245,6 +165,7 @@ def asignar_permiso_usuario():
         """, (usuario_id, permiso_id))
         
         conn.commit()
+        invalidar_permisos(usuario_id)
         cursor.close()
         conn.close()
         
@@ -278,6 +199,7 @@ def remover_permiso_usuario():
             return jsonify({"error": "El usuario no tiene asignado este permiso"}), 404
         
         conn.commit()
+        invalidar_permisos(usuario_id)
         cursor.close()
         conn.close()
         
@@ -1,6 +1,10 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.db import get_db_connection
+from utils.sucursal import obtener_sucursal_activa
+from utils.ceco import nombres_ceco
+from utils.cambios import registrar_cambio
+from utils.colaborador_dia import refrescar_dias_de_rendimientos
 import uuid
 
 rendimientopropio_bp = Blueprint('rendimientopropio_bp', __name__)
@@ -14,27 +18,20 @@ def listar_rendimientos_propios_por_actividad(id_actividad):
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
-        id_sucursal = usuario['id_sucursalactiva']
         # Verificar que la actividad pertenece a la sucursal y obtener fecha, labor y CECO principal
         cursor.execute("""
             SELECT 
                 a.fecha, 
                 l.nombre AS labor,
                 a.id_estadoactividad,
-                COALESCE(cp.id_ceco, ci.id_ceco, cm.id_ceco, cr.id_ceco, ca.id_ceco) AS id_ceco
+                ac.id_ceco
             FROM tarja_fact_actividad a
             JOIN general_dim_labor l ON a.id_labor = l.id
-            LEFT JOIN tarja_fact_cecoproductivo cp ON a.id = cp.id_actividad
-            LEFT JOIN tarja_fact_cecoinversion ci ON a.id = ci.id_actividad
-            LEFT JOIN tarja_fact_cecomaquinaria cm ON a.id = cm.id_actividad
-            LEFT JOIN tarja_fact_cecoriego cr ON a.id = cr.id_actividad
-            LEFT JOIN tarja_fact_cecoadministrativo ca ON a.id = ca.id_actividad
+            LEFT JOIN tarja_fact_actividad_ceco ac ON ac.id_actividad = a.id
             WHERE a.id = %s AND a.id_sucursalactiva = %s
-            LIMIT 1
         """, (id_actividad, id_sucursal))
         actividad = cursor.fetchone()
         if not actividad:
@@ -43,25 +40,12 @@ def listar_rendimientos_propios_por_actividad(id_actividad):
         # if actividad['id_estadoactividad'] != 1:
         #     return jsonify({"rendimientos": []}), 200
         # Obtener nombre del CECO
-        nombre_ceco = None
-        if actividad['id_ceco']:
-            cursor.execute("SELECT nombre FROM general_dim_ceco WHERE id = %s", (actividad['id_ceco'],))
-            ceco = cursor.fetchone()
-            if ceco:
-                nombre_ceco = ceco['nombre']
+        nombre_ceco = nombres_ceco(cursor, [actividad['id_ceco']]).get(actividad['id_ceco'])
         # Obtener rendimientos propios
         cursor.execute("""
             SELECT r.id, r.id_colaborador, c.nombre as nombre_colaborador, c.apellido_paterno, c.apellido_materno,
                    r.horas_trabajadas, r.rendimiento, r.horas_extras, r.id_bono, r.id_ceco,
-                   COALESCE(ce.nombre, 
-                       CASE 
-                           WHEN a.id_tipoceco = 1 THEN (SELECT ce2.nombre FROM tarja_fact_cecoadministrativo ca2 JOIN general_dim_ceco ce2 ON ca2.id_ceco = ce2.id WHERE ca2.id_actividad = a.id LIMIT 1)
-                           WHEN a.id_tipoceco = 2 THEN (SELECT ce2.nombre FROM tarja_fact_cecoproductivo cp2 JOIN general_dim_ceco ce2 ON cp2.id_ceco = ce2.id WHERE cp2.id_actividad = a.id LIMIT 1)
-                           WHEN a.id_tipoceco = 3 THEN (SELECT ce2.nombre FROM tarja_fact_cecoinversion ci2 JOIN general_dim_ceco ce2 ON ci2.id_ceco = ce2.id WHERE ci2.id_actividad = a.id LIMIT 1)
-                           WHEN a.id_tipoceco = 4 THEN (SELECT ce2.nombre FROM tarja_fact_cecomaquinaria cm2 JOIN general_dim_ceco ce2 ON cm2.id_ceco = ce2.id WHERE cm2.id_actividad = a.id LIMIT 1)
-                           WHEN a.id_tipoceco = 5 THEN (SELECT ce2.nombre FROM tarja_fact_cecoriego cr2 JOIN general_dim_ceco ce2 ON cr2.id_ceco = ce2.id WHERE cr2.id_actividad = a.id LIMIT 1)
-                       END
-                   ) as nombre_ceco,
+                   COALESCE(ce.nombre, ce_act.nombre) as nombre_ceco,
                    sb.sueldobase,
                    sb.base_dia,
                    sb.hora_dia
@@ -69,6 +53,8 @@ def listar_rendimientos_propios_por_actividad(id_actividad):
             JOIN general_dim_colaborador c ON r.id_colaborador = c.id
             JOIN tarja_fact_actividad a ON r.id_actividad = a.id
             LEFT JOIN general_dim_ceco ce ON r.id_ceco = ce.id
+            LEFT JOIN tarja_fact_actividad_ceco ac ON ac.id_actividad = a.id
+            LEFT JOIN general_dim_ceco ce_act ON ce_act.id = ac.id_ceco
             LEFT JOIN rrhh_fact_sueldobase sb ON c.id_sueldobaseactivo = sb.id
             WHERE r.id_actividad = %s
             ORDER BY c.nombre, c.apellido_paterno, c.apellido_materno
@@ -127,6 +113,8 @@ def editar_rendimiento_propio(id_rendimiento):
             data.get('id_bono', rendimiento['id_bono']),
             id_rendimiento
         ))
+        registrar_cambio(cursor, 'rendimiento_propio', id_rendimiento)
+        refrescar_dias_de_rendimientos(cursor, id_rendimiento)
         conn.commit()
         cursor.close()
         conn.close()
@@ -143,35 +131,24 @@ def listar_actividades_sucursal_usuario():
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
-        id_sucursal = usuario['id_sucursalactiva']
         # Listar actividades de la sucursal con estado 1 (creada) y obtener el CECO principal
         cursor.execute("""
             SELECT a.id, a.fecha, l.nombre AS labor, a.id_estadoactividad, a.id_tipotrabajador,
-                   COALESCE(cp.id_ceco, ci.id_ceco, cm.id_ceco, cr.id_ceco, ca.id_ceco) AS id_ceco
+                   ac.id_ceco
             FROM tarja_fact_actividad a
             JOIN general_dim_labor l ON a.id_labor = l.id
-            LEFT JOIN tarja_fact_cecoproductivo cp ON a.id = cp.id_actividad
-            LEFT JOIN tarja_fact_cecoinversion ci ON a.id = ci.id_actividad
-            LEFT JOIN tarja_fact_cecomaquinaria cm ON a.id = cm.id_actividad
-            LEFT JOIN tarja_fact_cecoriego cr ON a.id = cr.id_actividad
-            LEFT JOIN tarja_fact_cecoadministrativo ca ON a.id = ca.id_actividad
+            LEFT JOIN tarja_fact_actividad_ceco ac ON ac.id_actividad = a.id
             WHERE a.id_sucursalactiva = %s AND a.id_estadoactividad = 1 AND a.id_tipotrabajador = 1 AND a.id_usuario = %s
             ORDER BY a.fecha DESC
         """, (id_sucursal, usuario_id))
         actividades = cursor.fetchall()
-        # Obtener nombre del CECO para cada actividad
+        # Nombres de CECO de todas las actividades en una sola consulta
+        nombres = nombres_ceco(cursor, (act['id_ceco'] for act in actividades))
         for act in actividades:
-            nombre_ceco = None
-            if act['id_ceco']:
-                cursor.execute("SELECT nombre FROM general_dim_ceco WHERE id = %s", (act['id_ceco'],))
-                ceco = cursor.fetchone()
-                if ceco:
-                    nombre_ceco = ceco['nombre']
-            act['ceco'] = nombre_ceco
+            act['ceco'] = nombres.get(act['id_ceco'])
             del act['id_ceco']
         cursor.close()
         conn.close()
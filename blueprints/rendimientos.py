@@ -1,6 +1,9 @@
 import datetime
 from flask import Blueprint, jsonify, request
 from utils.db import get_db_connection
+from utils.sucursal import obtener_sucursal_activa
+from utils.cambios import registrar_cambio, ELIMINACION, ENTIDAD_POR_TABLA_RENDIMIENTO
+from utils.colaborador_dia import dias_de_rendimientos, refrescar_colaborador_dia, refrescar_dias_de_rendimientos
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, date, timedelta
 from flask_cors import cross_origin
@@ -9,6 +12,76 @@ import uuid
 
 rendimientos_bp = Blueprint('rendimientos_bp', __name__)
 
+# Rendimientos de actividades según (id_tiporendimiento, id_tipotrabajador); el grupal no depende
+# del tipo de trabajador. {} recibe los marcadores de IN (...) de id_actividad
+SQL_RENDIMIENTOS_POR_TIPO = {
+    (1, 1): """
+        SELECT r.*, l.nombre AS labor, c.nombre AS colaborador, b.nombre AS bono,
+               COALESCE(ce.nombre, ce_act.nombre) as nombre_ceco
+        FROM tarja_fact_rendimientopropio r
+        LEFT JOIN tarja_fact_actividad a ON r.id_actividad = a.id
+        LEFT JOIN general_dim_labor l ON a.id_labor = l.id
+        LEFT JOIN general_dim_colaborador c ON r.id_colaborador = c.id
+        LEFT JOIN general_dim_bono b ON r.id_bono = b.id
+        LEFT JOIN general_dim_ceco ce ON r.id_ceco = ce.id
+        LEFT JOIN tarja_fact_actividad_ceco ac ON ac.id_actividad = a.id
+        LEFT JOIN general_dim_ceco ce_act ON ce_act.id = ac.id_ceco
+        WHERE r.id_actividad IN ({})
+    """,
+    (1, 2): """
+        SELECT r.*, l.nombre AS labor, t.nombre AS trabajador, p.porcentaje AS porcentaje_trabajador,
+               ac.id_ceco AS id_ceco,
+               ce.nombre as nombre_ceco
+        FROM tarja_fact_rendimientocontratista r
+        LEFT JOIN tarja_fact_actividad a ON r.id_actividad = a.id
+        LEFT JOIN general_dim_labor l ON a.id_labor = l.id
+        LEFT JOIN general_dim_trabajador t ON r.id_trabajador = t.id
+        LEFT JOIN general_dim_porcentajecontratista p ON r.id_porcentaje_individual = p.id
+        LEFT JOIN tarja_fact_actividad_ceco ac ON ac.id_actividad = a.id
+        LEFT JOIN general_dim_ceco ce ON ce.id = ac.id_ceco
+        WHERE r.id_actividad IN ({})
+    """,
+    (2, None): """
+        SELECT rg.*, a.id_labor, l.nombre AS labor, p.porcentaje AS porcentaje_grupal,
+               ac.id_ceco AS id_ceco,
+               ce.nombre as nombre_ceco
+        FROM tarja_fact_redimientogrupal rg
+        LEFT JOIN tarja_fact_actividad a ON rg.id_actividad = a.id
+        LEFT JOIN general_dim_labor l ON a.id_labor = l.id
+        LEFT JOIN general_dim_porcentajecontratista p ON rg.id_porcentaje = p.id
+        LEFT JOIN tarja_fact_actividad_ceco ac ON ac.id_actividad = a.id
+        LEFT JOIN general_dim_ceco ce ON ce.id = ac.id_ceco
+        WHERE rg.id_actividad IN ({})
+    """,
+}
+
+
+def _clave_tipo(actividad):
+    """Clave de SQL_RENDIMIENTOS_POR_TIPO para una actividad (None si el tipo no está soportado)"""
+    if actividad['id_tiporendimiento'] == 2:
+        return (2, None)
+    clave = (actividad['id_tiporendimiento'], actividad['id_tipotrabajador'])
+    return clave if clave in SQL_RENDIMIENTOS_POR_TIPO else None
+
+
+def rendimientos_de_actividades(cursor, actividades):
+    """
+    Devuelve {id_actividad: [rendimientos]} para filas de actividad con id, id_tiporendimiento e
+    id_tipotrabajador. Agrupa las actividades por tipo y hace una consulta por grupo.
+    """
+    resultado = {str(a['id']): [] for a in actividades}
+    grupos = {}
+    for actividad in actividades:
+        clave = _clave_tipo(actividad)
+        if clave:
+            grupos.setdefault(clave, []).append(actividad['id'])
+    for clave, ids in grupos.items():
+        cursor.execute(SQL_RENDIMIENTOS_POR_TIPO[clave].format(', '.join(['%s'] * len(ids))), tuple(ids))
+        for rendimiento in cursor.fetchall():
+            resultado[str(rendimiento['id_actividad'])].append(rendimiento)
+    return resultado
+
+
 # 🚀 Endpoint para obtener rendimientos según el tipo de la actividad
 @rendimientos_bp.route('/<string:id_actividad>', methods=['GET'])
 @cross_origin()
@@ -18,7 +91,7 @@ def obtener_rendimientos(id_actividad):
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id_tiporendimiento, id_tipotrabajador FROM tarja_fact_actividad WHERE id = %s", (id_actividad,))
+        cursor.execute("SELECT id, id_tiporendimiento, id_tipotrabajador FROM tarja_fact_actividad WHERE id = %s", (id_actividad,))
         actividad = cursor.fetchone()
         if not actividad:
             cursor.close()
@@ -26,82 +99,7 @@ def obtener_rendimientos(id_actividad):
             return jsonify({"error": "Actividad no encontrada"}), 404
         tipo = actividad['id_tiporendimiento']
         tipo_trabajador = actividad['id_tipotrabajador']
-        rendimientos = []
-        if tipo == 1:  # Individual
-            if tipo_trabajador == 1:  # Propio
-                cursor.execute("""
-                    SELECT r.*, l.nombre AS labor, c.nombre AS colaborador, b.nombre AS bono,
-                           COALESCE(ce.nombre, 
-                               CASE 
-                                   WHEN a.id_tipoceco = 1 THEN (SELECT ce2.nombre FROM tarja_fact_cecoadministrativo ca2 JOIN general_dim_ceco ce2 ON ca2.id_ceco = ce2.id WHERE ca2.id_actividad = a.id LIMIT 1)
-                                   WHEN a.id_tipoceco = 2 THEN (SELECT ce2.nombre FROM tarja_fact_cecoproductivo cp2 JOIN general_dim_ceco ce2 ON cp2.id_ceco = ce2.id WHERE cp2.id_actividad = a.id LIMIT 1)
-                                   WHEN a.id_tipoceco = 3 THEN (SELECT ce2.nombre FROM tarja_fact_cecoinversion ci2 JOIN general_dim_ceco ce2 ON ci2.id_ceco = ce2.id WHERE ci2.id_actividad = a.id LIMIT 1)
-                                   WHEN a.id_tipoceco = 4 THEN (SELECT ce2.nombre FROM tarja_fact_cecomaquinaria cm2 JOIN general_dim_ceco ce2 ON cm2.id_ceco = ce2.id WHERE cm2.id_actividad = a.id LIMIT 1)
-                                   WHEN a.id_tipoceco = 5 THEN (SELECT ce2.nombre FROM tarja_fact_cecoriego cr2 JOIN general_dim_ceco ce2 ON cr2.id_ceco = ce2.id WHERE cr2.id_actividad = a.id LIMIT 1)
-                               END
-                           ) as nombre_ceco
-                    FROM tarja_fact_rendimientopropio r
-                    LEFT JOIN tarja_fact_actividad a ON r.id_actividad = a.id
-                    LEFT JOIN general_dim_labor l ON a.id_labor = l.id
-                    LEFT JOIN general_dim_colaborador c ON r.id_colaborador = c.id
-                    LEFT JOIN general_dim_bono b ON r.id_bono = b.id
-                    LEFT JOIN general_dim_ceco ce ON r.id_ceco = ce.id
-                    WHERE r.id_actividad = %s
-                """, (id_actividad,))
-                rendimientos = cursor.fetchall()
-            elif tipo_trabajador == 2:  # Contratista
-                cursor.execute("""
-                    SELECT r.*, l.nombre AS labor, t.nombre AS trabajador, p.porcentaje AS porcentaje_trabajador,
-                           COALESCE(cp.id_ceco, ci.id_ceco, cm.id_ceco, cr.id_ceco, ca.id_ceco) AS id_ceco,
-                           COALESCE(ce.nombre, 
-                               CASE 
-                                   WHEN a.id_tipoceco = 1 THEN (SELECT ce2.nombre FROM tarja_fact_cecoadministrativo ca2 JOIN general_dim_ceco ce2 ON ca2.id_ceco = ce2.id WHERE ca2.id_actividad = a.id LIMIT 1)
-                                   WHEN a.id_tipoceco = 2 THEN (SELECT ce2.nombre FROM tarja_fact_cecoproductivo cp2 JOIN general_dim_ceco ce2 ON cp2.id_ceco = ce2.id WHERE cp2.id_actividad = a.id LIMIT 1)
-                                   WHEN a.id_tipoceco = 3 THEN (SELECT ce2.nombre FROM tarja_fact_cecoinversion ci2 JOIN general_dim_ceco ce2 ON ci2.id_ceco = ce2.id WHERE ci2.id_actividad = a.id LIMIT 1)
-                                   WHEN a.id_tipoceco = 4 THEN (SELECT ce2.nombre FROM tarja_fact_cecomaquinaria cm2 JOIN general_dim_ceco ce2 ON cm2.id_ceco = ce2.id WHERE cm2.id_actividad = a.id LIMIT 1)
-                                   WHEN a.id_tipoceco = 5 THEN (SELECT ce2.nombre FROM tarja_fact_cecoriego cr2 JOIN general_dim_ceco ce2 ON cr2.id_ceco = ce2.id WHERE cr2.id_actividad = a.id LIMIT 1)
-                               END
-                           ) as nombre_ceco
-                    FROM tarja_fact_rendimientocontratista r
-                    LEFT JOIN tarja_fact_actividad a ON r.id_actividad = a.id
-                    LEFT JOIN general_dim_labor l ON a.id_labor = l.id
-                    LEFT JOIN general_dim_trabajador t ON r.id_trabajador = t.id
-                    LEFT JOIN general_dim_porcentajecontratista p ON r.id_porcentaje_individual = p.id
-                    LEFT JOIN tarja_fact_cecoproductivo cp ON a.id = cp.id_actividad
-                    LEFT JOIN tarja_fact_cecoinversion ci ON a.id = ci.id_actividad
-                    LEFT JOIN tarja_fact_cecomaquinaria cm ON a.id = cm.id_actividad
-                    LEFT JOIN tarja_fact_cecoriego cr ON a.id = cr.id_actividad
-                    LEFT JOIN tarja_fact_cecoadministrativo ca ON a.id = ca.id_actividad
-                    LEFT JOIN general_dim_ceco ce ON COALESCE(cp.id_ceco, ci.id_ceco, cm.id_ceco, cr.id_ceco, ca.id_ceco) = ce.id
-                    WHERE r.id_actividad = %s
-                """, (id_actividad,))
-                rendimientos = cursor.fetchall()
-        elif tipo == 2:  # Grupal
-            cursor.execute("""
-                SELECT rg.*, a.id_labor, l.nombre AS labor, p.porcentaje AS porcentaje_grupal,
-                       COALESCE(cp.id_ceco, ci.id_ceco, cm.id_ceco, cr.id_ceco, ca.id_ceco) AS id_ceco,
-                       COALESCE(ce.nombre, 
-                           CASE 
-                               WHEN a.id_tipoceco = 1 THEN (SELECT ce2.nombre FROM tarja_fact_cecoadministrativo ca2 JOIN general_dim_ceco ce2 ON ca2.id_ceco = ce2.id WHERE ca2.id_actividad = a.id LIMIT 1)
-                               WHEN a.id_tipoceco = 2 THEN (SELECT ce2.nombre FROM tarja_fact_cecoproductivo cp2 JOIN general_dim_ceco ce2 ON cp2.id_ceco = ce2.id WHERE cp2.id_actividad = a.id LIMIT 1)
-                               WHEN a.id_tipoceco = 3 THEN (SELECT ce2.nombre FROM tarja_fact_cecoinversion ci2 JOIN general_dim_ceco ce2 ON ci2.id_ceco = ce2.id WHERE ci2.id_actividad = a.id LIMIT 1)
-                               WHEN a.id_tipoceco = 4 THEN (SELECT ce2.nombre FROM tarja_fact_cecomaquinaria cm2 JOIN general_dim_ceco ce2 ON cm2.id_ceco = ce2.id WHERE cm2.id_actividad = a.id LIMIT 1)
-                               WHEN a.id_tipoceco = 5 THEN (SELECT ce2.nombre FROM tarja_fact_cecoriego cr2 JOIN general_dim_ceco ce2 ON cr2.id_ceco = ce2.id WHERE cr2.id_actividad = a.id LIMIT 1)
-                           END
-                       ) as nombre_ceco
-                FROM tarja_fact_redimientogrupal rg
-                LEFT JOIN tarja_fact_actividad a ON rg.id_actividad = a.id
-                LEFT JOIN general_dim_labor l ON a.id_labor = l.id
-                LEFT JOIN general_dim_porcentajecontratista p ON rg.id_porcentaje = p.id
-                LEFT JOIN tarja_fact_cecoproductivo cp ON a.id = cp.id_actividad
-                LEFT JOIN tarja_fact_cecoinversion ci ON a.id = ci.id_actividad
-                LEFT JOIN tarja_fact_cecomaquinaria cm ON a.id = cm.id_actividad
-                LEFT JOIN tarja_fact_cecoriego cr ON a.id = cr.id_actividad
-                LEFT JOIN tarja_fact_cecoadministrativo ca ON a.id = ca.id_actividad
-                LEFT JOIN general_dim_ceco ce ON COALESCE(cp.id_ceco, ci.id_ceco, cm.id_ceco, cr.id_ceco, ca.id_ceco) = ce.id
-                WHERE rg.id_actividad = %s
-            """, (id_actividad,))
-            rendimientos = cursor.fetchall()
+        rendimientos = rendimientos_de_actividades(cursor, [actividad])[str(actividad['id'])]
         cursor.close()
         conn.close()
         if not rendimientos:
@@ -126,6 +124,42 @@ def obtener_rendimientos(id_actividad):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Máximo de actividades por llamada a /por-actividades
+MAXIMO_ACTIVIDADES_LOTE = 200
+
+# 🚀 Rendimientos de muchas actividades en una llamada (una consulta por tipo de rendimiento)
+@rendimientos_bp.route('/por-actividades', methods=['GET'])
+@jwt_required()
+def obtener_rendimientos_por_actividades():
+    try:
+        ids = list(dict.fromkeys(i.strip() for i in (request.args.get('ids') or '').split(',') if i.strip()))
+        if not ids:
+            return jsonify({"error": "Debe indicar ids de actividad separados por coma"}), 400
+        if len(ids) > MAXIMO_ACTIVIDADES_LOTE:
+            return jsonify({"error": f"Máximo {MAXIMO_ACTIVIDADES_LOTE} actividades por solicitud"}), 400
+
+        id_sucursal = obtener_sucursal_activa(get_jwt_identity())
+        if not id_sucursal:
+            return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
+
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(f"""
+            SELECT id, id_tiporendimiento, id_tipotrabajador
+            FROM tarja_fact_actividad
+            WHERE id IN ({', '.join(['%s'] * len(ids))}) AND id_sucursalactiva = %s
+        """, tuple(ids) + (id_sucursal,))
+        actividades = cursor.fetchall()
+        rendimientos = rendimientos_de_actividades(cursor, actividades)
+        cursor.close()
+        conn.close()
+
+        return jsonify({
+            "rendimientos": rendimientos,
+            "no_encontradas": [i for i in ids if i not in rendimientos]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 # 🚀 Endpoint para editar un rendimiento existente según el tipo de la actividad
 @rendimientos_bp.route('/<string:rendimiento_id>', methods=['PUT'])
@@ -197,7 +231,11 @@ def editar_rendimiento(rendimiento_id):
                 )
             else:
                 return jsonify({"error": "Tipo de trabajador no soportado"}), 400
+            # El colaborador puede cambiar: se recalculan también sus horas del día anterior
+            dias_antes = dias_de_rendimientos(cursor, rendimiento_id)
             cursor.execute(sql, valores)
+            registrar_cambio(cursor, 'rendimiento_propio', rendimiento_id)
+            refrescar_dias_de_rendimientos(cursor, rendimiento_id, dias_antes)
         elif tipo == 2:  # Grupal
             sql = """
                 UPDATE tarja_fact_redimientogrupal 
@@ -213,6 +251,7 @@ def editar_rendimiento(rendimiento_id):
                 rendimiento_id
             )
             cursor.execute(sql, valores)
+            registrar_cambio(cursor, 'rendimiento_grupal', rendimiento_id)
         conn.commit()
         cursor.close()
         conn.close()
@@ -244,7 +283,10 @@ def eliminar_rendimiento_individual(rendimiento_id):
             return jsonify({"error": "Rendimiento no encontrado o no tienes permiso para eliminarlo"}), 404
         
         # Eliminar el rendimiento
+        registrar_cambio(cursor, 'rendimiento_propio', rendimiento_id, ELIMINACION)
+        dias = dias_de_rendimientos(cursor, rendimiento_id)
         cursor.execute("DELETE FROM tarja_fact_rendimientopropio WHERE id = %s", (rendimiento_id,))
+        refrescar_colaborador_dia(cursor, dias)
         conn.commit()
         
         cursor.close()
@@ -277,6 +319,7 @@ def eliminar_rendimiento_grupal(rendimiento_id):
             return jsonify({"error": "Rendimiento grupal no encontrado o no tienes permiso para eliminarlo"}), 404
         
         # Eliminar el rendimiento
+        registrar_cambio(cursor, 'rendimiento_grupal', rendimiento_id, ELIMINACION)
         cursor.execute("DELETE FROM tarja_fact_redimientogrupal WHERE id = %s", (rendimiento_id,))
         conn.commit()
         
@@ -286,6 +329,187 @@ def eliminar_rendimiento_grupal(rendimiento_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Máximo de filas por llamada a /bulk
+MAXIMO_FILAS_BULK = 500
+
+# Por tipo de rendimiento: tabla, columna del trabajador (para duplicados), campos requeridos,
+# columnas a insertar (además de id e id_actividad) y validaciones de FK por campo
+TIPOS_RENDIMIENTO = {
+    'propio': {
+        'tabla': 'tarja_fact_rendimientopropio',
+        'trabajador': 'id_colaborador',
+        'requeridos': ('id_colaborador', 'rendimiento', 'horas_trabajadas'),
+        'columnas': ('id_colaborador', 'rendimiento', 'horas_trabajadas', 'horas_extras', 'id_bono'),
+        'valores_defecto': {'horas_extras': 0},
+        'fks': {
+            'id_colaborador': ("SELECT id FROM general_dim_colaborador WHERE id IN ({}) AND id_sucursal = %s",
+                               "Colaborador no encontrado o no pertenece a tu sucursal", True),
+            'id_bono': ("SELECT id FROM general_dim_bono WHERE id IN ({})", "Bono no encontrado", False),
+        },
+    },
+    'contratista': {
+        'tabla': 'tarja_fact_rendimientocontratista',
+        'trabajador': 'id_trabajador',
+        'requeridos': ('id_trabajador', 'rendimiento', 'id_porcentaje_individual'),
+        'columnas': ('id_trabajador', 'rendimiento', 'id_porcentaje_individual'),
+        'valores_defecto': {},
+        'fks': {
+            'id_trabajador': ("SELECT id FROM general_dim_trabajador WHERE id IN ({}) AND id_sucursal_activa = %s",
+                              "Trabajador no encontrado o no pertenece a tu sucursal", True),
+            'id_porcentaje_individual': ("SELECT id FROM general_dim_porcentajecontratista WHERE id IN ({})",
+                                         "Porcentaje no encontrado", False),
+        },
+    },
+    'grupal': {
+        'tabla': 'tarja_fact_redimientogrupal',
+        'trabajador': None,
+        'requeridos': ('rendimiento_total', 'cantidad_trab', 'id_porcentaje'),
+        'columnas': ('rendimiento_total', 'cantidad_trab', 'id_porcentaje'),
+        'valores_defecto': {},
+        'fks': {
+            'id_porcentaje': ("SELECT id FROM general_dim_porcentajecontratista WHERE id IN ({})",
+                              "Porcentaje no encontrado", False),
+        },
+    },
+}
+
+
+def valor_columna_rendimiento(spec, datos, columna):
+    """Valor a insertar en la columna: el recibido o, si falta o viene null, el por defecto del tipo"""
+    valor = datos.get(columna)
+    return valor if valor is not None else spec['valores_defecto'].get(columna)
+
+
+def valores_insert_rendimiento(spec, datos):
+    """Valores de spec['columnas'] para el INSERT de un rendimiento nuevo (/bulk, /api/sync/push)"""
+    return tuple(valor_columna_rendimiento(spec, datos, c) for c in spec['columnas'])
+
+
+def _ids_existentes(cursor, sql, ids, *params):
+    """Ids (como texto) que devuelve una consulta IN (...) sobre el conjunto dado"""
+    ids = list(ids)
+    if not ids:
+        return set()
+    cursor.execute(sql.format(', '.join(['%s'] * len(ids))), tuple(ids) + params)
+    return {str(fila['id']) for fila in cursor.fetchall()}
+
+
+# 🚀 Registro masivo de rendimientos de una actividad (propios, contratistas o grupales)
+@rendimientos_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def crear_rendimientos_bulk():
+    try:
+        data = request.json or {}
+        usuario_id = get_jwt_identity()
+        id_actividad = data.get('id_actividad')
+        filas = data.get('rendimientos')
+
+        if not id_actividad:
+            return jsonify({"error": "Falta id_actividad"}), 400
+        if not isinstance(filas, list) or not filas:
+            return jsonify({"error": "rendimientos debe ser una lista no vacía"}), 400
+        if len(filas) > MAXIMO_FILAS_BULK:
+            return jsonify({"error": f"Máximo {MAXIMO_FILAS_BULK} rendimientos por solicitud"}), 400
+
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
+            return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
+
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        # El tipo de rendimiento lo define la actividad
+        cursor.execute("""
+            SELECT id_tiporendimiento, id_tipotrabajador
+            FROM tarja_fact_actividad
+            WHERE id = %s AND id_sucursalactiva = %s
+        """, (id_actividad, id_sucursal))
+        actividad = cursor.fetchone()
+        if not actividad:
+            return jsonify({"error": "Actividad no encontrada o no pertenece a tu sucursal"}), 404
+
+        if actividad['id_tiporendimiento'] == 2:
+            tipo = 'grupal'
+        elif actividad['id_tiporendimiento'] == 1 and actividad['id_tipotrabajador'] == 1:
+            tipo = 'propio'
+        elif actividad['id_tiporendimiento'] == 1 and actividad['id_tipotrabajador'] == 2:
+            tipo = 'contratista'
+        else:
+            return jsonify({"error": "Tipo de rendimiento o de trabajador no soportado"}), 400
+        spec = TIPOS_RENDIMIENTO[tipo]
+
+        # Errores por fila (índice -> mensaje); se valida todo antes de insertar
+        errores = {}
+        for i, fila in enumerate(filas):
+            if not isinstance(fila, dict):
+                errores[i] = "Cada rendimiento debe ser un objeto"
+                continue
+            faltantes = [c for c in spec['requeridos'] if fila.get(c) in (None, '')]
+            if faltantes:
+                errores[i] = f"Campo requerido faltante: {', '.join(faltantes)}"
+
+        # FKs: una consulta IN (...) por campo para todo el lote
+        for campo, (sql, mensaje, por_sucursal) in spec['fks'].items():
+            valores = {str(f[campo]) for i, f in enumerate(filas) if i not in errores and f.get(campo) not in (None, '')}
+            params = (id_sucursal,) if por_sucursal else ()
+            validos = _ids_existentes(cursor, sql, valores, *params)
+            for i, fila in enumerate(filas):
+                if i not in errores and fila.get(campo) not in (None, '') and str(fila[campo]) not in validos:
+                    errores[i] = mensaje
+
+        # Duplicados: ya registrados en la actividad o repetidos dentro del lote
+        columna_trabajador = spec['trabajador']
+        if columna_trabajador:
+            candidatos = {str(f[columna_trabajador]) for i, f in enumerate(filas) if i not in errores}
+            existentes = _ids_existentes(
+                cursor,
+                f"SELECT {columna_trabajador} AS id FROM {spec['tabla']} WHERE {columna_trabajador} IN ({{}}) AND id_actividad = %s",
+                candidatos, id_actividad
+            )
+            vistos = set()
+            for i, fila in enumerate(filas):
+                if i in errores:
+                    continue
+                clave = str(fila[columna_trabajador])
+                if clave in existentes:
+                    errores[i] = "Ya existe un rendimiento para esta actividad y trabajador"
+                elif clave in vistos:
+                    errores[i] = "Trabajador repetido en la solicitud"
+                vistos.add(clave)
+
+        resultados = []
+        valores_insert = []
+        for i, fila in enumerate(filas):
+            if i in errores:
+                resultados.append({"indice": i, "ok": False, "error": errores[i]})
+                continue
+            rendimiento_id = str(uuid.uuid4())
+            valores_insert.append((rendimiento_id, id_actividad) + valores_insert_rendimiento(spec, fila))
+            resultados.append({"indice": i, "ok": True, "id": rendimiento_id})
+
+        if valores_insert:
+            columnas = ('id', 'id_actividad') + spec['columnas']
+            cursor.executemany(
+                f"INSERT INTO {spec['tabla']} ({', '.join(columnas)}) VALUES ({', '.join(['%s'] * len(columnas))})",
+                valores_insert
+            )
+            registrar_cambio(cursor, ENTIDAD_POR_TABLA_RENDIMIENTO[spec['tabla']], [v[0] for v in valores_insert])
+            if tipo == 'propio':
+                refrescar_dias_de_rendimientos(cursor, [v[0] for v in valores_insert])
+            conn.commit()
+
+        cursor.close()
+        conn.close()
+
+        return jsonify({
+            "tipo": tipo,
+            "creados": len(valores_insert),
+            "rechazados": len(errores),
+            "resultados": resultados
+        }), 201 if valores_insert else 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # 📌 Obtener rendimientos individuales propios
 @rendimientos_bp.route('/individual/propio', methods=['GET'])
 @jwt_required()
@@ -296,13 +520,11 @@ def obtener_rendimientos_individuales_propios():
         cursor = conn.cursor(dictionary=True)
 
         # Obtener la sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
 
-        if not usuario or usuario['id_sucursalactiva'] is None:
+        if id_sucursal is None:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
 
-        id_sucursal = usuario['id_sucursalactiva']
         id_actividad = request.args.get('id_actividad')
 
         sql = """
@@ -318,21 +540,15 @@ def obtener_rendimientos_individuales_propios():
                 l.nombre as nombre_actividad,
                 c.nombre as nombre_colaborador,
                 b.nombre as nombre_bono,
-                COALESCE(ce.nombre, 
-                    CASE 
-                        WHEN a.id_tipoceco = 1 THEN (SELECT ce2.nombre FROM tarja_fact_cecoadministrativo ca2 JOIN general_dim_ceco ce2 ON ca2.id_ceco = ce2.id WHERE ca2.id_actividad = a.id LIMIT 1)
-                        WHEN a.id_tipoceco = 2 THEN (SELECT ce2.nombre FROM tarja_fact_cecoproductivo cp2 JOIN general_dim_ceco ce2 ON cp2.id_ceco = ce2.id WHERE cp2.id_actividad = a.id LIMIT 1)
-                        WHEN a.id_tipoceco = 3 THEN (SELECT ce2.nombre FROM tarja_fact_cecoinversion ci2 JOIN general_dim_ceco ce2 ON ci2.id_ceco = ce2.id WHERE ci2.id_actividad = a.id LIMIT 1)
-                        WHEN a.id_tipoceco = 4 THEN (SELECT ce2.nombre FROM tarja_fact_cecomaquinaria cm2 JOIN general_dim_ceco ce2 ON cm2.id_ceco = ce2.id WHERE cm2.id_actividad = a.id LIMIT 1)
-                        WHEN a.id_tipoceco = 5 THEN (SELECT ce2.nombre FROM tarja_fact_cecoriego cr2 JOIN general_dim_ceco ce2 ON cr2.id_ceco = ce2.id WHERE cr2.id_actividad = a.id LIMIT 1)
-                    END
-                ) as nombre_ceco
+                COALESCE(ce.nombre, ce_act.nombre) as nombre_ceco
             FROM tarja_fact_rendimientopropio r
             JOIN tarja_fact_actividad a ON r.id_actividad = a.id
             JOIN general_dim_labor l ON a.id_labor = l.id
             JOIN general_dim_colaborador c ON r.id_colaborador = c.id
             LEFT JOIN general_dim_bono b ON r.id_bono = b.id
             LEFT JOIN general_dim_ceco ce ON r.id_ceco = ce.id
+            LEFT JOIN tarja_fact_actividad_ceco ac ON ac.id_actividad = a.id
+            LEFT JOIN general_dim_ceco ce_act ON ce_act.id = ac.id_ceco
             WHERE a.id_sucursalactiva = %s
         """
         params = [id_sucursal]
@@ -364,13 +580,11 @@ def obtener_rendimientos_individuales_contratistas():
         cursor = conn.cursor(dictionary=True)
 
         # Obtener la sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
 
-        if not usuario or usuario['id_sucursalactiva'] is None:
+        if id_sucursal is None:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
 
-        id_sucursal = usuario['id_sucursalactiva']
         id_actividad = request.args.get('id_actividad')
 
         sql = """
@@ -385,27 +599,15 @@ def obtener_rendimientos_individuales_contratistas():
                 t.apellido_paterno,
                 t.apellido_materno,
                 p.porcentaje,
-                COALESCE(cp.id_ceco, ci.id_ceco, cm.id_ceco, cr.id_ceco, ca.id_ceco) AS id_ceco,
-                COALESCE(ce.nombre, 
-                    CASE 
-                        WHEN a.id_tipoceco = 1 THEN (SELECT ce2.nombre FROM tarja_fact_cecoadministrativo ca2 JOIN general_dim_ceco ce2 ON ca2.id_ceco = ce2.id WHERE ca2.id_actividad = a.id LIMIT 1)
-                        WHEN a.id_tipoceco = 2 THEN (SELECT ce2.nombre FROM tarja_fact_cecoproductivo cp2 JOIN general_dim_ceco ce2 ON cp2.id_ceco = ce2.id WHERE cp2.id_actividad = a.id LIMIT 1)
-                        WHEN a.id_tipoceco = 3 THEN (SELECT ce2.nombre FROM tarja_fact_cecoinversion ci2 JOIN general_dim_ceco ce2 ON ci2.id_ceco = ce2.id WHERE ci2.id_actividad = a.id LIMIT 1)
-                        WHEN a.id_tipoceco = 4 THEN (SELECT ce2.nombre FROM tarja_fact_cecomaquinaria cm2 JOIN general_dim_ceco ce2 ON cm2.id_ceco = ce2.id WHERE cm2.id_actividad = a.id LIMIT 1)
-                        WHEN a.id_tipoceco = 5 THEN (SELECT ce2.nombre FROM tarja_fact_cecoriego cr2 JOIN general_dim_ceco ce2 ON cr2.id_ceco = ce2.id WHERE cr2.id_actividad = a.id LIMIT 1)
-                    END
-                ) as nombre_ceco
+                ac.id_ceco AS id_ceco,
+                ce.nombre as nombre_ceco
             FROM tarja_fact_rendimientocontratista r
             JOIN tarja_fact_actividad a ON r.id_actividad = a.id
             JOIN general_dim_labor l ON a.id_labor = l.id
             JOIN general_dim_trabajador t ON r.id_trabajador = t.id
             JOIN general_dim_porcentajecontratista p ON r.id_porcentaje_individual = p.id
-            LEFT JOIN tarja_fact_cecoproductivo cp ON a.id = cp.id_actividad
-            LEFT JOIN tarja_fact_cecoinversion ci ON a.id = ci.id_actividad
-            LEFT JOIN tarja_fact_cecomaquinaria cm ON a.id = cm.id_actividad
-            LEFT JOIN tarja_fact_cecoriego cr ON a.id = cr.id_actividad
-            LEFT JOIN tarja_fact_cecoadministrativo ca ON a.id = ca.id_actividad
-            LEFT JOIN general_dim_ceco ce ON COALESCE(cp.id_ceco, ci.id_ceco, cm.id_ceco, cr.id_ceco, ca.id_ceco) = ce.id
+            LEFT JOIN tarja_fact_actividad_ceco ac ON ac.id_actividad = a.id
+            LEFT JOIN general_dim_ceco ce ON ce.id = ac.id_ceco
             WHERE a.id_sucursalactiva = %s
         """
         params = [id_sucursal]
@@ -439,13 +641,11 @@ def obtener_rendimientos_grupales():
         cursor = conn.cursor(dictionary=True)
 
         # Obtener la sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
 
-        if not usuario or usuario['id_sucursalactiva'] is None:
+        if id_sucursal is None:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
 
-        id_sucursal = usuario['id_sucursalactiva']
         id_actividad = request.args.get('id_actividad')
 
         sql = """
@@ -457,26 +657,14 @@ def obtener_rendimientos_grupales():
                 rg.id_porcentaje,
                 l.nombre as nombre_actividad,
                 p.porcentaje as porcentaje_grupal,
-                COALESCE(cp.id_ceco, ci.id_ceco, cm.id_ceco, cr.id_ceco, ca.id_ceco) AS id_ceco,
-                COALESCE(ce.nombre, 
-                    CASE 
-                        WHEN a.id_tipoceco = 1 THEN (SELECT ce2.nombre FROM tarja_fact_cecoadministrativo ca2 JOIN general_dim_ceco ce2 ON ca2.id_ceco = ce2.id WHERE ca2.id_actividad = a.id LIMIT 1)
-                        WHEN a.id_tipoceco = 2 THEN (SELECT ce2.nombre FROM tarja_fact_cecoproductivo cp2 JOIN general_dim_ceco ce2 ON cp2.id_ceco = ce2.id WHERE cp2.id_actividad = a.id LIMIT 1)
-                        WHEN a.id_tipoceco = 3 THEN (SELECT ce2.nombre FROM tarja_fact_cecoinversion ci2 JOIN general_dim_ceco ce2 ON ci2.id_ceco = ce2.id WHERE ci2.id_actividad = a.id LIMIT 1)
-                        WHEN a.id_tipoceco = 4 THEN (SELECT ce2.nombre FROM tarja_fact_cecomaquinaria cm2 JOIN general_dim_ceco ce2 ON cm2.id_ceco = ce2.id WHERE cm2.id_actividad = a.id LIMIT 1)
-                        WHEN a.id_tipoceco = 5 THEN (SELECT ce2.nombre FROM tarja_fact_cecoriego cr2 JOIN general_dim_ceco ce2 ON cr2.id_ceco = ce2.id WHERE cr2.id_actividad = a.id LIMIT 1)
-                    END
-                ) as nombre_ceco
+                ac.id_ceco AS id_ceco,
+                ce.nombre as nombre_ceco
             FROM tarja_fact_redimientogrupal rg
             JOIN tarja_fact_actividad a ON rg.id_actividad = a.id
             JOIN general_dim_labor l ON a.id_labor = l.id
             LEFT JOIN general_dim_porcentajecontratista p ON rg.id_porcentaje = p.id
-            LEFT JOIN tarja_fact_cecoproductivo cp ON a.id = cp.id_actividad
-            LEFT JOIN tarja_fact_cecoinversion ci ON a.id = ci.id_actividad
-            LEFT JOIN tarja_fact_cecomaquinaria cm ON a.id = cm.id_actividad
-            LEFT JOIN tarja_fact_cecoriego cr ON a.id = cr.id_actividad
-            LEFT JOIN tarja_fact_cecoadministrativo ca ON a.id = ca.id_actividad
-            LEFT JOIN general_dim_ceco ce ON COALESCE(cp.id_ceco, ci.id_ceco, cm.id_ceco, cr.id_ceco, ca.id_ceco) = ce.id
+            LEFT JOIN tarja_fact_actividad_ceco ac ON ac.id_actividad = a.id
+            LEFT JOIN general_dim_ceco ce ON ce.id = ac.id_ceco
             WHERE a.id_sucursalactiva = %s
         """
         params = [id_sucursal]
@@ -536,6 +724,8 @@ def editar_rendimiento_individual_propio(rendimiento_id):
                 horas_trabajadas = %s, horas_extras = %s, id_bono = %s
             WHERE id = %s
         """
+        # Actividad y colaborador pueden cambiar: se recalculan también las horas del día anterior
+        dias_antes = dias_de_rendimientos(cursor, rendimiento_id)
         cursor.execute(sql, (
             data['id_actividad'],
             data['id_colaborador'],
@@ -545,6 +735,8 @@ def editar_rendimiento_individual_propio(rendimiento_id):
             data.get('id_bono', None),
             rendimiento_id
         ))
+        registrar_cambio(cursor, 'rendimiento_propio', rendimiento_id)
+        refrescar_dias_de_rendimientos(cursor, rendimiento_id, dias_antes)
         conn.commit()
         cursor.close()
         conn.close()
@@ -575,6 +767,7 @@ def editar_rendimiento_individual_contratista(rendimiento_id):
             data['id_porcentaje_individual'],
             rendimiento_id
         ))
+        registrar_cambio(cursor, 'rendimiento_contratista', rendimiento_id)
         conn.commit()
         cursor.close()
         conn.close()
@@ -590,7 +783,10 @@ def eliminar_rendimiento_individual_propio(rendimiento_id):
         conn = get_db_connection()
         cursor = conn.cursor()
         sql = "DELETE FROM tarja_fact_rendimientopropio WHERE id = %s"
+        registrar_cambio(cursor, 'rendimiento_propio', rendimiento_id, ELIMINACION)
+        dias = dias_de_rendimientos(cursor, rendimiento_id)
         cursor.execute(sql, (rendimiento_id,))
+        refrescar_colaborador_dia(cursor, dias)
         conn.commit()
         cursor.close()
         conn.close()
@@ -606,6 +802,7 @@ def eliminar_rendimiento_individual_contratista(rendimiento_id):
         conn = get_db_connection()
         cursor = conn.cursor()
         sql = "DELETE FROM tarja_fact_rendimientocontratista WHERE id = %s"
+        registrar_cambio(cursor, 'rendimiento_contratista', rendimiento_id, ELIMINACION)
         cursor.execute(sql, (rendimiento_id,))
         conn.commit()
         cursor.close()
@@ -614,73 +811,116 @@ def eliminar_rendimiento_individual_contratista(rendimiento_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-# 📌 Obtener rendimiento por ID (grupal)
-@rendimientos_bp.route('/<string:rendimiento_id>', methods=['GET'])
+# Máximo de ids por llamada a GET /api/rendimientos?ids=
+MAXIMO_IDS_RENDIMIENTO = 500
+
+# Índice id -> tipo: una sola consulta por clave primaria sobre las tres tablas
+_SQL_TIPO_RENDIMIENTO = " UNION ALL ".join(
+    f"SELECT id, '{tipo}' AS tipo FROM {spec['tabla']} WHERE id IN ({{marcadores}})"
+    for tipo, spec in TIPOS_RENDIMIENTO.items()
+)
+
+# Filas completas por tipo (las columnas de cada tabla son distintas)
+_SQL_RENDIMIENTO_POR_TIPO = {
+    'propio': """
+        SELECT r.*, 'propio' as tipo
+        FROM tarja_fact_rendimientopropio r
+        JOIN tarja_fact_actividad a ON r.id_actividad = a.id
+        WHERE r.id IN ({}) AND a.id_sucursalactiva = %s
+    """,
+    'contratista': """
+        SELECT r.*, 'contratista' as tipo
+        FROM tarja_fact_rendimientocontratista r
+        JOIN tarja_fact_actividad a ON r.id_actividad = a.id
+        WHERE r.id IN ({}) AND a.id_sucursalactiva = %s
+    """,
+    'grupal': """
+        SELECT r.*, 'grupal' as tipo, p.porcentaje as porcentaje_grupal
+        FROM tarja_fact_redimientogrupal r
+        JOIN tarja_fact_actividad a ON r.id_actividad = a.id
+        LEFT JOIN general_dim_porcentajecontratista p ON r.id_porcentaje = p.id
+        WHERE r.id IN ({}) AND a.id_sucursalactiva = %s
+    """,
+}
+
+
+def buscar_rendimientos(cursor, ids, id_sucursal):
+    """
+    Devuelve {id: rendimiento} (con su 'tipo') para los ids de cualquier tipo que pertenecen a la
+    sucursal. Resuelve el tipo de todos los ids en una consulta UNION ALL y luego lee una vez
+    cada tabla que tenga coincidencias, en vez de probar las tres tablas por cada id.
+    """
+    ids = list(dict.fromkeys(str(i) for i in ids if i not in (None, '')))
+    if not ids:
+        return {}
+    marcadores = ', '.join(['%s'] * len(ids))
+    cursor.execute(_SQL_TIPO_RENDIMIENTO.format(marcadores=marcadores), tuple(ids) * len(TIPOS_RENDIMIENTO))
+    ids_por_tipo = {}
+    for fila in cursor.fetchall():
+        ids_por_tipo.setdefault(fila['tipo'], []).append(fila['id'])
+
+    encontrados = {}
+    for tipo, ids_tipo in ids_por_tipo.items():
+        cursor.execute(
+            _SQL_RENDIMIENTO_POR_TIPO[tipo].format(', '.join(['%s'] * len(ids_tipo))),
+            tuple(ids_tipo) + (id_sucursal,)
+        )
+        for rendimiento in cursor.fetchall():
+            encontrados[str(rendimiento['id'])] = rendimiento
+    return encontrados
+
+
+# 📌 Obtener varios rendimientos por id (propios, contratistas y grupales mezclados)
+@rendimientos_bp.route('', methods=['GET'])
 @jwt_required()
-def obtener_rendimiento(rendimiento_id):
+def obtener_rendimientos_por_ids():
     try:
-        usuario_id = get_jwt_identity()
+        ids = [i.strip() for i in (request.args.get('ids') or '').split(',') if i.strip()]
+        if not ids:
+            return jsonify({"error": "Debe indicar ids separados por coma"}), 400
+        if len(ids) > MAXIMO_IDS_RENDIMIENTO:
+            return jsonify({"error": f"Máximo {MAXIMO_IDS_RENDIMIENTO} ids por solicitud"}), 400
+
+        id_sucursal = obtener_sucursal_activa(get_jwt_identity())
+        if not id_sucursal:
+            return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
+
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
+        encontrados = buscar_rendimientos(cursor, ids, id_sucursal)
+        cursor.close()
+        conn.close()
+
+        return jsonify({
+            "rendimientos": [encontrados[i] for i in dict.fromkeys(ids) if i in encontrados],
+            "no_encontrados": [i for i in dict.fromkeys(ids) if i not in encontrados]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 📌 Obtener rendimiento por ID (propio, contratista o grupal)
+# Ruta propia: GET /<id> ya corresponde a los rendimientos de una actividad
+@rendimientos_bp.route('/por-id/<string:rendimiento_id>', methods=['GET'])
+@jwt_required()
+def obtener_rendimiento(rendimiento_id):
+    try:
+        usuario_id = get_jwt_identity()
         
         # Obtener la sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
         
-        if not usuario or not usuario['id_sucursalactiva']:
-            cursor.close()
-            conn.close()
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
-        
-        # Buscar el rendimiento en las diferentes tablas
-        # 1. Buscar en rendimientos propios
-        cursor.execute("""
-            SELECT r.*, 'propio' as tipo
-            FROM tarja_fact_rendimientopropio r
-            JOIN tarja_fact_actividad a ON r.id_actividad = a.id
-            WHERE r.id = %s AND a.id_sucursalactiva = %s
-        """, (rendimiento_id, id_sucursal))
-        rendimiento = cursor.fetchone()
-        
-        if rendimiento:
-            cursor.close()
-            conn.close()
-            return jsonify(rendimiento), 200
-        
-        # 2. Buscar en rendimientos de contratistas
-        cursor.execute("""
-            SELECT r.*, 'contratista' as tipo
-            FROM tarja_fact_rendimientocontratista r
-            JOIN tarja_fact_actividad a ON r.id_actividad = a.id
-            WHERE r.id = %s AND a.id_sucursalactiva = %s
-        """, (rendimiento_id, id_sucursal))
-        rendimiento = cursor.fetchone()
-        
-        if rendimiento:
-            cursor.close()
-            conn.close()
-            return jsonify(rendimiento), 200
-        
-        # 3. Buscar en rendimientos grupales
-        cursor.execute("""
-            SELECT r.*, 'grupal' as tipo, p.porcentaje as porcentaje_grupal
-            FROM tarja_fact_redimientogrupal r
-            JOIN tarja_fact_actividad a ON r.id_actividad = a.id
-            LEFT JOIN general_dim_porcentajecontratista p ON r.id_porcentaje = p.id
-            WHERE r.id = %s AND a.id_sucursalactiva = %s
-        """, (rendimiento_id, id_sucursal))
-        rendimiento = cursor.fetchone()
-        
-        if rendimiento:
-            cursor.close()
-            conn.close()
-            return jsonify(rendimiento), 200
-        
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        rendimiento = buscar_rendimientos(cursor, [rendimiento_id], id_sucursal).get(rendimiento_id)
         cursor.close()
         conn.close()
-        return jsonify({"error": "Rendimiento no encontrado"}), 404
+        
+        if not rendimiento:
+            return jsonify({"error": "Rendimiento no encontrado"}), 404
+        return jsonify(rendimiento), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -807,6 +1047,8 @@ def crear_rendimiento_test():
                 id, id_actividad, id_colaborador, rendimiento, horas_trabajadas, horas_extras
             ) VALUES (%s, %s, %s, %s, %s, %s)
         """, (rendimiento_id, id_actividad, id_colaborador, rendimiento, horas_trabajadas, 0))
+        registrar_cambio(cursor, 'rendimiento_propio', rendimiento_id)
+        refrescar_dias_de_rendimientos(cursor, rendimiento_id)
         
         conn.commit()
         cursor.close()
@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify
 from utils.db import get_db_connection
+from utils.sucursal import obtener_sucursal_activa
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 sucursales_bp = Blueprint('sucursales_bp', __name__)
@@ -13,16 +14,11 @@ def obtener_ubicacion_sucursal_activa():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener información del usuario autenticado
-        cursor.execute("""
-            SELECT id_sucursalactiva FROM general_dim_usuario 
-            WHERE id = %s
-        """, (get_jwt_identity(),))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(get_jwt_identity())
         
-        if not usuario:
+        if not id_sucursal:
             return jsonify({"error": "Usuario no encontrado"}), 404
             
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Obtener la ubicación de la sucursal activa
         cursor.execute("""
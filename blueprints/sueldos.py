@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.db import get_db_connection
+from utils.sucursal import obtener_sucursal_activa
+from utils.cambios import registrar_cambio
 from datetime import datetime
 import json
 
@@ -15,16 +17,11 @@ def listar_sueldos_base():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener información del usuario autenticado
-        cursor.execute("""
-            SELECT id_sucursalactiva FROM general_dim_usuario 
-            WHERE id = %s
-        """, (get_jwt_identity(),))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(get_jwt_identity())
         
-        if not usuario:
+        if not id_sucursal:
             return jsonify({"error": "Usuario no encontrado"}), 404
             
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Listar sueldos base agrupados por colaborador
         cursor.execute("""
@@ -80,16 +77,11 @@ def obtener_sueldo_base(sueldo_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener información del usuario autenticado
-        cursor.execute("""
-            SELECT id_sucursalactiva FROM general_dim_usuario 
-            WHERE id = %s
-        """, (get_jwt_identity(),))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(get_jwt_identity())
         
-        if not usuario:
+        if not id_sucursal:
             return jsonify({"error": "Usuario no encontrado"}), 404
             
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Obtener sueldo base específico
         cursor.execute("""
@@ -162,16 +154,11 @@ def crear_sueldo_base():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener información del usuario autenticado
-        cursor.execute("""
-            SELECT id_sucursalactiva FROM general_dim_usuario 
-            WHERE id = %s
-        """, (get_jwt_identity(),))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(get_jwt_identity())
         
-        if not usuario:
+        if not id_sucursal:
             return jsonify({"error": "Usuario no encontrado"}), 404
             
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que el colaborador existe y pertenece a la sucursal del usuario
         cursor.execute("""
@@ -203,6 +190,7 @@ def crear_sueldo_base():
             )
             WHERE id = %s
         """, (id_colaborador, id_colaborador))
+        registrar_cambio(cursor, 'colaborador', id_colaborador)
         
         conn.commit()
         
@@ -261,16 +249,11 @@ def editar_sueldo_base(sueldo_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener información del usuario autenticado
-        cursor.execute("""
-            SELECT id_sucursalactiva FROM general_dim_usuario 
-            WHERE id = %s
-        """, (get_jwt_identity(),))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(get_jwt_identity())
         
-        if not usuario:
+        if not id_sucursal:
             return jsonify({"error": "Usuario no encontrado"}), 404
             
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que el sueldo base existe y pertenece a un colaborador de la sucursal
         cursor.execute("""
@@ -353,6 +336,7 @@ def editar_sueldo_base(sueldo_id):
                 )
                 WHERE id = %s
             """, (sueldo_editado['id_colaborador'], sueldo_editado['id_colaborador']))
+            registrar_cambio(cursor, 'colaborador', sueldo_editado['id_colaborador'])
         
         conn.commit()
         
@@ -398,16 +382,11 @@ def eliminar_sueldo_base(sueldo_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener información del usuario autenticado
-        cursor.execute("""
-            SELECT id_sucursalactiva FROM general_dim_usuario 
-            WHERE id = %s
-        """, (get_jwt_identity(),))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(get_jwt_identity())
         
-        if not usuario:
+        if not id_sucursal:
             return jsonify({"error": "Usuario no encontrado"}), 404
             
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que el sueldo base existe y pertenece a un colaborador de la sucursal
         cursor.execute("""
@@ -437,6 +416,7 @@ def eliminar_sueldo_base(sueldo_id):
             )
             WHERE id = %s
         """, (id_colaborador, id_colaborador))
+        registrar_cambio(cursor, 'colaborador', id_colaborador)
         
         conn.commit()
         
@@ -457,16 +437,11 @@ def listar_sueldos_base_colaborador(colaborador_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener información del usuario autenticado
-        cursor.execute("""
-            SELECT id_sucursalactiva FROM general_dim_usuario 
-            WHERE id = %s
-        """, (get_jwt_identity(),))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(get_jwt_identity())
         
-        if not usuario:
+        if not id_sucursal:
             return jsonify({"error": "Usuario no encontrado"}), 404
             
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que el colaborador existe y pertenece a la sucursal
         cursor.execute("""
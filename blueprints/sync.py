@@ -0,0 +1,493 @@
+from flask import Blueprint, jsonify, request
+from utils.db import get_db_connection
+from utils.sucursal import obtener_sucursal_activa
+from utils.ceco import (
+    refrescar_ceco_actividad, eliminar_ceco_actividad, id_actividad_de_ceco,
+    insertar_cecos_actividad, TABLAS_CECO_POR_TIPO
+)
+from utils.cambios import registrar_cambio, UPSERT, ELIMINACION, ENTIDAD_POR_TABLA_RENDIMIENTO
+from utils.colaborador_dia import (
+    dias_de_rendimientos, dias_de_actividades, refrescar_colaborador_dia, refrescar_dias_de_rendimientos
+)
+from blueprints.rendimientos import TIPOS_RENDIMIENTO, valores_insert_rendimiento
+from blueprints.auth import sucursales_de_usuario
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from mysql.connector import errorcode
+from mysql.connector.errors import IntegrityError
+import json
+
+sync_bp = Blueprint('sync_bp', __name__)
+
+# Máximo de mutaciones por llamada a /push
+MAXIMO_MUTACIONES_SYNC = 500
+
+# Cambios por página en /changes
+LIMITE_CAMBIOS_DEFECTO = 500
+LIMITE_MAXIMO_CAMBIOS = 2000
+
+# Entidad del log de cambios -> fila actual que se envía en los upserts
+DATOS_POR_ENTIDAD = {
+    'actividad': "SELECT a.*, ac.id_ceco FROM tarja_fact_actividad a "
+                 "LEFT JOIN tarja_fact_actividad_ceco ac ON ac.id_actividad = a.id WHERE a.id IN ({})",
+    'rendimiento_propio': "SELECT * FROM tarja_fact_rendimientopropio WHERE id IN ({})",
+    'rendimiento_contratista': "SELECT * FROM tarja_fact_rendimientocontratista WHERE id IN ({})",
+    'rendimiento_grupal': "SELECT * FROM tarja_fact_redimientogrupal WHERE id IN ({})",
+    'colaborador': "SELECT * FROM general_dim_colaborador WHERE id IN ({})",
+    'trabajador': "SELECT * FROM general_dim_trabajador WHERE id IN ({})",
+}
+
+# Columnas editables de tarja_fact_actividad (las mismas que PUT /api/actividades/<id>)
+COLUMNAS_ACTIVIDAD = (
+    'fecha', 'id_labor', 'id_unidad', 'id_tipotrabajador', 'id_contratista', 'id_tiporendimiento',
+    'hora_inicio', 'hora_fin', 'id_estadoactividad', 'tarifa', 'id_tipoceco'
+)
+REQUERIDOS_ACTIVIDAD = (
+    'fecha', 'id_tipotrabajador', 'id_tiporendimiento', 'id_labor',
+    'id_unidad', 'id_tipoceco', 'tarifa', 'hora_inicio', 'hora_fin'
+)
+
+# Tipo de CECO en las mutaciones -> id de general_dim_cecotipo
+TIPOS_CECO = {'administrativo': 1, 'productivo': 2, 'maquinaria': 3, 'inversion': 4, 'riego': 5}
+
+
+class MutacionInvalida(Exception):
+    """La mutación no se puede aplicar; el mensaje se devuelve al cliente"""
+
+
+def _requeridos(datos, campos):
+    faltantes = [c for c in campos if datos.get(c) in (None, '')]
+    if faltantes:
+        raise MutacionInvalida(f"Campo requerido faltante: {', '.join(faltantes)}")
+
+
+def _actividad_de_sucursal(cursor, id_actividad, id_sucursal):
+    cursor.execute(
+        "SELECT id FROM tarja_fact_actividad WHERE id = %s AND id_sucursalactiva = %s",
+        (id_actividad, id_sucursal)
+    )
+    if not cursor.fetchone():
+        raise MutacionInvalida("Actividad no encontrada o no pertenece a tu sucursal")
+
+
+def _contratista_segun_tipo(datos):
+    """id_contratista solo aplica a actividades de contratista (id_tipotrabajador = 2)"""
+    if int(datos['id_tipotrabajador']) == 2:
+        if not datos.get('id_contratista'):
+            raise MutacionInvalida("El campo id_contratista es requerido cuando id_tipotrabajador es 2")
+        return datos['id_contratista']
+    return None
+
+
+# --- Actividades ---
+
+def _crear_actividad(cursor, ctx, id_registro, datos):
+    if not id_registro:
+        raise MutacionInvalida("Falta el id de la actividad")
+    _requeridos(datos, REQUERIDOS_ACTIVIDAD)
+    valores = dict(datos, id_estadoactividad=datos.get('id_estadoactividad') or 1)
+    valores['id_contratista'] = _contratista_segun_tipo(valores)
+    columnas = ('id', 'id_usuario', 'id_sucursalactiva') + COLUMNAS_ACTIVIDAD
+    cursor.execute(
+        f"INSERT INTO tarja_fact_actividad ({', '.join(columnas)}) VALUES ({', '.join(['%s'] * len(columnas))})",
+        (id_registro, ctx['usuario_id'], ctx['id_sucursal']) + tuple(valores.get(c) for c in COLUMNAS_ACTIVIDAD)
+    )
+    refrescar_ceco_actividad(cursor, id_registro)
+    registrar_cambio(cursor, 'actividad', id_registro)
+    return {"id": id_registro}
+
+
+def _editar_actividad(cursor, ctx, id_registro, datos):
+    cursor.execute(
+        "SELECT id FROM tarja_fact_actividad WHERE id = %s AND id_usuario = %s",
+        (id_registro, ctx['usuario_id'])
+    )
+    if not cursor.fetchone():
+        raise MutacionInvalida("Actividad no encontrada o no tienes permiso para editarla")
+    # Edición parcial: solo las columnas enviadas
+    cambios = {c: datos[c] for c in COLUMNAS_ACTIVIDAD if c in datos}
+    if 'id_tipotrabajador' in cambios:
+        cambios['id_contratista'] = _contratista_segun_tipo(datos)
+    if not cambios:
+        raise MutacionInvalida("No hay campos para actualizar")
+    dias_antes = dias_de_actividades(cursor, id_registro) if 'fecha' in cambios else set()
+    cursor.execute(
+        f"UPDATE tarja_fact_actividad SET {', '.join(f'{c} = %s' for c in cambios)} WHERE id = %s AND id_usuario = %s",
+        tuple(cambios.values()) + (id_registro, ctx['usuario_id'])
+    )
+    if 'id_tipoceco' in cambios:
+        refrescar_ceco_actividad(cursor, id_registro)
+    if dias_antes:
+        refrescar_colaborador_dia(cursor, dias_antes | dias_de_actividades(cursor, id_registro))
+    registrar_cambio(cursor, 'actividad', id_registro)
+    return {"id": id_registro}
+
+
+def _eliminar_actividad(cursor, ctx, id_registro, datos):
+    registrar_cambio(cursor, 'actividad', id_registro, ELIMINACION)
+    dias = dias_de_actividades(cursor, id_registro)
+    cursor.execute(
+        "DELETE FROM tarja_fact_actividad WHERE id = %s AND id_usuario = %s",
+        (id_registro, ctx['usuario_id'])
+    )
+    if cursor.rowcount == 0:
+        raise MutacionInvalida("Actividad no encontrada o no tienes permiso para eliminarla")
+    eliminar_ceco_actividad(cursor, id_registro)
+    refrescar_colaborador_dia(cursor, dias)
+    return {"id": id_registro}
+
+
+# --- Rendimientos (propio, contratista o grupal según datos.tipo) ---
+
+# Solo los rendimientos propios alimentan tarja_colaborador_dia
+TABLA_PROPIO = TIPOS_RENDIMIENTO['propio']['tabla']
+
+def _spec_rendimiento(datos):
+    spec = TIPOS_RENDIMIENTO.get(datos.get('tipo'))
+    if not spec:
+        raise MutacionInvalida(f"tipo de rendimiento inválido, valores: {', '.join(TIPOS_RENDIMIENTO)}")
+    return spec
+
+
+def _validar_fks_rendimiento(cursor, ctx, spec, datos):
+    for campo, (sql, mensaje, por_sucursal) in spec['fks'].items():
+        if datos.get(campo) in (None, ''):
+            continue
+        params = (datos[campo],) + ((ctx['id_sucursal'],) if por_sucursal else ())
+        cursor.execute(sql.format('%s'), params)
+        if not cursor.fetchone():
+            raise MutacionInvalida(mensaje)
+
+
+def _rendimiento_de_sucursal(cursor, ctx, spec, id_registro):
+    cursor.execute(f"""
+        SELECT r.id FROM {spec['tabla']} r
+        INNER JOIN tarja_fact_actividad a ON a.id = r.id_actividad
+        WHERE r.id = %s AND a.id_sucursalactiva = %s
+    """, (id_registro, ctx['id_sucursal']))
+    if not cursor.fetchone():
+        raise MutacionInvalida("Rendimiento no encontrado")
+
+
+def _crear_rendimiento(cursor, ctx, id_registro, datos):
+    spec = _spec_rendimiento(datos)
+    if not id_registro:
+        raise MutacionInvalida("Falta el id del rendimiento")
+    _requeridos(datos, ('id_actividad',) + spec['requeridos'])
+    _actividad_de_sucursal(cursor, datos['id_actividad'], ctx['id_sucursal'])
+    _validar_fks_rendimiento(cursor, ctx, spec, datos)
+    columna_trabajador = spec['trabajador']
+    if columna_trabajador:
+        cursor.execute(
+            f"SELECT id FROM {spec['tabla']} WHERE id_actividad = %s AND {columna_trabajador} = %s",
+            (datos['id_actividad'], datos[columna_trabajador])
+        )
+        if cursor.fetchone():
+            raise MutacionInvalida("Ya existe un rendimiento para esta actividad y trabajador")
+    columnas = ('id', 'id_actividad') + spec['columnas']
+    cursor.execute(
+        f"INSERT INTO {spec['tabla']} ({', '.join(columnas)}) VALUES ({', '.join(['%s'] * len(columnas))})",
+        (id_registro, datos['id_actividad']) + valores_insert_rendimiento(spec, datos)
+    )
+    registrar_cambio(cursor, ENTIDAD_POR_TABLA_RENDIMIENTO[spec['tabla']], id_registro)
+    if spec['tabla'] == TABLA_PROPIO:
+        refrescar_dias_de_rendimientos(cursor, id_registro)
+    return {"id": id_registro}
+
+
+def _editar_rendimiento(cursor, ctx, id_registro, datos):
+    spec = _spec_rendimiento(datos)
+    _rendimiento_de_sucursal(cursor, ctx, spec, id_registro)
+    cambios = {c: datos[c] for c in spec['columnas'] if c in datos}
+    if not cambios:
+        raise MutacionInvalida("No hay campos para actualizar")
+    _validar_fks_rendimiento(cursor, ctx, spec, cambios)
+    propio = spec['tabla'] == TABLA_PROPIO
+    dias_antes = dias_de_rendimientos(cursor, id_registro) if propio else set()
+    cursor.execute(
+        f"UPDATE {spec['tabla']} SET {', '.join(f'{c} = %s' for c in cambios)} WHERE id = %s",
+        tuple(cambios.values()) + (id_registro,)
+    )
+    registrar_cambio(cursor, ENTIDAD_POR_TABLA_RENDIMIENTO[spec['tabla']], id_registro)
+    if propio:
+        refrescar_dias_de_rendimientos(cursor, id_registro, dias_antes)
+    return {"id": id_registro}
+
+
+def _eliminar_rendimiento(cursor, ctx, id_registro, datos):
+    spec = _spec_rendimiento(datos)
+    _rendimiento_de_sucursal(cursor, ctx, spec, id_registro)
+    registrar_cambio(cursor, ENTIDAD_POR_TABLA_RENDIMIENTO[spec['tabla']], id_registro, ELIMINACION)
+    dias = dias_de_rendimientos(cursor, id_registro) if spec['tabla'] == TABLA_PROPIO else set()
+    cursor.execute(f"DELETE FROM {spec['tabla']} WHERE id = %s", (id_registro,))
+    refrescar_colaborador_dia(cursor, dias)
+    return {"id": id_registro}
+
+
+# --- Horas extras de rendimientos propios ---
+
+def _editar_horas_extras(cursor, ctx, id_registro, datos):
+    horas_extras = datos.get('horas_extras')
+    if not isinstance(horas_extras, (int, float)) or horas_extras < 0:
+        raise MutacionInvalida("horas_extras debe ser un número positivo")
+    cursor.execute("""
+        SELECT rp.id FROM tarja_fact_rendimientopropio rp
+        INNER JOIN general_dim_colaborador c ON rp.id_colaborador = c.id
+        WHERE rp.id = %s AND c.id_sucursal = %s
+    """, (id_registro, ctx['id_sucursal']))
+    if not cursor.fetchone():
+        raise MutacionInvalida("Rendimiento no encontrado")
+    cursor.execute(
+        "UPDATE tarja_fact_rendimientopropio SET horas_extras = %s WHERE id = %s",
+        (horas_extras, id_registro)
+    )
+    registrar_cambio(cursor, 'rendimiento_propio', id_registro)
+    refrescar_dias_de_rendimientos(cursor, id_registro)
+    return {"id": id_registro}
+
+
+# --- CECOs de actividad (el id lo genera la base, se devuelve en el resultado) ---
+
+def _tipo_ceco(datos):
+    id_tipoceco = TIPOS_CECO.get(datos.get('tipo'))
+    if not id_tipoceco:
+        raise MutacionInvalida(f"tipo de CECO inválido, valores: {', '.join(TIPOS_CECO)}")
+    return id_tipoceco
+
+
+def _crear_ceco(cursor, ctx, id_registro, datos):
+    id_tipoceco = _tipo_ceco(datos)
+    _requeridos(datos, ('id_actividad',))
+    _actividad_de_sucursal(cursor, datos['id_actividad'], ctx['id_sucursal'])
+    try:
+        id_ceco_actividad, = insertar_cecos_actividad(cursor, datos['id_actividad'], id_tipoceco, [datos])
+    except ValueError as e:
+        raise MutacionInvalida(str(e))
+    refrescar_ceco_actividad(cursor, datos['id_actividad'])
+    registrar_cambio(cursor, 'actividad', datos['id_actividad'])
+    return {"id": id_ceco_actividad}
+
+
+def _eliminar_ceco(cursor, ctx, id_registro, datos):
+    tabla = TABLAS_CECO_POR_TIPO[_tipo_ceco(datos)]
+    id_actividad = id_actividad_de_ceco(cursor, tabla, id_registro)
+    if id_actividad is None:
+        raise MutacionInvalida("CECO no encontrado")
+    _actividad_de_sucursal(cursor, id_actividad, ctx['id_sucursal'])
+    cursor.execute(f"DELETE FROM {tabla} WHERE id = %s", (id_registro,))
+    refrescar_ceco_actividad(cursor, id_actividad)
+    registrar_cambio(cursor, 'actividad', id_actividad)
+    return {"id": id_registro}
+
+
+# (entidad, operacion) -> función(cursor, ctx, id_registro, datos) que devuelve el resultado
+MANEJADORES_SYNC = {
+    ('actividad', 'crear'): _crear_actividad,
+    ('actividad', 'editar'): _editar_actividad,
+    ('actividad', 'eliminar'): _eliminar_actividad,
+    ('rendimiento', 'crear'): _crear_rendimiento,
+    ('rendimiento', 'editar'): _editar_rendimiento,
+    ('rendimiento', 'eliminar'): _eliminar_rendimiento,
+    ('horas_extras', 'editar'): _editar_horas_extras,
+    ('ceco', 'crear'): _crear_ceco,
+    ('ceco', 'eliminar'): _eliminar_ceco,
+}
+
+
+def _id_mutacion_valido(mutacion):
+    return isinstance(mutacion, dict) and isinstance(mutacion.get('id_mutacion'), str) and bool(mutacion['id_mutacion'])
+
+
+def _mutaciones_aplicadas(cursor, usuario_id, ids_mutacion):
+    """{id_mutacion: resultado} de las mutaciones del lote que el mismo usuario ya aplicó antes"""
+    ids = list(ids_mutacion)
+    if not ids:
+        return {}
+    cursor.execute(
+        f"""SELECT id_mutacion, resultado FROM tarja_sync_mutacion
+            WHERE id_mutacion IN ({', '.join(['%s'] * len(ids))}) AND id_usuario = %s""",
+        tuple(ids) + (usuario_id,)
+    )
+    return {
+        fila['id_mutacion']: json.loads(fila['resultado']) if isinstance(fila['resultado'], (str, bytes)) else fila['resultado']
+        for fila in cursor.fetchall()
+    }
+
+
+# 🚀 Aplicar en orden un lote de mutaciones hechas sin conexión
+@sync_bp.route('/push', methods=['POST'])
+@jwt_required()
+def push_mutaciones():
+    try:
+        data = request.json or {}
+        usuario_id = get_jwt_identity()
+        mutaciones = data.get('mutaciones')
+
+        if not isinstance(mutaciones, list) or not mutaciones:
+            return jsonify({"error": "mutaciones debe ser una lista no vacía"}), 400
+        if len(mutaciones) > MAXIMO_MUTACIONES_SYNC:
+            return jsonify({"error": f"Máximo {MAXIMO_MUTACIONES_SYNC} mutaciones por solicitud"}), 400
+
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
+            return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
+        ctx = {"usuario_id": usuario_id, "id_sucursal": id_sucursal}
+
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        aplicadas = _mutaciones_aplicadas(
+            cursor, usuario_id, {m['id_mutacion'] for m in mutaciones if _id_mutacion_valido(m)}
+        )
+
+        resultados = []
+        for mutacion in mutaciones:
+            if not _id_mutacion_valido(mutacion):
+                resultados.append({"id_mutacion": None, "estado": "error", "error": "Falta id_mutacion o no es texto"})
+                continue
+            id_mutacion = mutacion['id_mutacion']
+            entidad = mutacion.get('entidad')
+            operacion = mutacion.get('operacion')
+
+            # Ya aplicada (en un envío anterior o repetida en este lote): se devuelve lo guardado
+            if id_mutacion in aplicadas:
+                resultados.append({"id_mutacion": id_mutacion, "estado": "duplicada", "resultado": aplicadas[id_mutacion]})
+                continue
+
+            manejador = MANEJADORES_SYNC.get((entidad, operacion))
+            if not manejador:
+                resultados.append({
+                    "id_mutacion": id_mutacion, "estado": "error",
+                    "error": f"Operación no soportada: {entidad}/{operacion}"
+                })
+                continue
+
+            # Cada mutación en su savepoint: si falla se deshace solo ella y el lote sigue
+            cursor.execute("SAVEPOINT mutacion")
+            try:
+                # Reservar el id primero: un envío concurrente del mismo lote espera el lock y
+                # recibe clave duplicada en vez de aplicar la mutación dos veces
+                cursor.execute("""
+                    INSERT INTO tarja_sync_mutacion (id_mutacion, id_usuario, entidad, operacion)
+                    VALUES (%s, %s, %s, %s)
+                """, (id_mutacion, usuario_id, entidad, operacion))
+            except IntegrityError as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT mutacion")
+                if e.errno != errorcode.ER_DUP_ENTRY:
+                    raise
+                # Lectura con lock: ve la fila aunque se haya confirmado después de iniciar la transacción
+                cursor.execute(
+                    "SELECT id_usuario FROM tarja_sync_mutacion WHERE id_mutacion = %s LOCK IN SHARE MODE",
+                    (id_mutacion,)
+                )
+                duena = cursor.fetchone()
+                if duena and str(duena['id_usuario']) == str(usuario_id):
+                    resultados.append({"id_mutacion": id_mutacion, "estado": "duplicada", "resultado": None})
+                else:
+                    resultados.append({
+                        "id_mutacion": id_mutacion, "estado": "error",
+                        "error": "id_mutacion ya usado por otro usuario"
+                    })
+                continue
+
+            try:
+                resultado = manejador(cursor, ctx, mutacion.get('id'), mutacion.get('datos') or {})
+                cursor.execute(
+                    "UPDATE tarja_sync_mutacion SET resultado = %s WHERE id_mutacion = %s",
+                    (json.dumps(resultado, default=str), id_mutacion)
+                )
+                cursor.execute("RELEASE SAVEPOINT mutacion")
+            except Exception as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT mutacion")
+                mensaje = str(e) if isinstance(e, MutacionInvalida) else f"Error al aplicar: {e}"
+                resultados.append({"id_mutacion": id_mutacion, "estado": "error", "error": mensaje})
+                continue
+
+            aplicadas[id_mutacion] = resultado
+            resultados.append({"id_mutacion": id_mutacion, "estado": "aplicada", "resultado": resultado})
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        conteo = {estado: sum(1 for r in resultados if r['estado'] == estado) for estado in ('aplicada', 'duplicada', 'error')}
+        return jsonify({
+            "aplicadas": conteo['aplicada'],
+            "duplicadas": conteo['duplicada'],
+            "errores": conteo['error'],
+            "resultados": resultados
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# 🔄 Cambios de la sucursal desde una versión (upserts con la fila actual y tombstones)
+@sync_bp.route('/changes', methods=['GET'])
+@jwt_required()
+def obtener_cambios():
+    try:
+        usuario_id = get_jwt_identity()
+        try:
+            since = int(request.args.get('since', 0))
+            limite = min(int(request.args.get('limite', LIMITE_CAMBIOS_DEFECTO)), LIMITE_MAXIMO_CAMBIOS)
+        except ValueError:
+            return jsonify({"error": "since y limite deben ser números enteros"}), 400
+        if limite <= 0:
+            return jsonify({"error": "limite debe ser mayor que 0"}), 400
+
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        id_sucursal = request.args.get('id_sucursal')
+        if id_sucursal:
+            if not any(str(s['id']) == id_sucursal for s in sucursales_de_usuario(cursor, usuario_id)):
+                return jsonify({"error": "No tienes acceso a esta sucursal"}), 403
+        else:
+            id_sucursal = obtener_sucursal_activa(usuario_id)
+            if not id_sucursal:
+                return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
+
+        cursor.execute("""
+            SELECT version, entidad, id_registro, operacion
+            FROM tarja_sync_cambio
+            WHERE id_sucursal = %s AND version > %s
+            ORDER BY version
+            LIMIT %s
+        """, (id_sucursal, since, limite + 1))
+        filas = cursor.fetchall()
+        hay_mas = len(filas) > limite
+        filas = filas[:limite]
+
+        # Varias versiones de una misma fila en la página: basta la última
+        ultimos = {}
+        for fila in filas:
+            ultimos[(fila['entidad'], fila['id_registro'])] = fila
+
+        # Fila actual de los upserts: una consulta IN (...) por entidad
+        datos = {}
+        for entidad, sql in DATOS_POR_ENTIDAD.items():
+            ids = [i for (e, i), f in ultimos.items() if e == entidad and f['operacion'] == UPSERT]
+            if ids:
+                cursor.execute(sql.format(', '.join(['%s'] * len(ids))), tuple(ids))
+                for registro in cursor.fetchall():
+                    datos[(entidad, str(registro['id']))] = registro
+
+        cambios = []
+        for (entidad, id_registro), fila in sorted(ultimos.items(), key=lambda item: item[1]['version']):
+            registro = datos.get((entidad, id_registro)) if fila['operacion'] == UPSERT else None
+            if registro is None:
+                # Eliminada después de esta versión: se informa ya como tombstone
+                cambios.append({"version": fila['version'], "entidad": entidad, "id": id_registro, "operacion": ELIMINACION})
+            else:
+                cambios.append({"version": fila['version'], "entidad": entidad, "id": id_registro, "operacion": UPSERT, "datos": registro})
+
+        cursor.close()
+        conn.close()
+
+        return jsonify({
+            "id_sucursal": int(id_sucursal),
+            "cambios": cambios,
+            "next_since": filas[-1]['version'] if filas else since,
+            "hay_mas": hay_mas
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,108 +1,148 @@
-from flask import Blueprint, jsonify, request
-from utils.db import get_db_connection
+from flask import Blueprint, jsonify, request, Response, current_app
+from utils.db import get_db_connection, get_pool_connection
+from utils.sucursal import obtener_sucursal_activa
 from flask_jwt_extended import jwt_required, get_jwt_identity
+import csv
+import io
 
 tarja_propio_bp = Blueprint('tarja_propio_bp', __name__)
 
+# Filas por fetchmany() en los modos de exportación en streaming
+TAMANO_LOTE_STREAM = 1000
+
+
+def _consulta_tarjas(id_sucursal, args):
+    """Arma la consulta de tarjas propios con los filtros opcionales de la request"""
+    query = """
+        SELECT 
+            id_sucursal,
+            fecha,
+            id_usuario,
+            usuario,
+            id_colaborador,
+            colaborador,
+            id_labor,
+            labor,
+            id_tiporendimiento,
+            tipo_renimiento,
+            id_ceco,
+            centro_de_costo,
+            detalle_ceco,
+            horas_trabajadas,
+            id_unidad,
+            unidad,
+            rendimiento,
+            tarifa,
+            liquido_trato_dia,
+            horas_extras,
+            valor_he,
+            total_HE,
+            id_estadoactividad,
+            estado
+        FROM v_tarja_tarjaweb_tarjaspropios
+        WHERE id_sucursal = %s
+    """
+    params = [id_sucursal]
+
+    # Agregar filtros opcionales
+    filtros = (
+        ('fecha_desde', "fecha >= %s"),
+        ('fecha_hasta', "fecha <= %s"),
+        ('id_colaborador', "id_colaborador = %s"),
+        ('id_labor', "id_labor = %s"),
+        ('id_ceco', "id_ceco = %s"),
+        ('id_estadoactividad', "id_estadoactividad = %s"),
+    )
+    for parametro, condicion in filtros:
+        valor = args.get(parametro)
+        if valor:
+            query += f" AND {condicion}"
+            params.append(valor)
+
+    # Ordenar por fecha descendente
+    query += " ORDER BY fecha DESC, colaborador ASC"
+    return query, params
+
+
+def _lotes_sin_buffer(query, params):
+    """
+    Recorre el resultado con un cursor sin buffer en una conexión propia del pool,
+    de a TAMANO_LOTE_STREAM filas, para que la memoria no crezca con el rango.
+    """
+    conn = get_pool_connection()
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    completo = False
+    try:
+        cursor.execute(query, params)
+        while True:
+            filas = cursor.fetchmany(TAMANO_LOTE_STREAM)
+            if not filas:
+                completo = True
+                break
+            yield cursor.column_names, filas
+    finally:
+        try:
+            # Si el cliente cortó la descarga hay que descartar lo pendiente antes de devolver la conexión
+            if not completo:
+                conn.consume_results()
+            cursor.close()
+        finally:
+            conn.close()
+
+
+def _stream_ndjson(query, params, proveedor_json):
+    # Mismo proveedor que la respuesta JSON de la ruta, para que las filas se serialicen igual
+    for _, filas in _lotes_sin_buffer(query, params):
+        yield ''.join(proveedor_json.dumps(fila) + '\n' for fila in filas)
+
+
+def _stream_csv(query, params):
+    salida = io.StringIO()
+    writer = csv.writer(salida)
+    encabezado_escrito = False
+    # BOM para que Excel reconozca UTF-8
+    yield '\ufeff'
+    for columnas, filas in _lotes_sin_buffer(query, params):
+        if not encabezado_escrito:
+            writer.writerow(columnas)
+            encabezado_escrito = True
+        writer.writerows([fila[c] for c in columnas] for fila in filas)
+        yield salida.getvalue()
+        salida.seek(0)
+        salida.truncate(0)
+
+
 @tarja_propio_bp.route('/', methods=['GET'])
 @jwt_required()
 def obtener_tarjas_propios():
-    """Obtener tarjas propios filtrados por sucursal del usuario"""
+    """
+    Obtener tarjas propios filtrados por sucursal del usuario.
+    Con ?stream=ndjson o ?format=csv la respuesta se genera por lotes, sin cargar todo en memoria.
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         # Obtener información del usuario autenticado
-        cursor.execute("""
-            SELECT id_sucursalactiva FROM general_dim_usuario 
-            WHERE id = %s
-        """, (get_jwt_identity(),))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(get_jwt_identity())
         
-        if not usuario:
+        if not id_sucursal:
             return jsonify({"error": "Usuario no encontrado"}), 404
             
-        id_sucursal = usuario['id_sucursalactiva']
-        
-        # Obtener parámetros de consulta opcionales
-        fecha_desde = request.args.get('fecha_desde')
-        fecha_hasta = request.args.get('fecha_hasta')
-        id_colaborador = request.args.get('id_colaborador')
-        id_labor = request.args.get('id_labor')
-        id_ceco = request.args.get('id_ceco')
-        id_estadoactividad = request.args.get('id_estadoactividad')
-        
-        # Construir query base
-        query = """
-            SELECT 
-                id_sucursal,
-                fecha,
-                id_usuario,
-                usuario,
-                id_colaborador,
-                colaborador,
-                id_labor,
-                labor,
-                id_tiporendimiento,
-                tipo_renimiento,
-                id_ceco,
-                centro_de_costo,
-                detalle_ceco,
-                horas_trabajadas,
-                id_unidad,
-                unidad,
-                rendimiento,
-                tarifa,
-                liquido_trato_dia,
-                horas_extras,
-                valor_he,
-                total_HE,
-                id_estadoactividad,
-                estado
-            FROM v_tarja_tarjaweb_tarjaspropios
-            WHERE id_sucursal = %s
-        """
-        
-        params = [id_sucursal]
-        
-        # Agregar filtros opcionales
-        if fecha_desde:
-            query += " AND fecha >= %s"
-            params.append(fecha_desde)
-            
-        if fecha_hasta:
-            query += " AND fecha <= %s"
-            params.append(fecha_hasta)
-            
-        if id_colaborador:
-            query += " AND id_colaborador = %s"
-            params.append(id_colaborador)
-            
-        if id_labor:
-            query += " AND id_labor = %s"
-            params.append(id_labor)
-            
-        if id_ceco:
-            query += " AND id_ceco = %s"
-            params.append(id_ceco)
-            
-        if id_estadoactividad:
-            query += " AND id_estadoactividad = %s"
-            params.append(id_estadoactividad)
-        
-        # Ordenar por fecha descendente
-        query += " ORDER BY fecha DESC, colaborador ASC"
-        
+        query, params = _consulta_tarjas(id_sucursal, request.args)
+
+        if request.args.get('stream') == 'ndjson':
+            # current_app no está disponible dentro del generador: se captura antes de empezar
+            return Response(_stream_ndjson(query, params, current_app.json), mimetype='application/x-ndjson')
+        if request.args.get('format') == 'csv':
+            return Response(
+                _stream_csv(query, params),
+                mimetype='text/csv',
+                headers={"Content-Disposition": "attachment; filename=tarjas_propios.csv"}
+            )
+
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
         cursor.execute(query, params)
         tarjas = cursor.fetchall()
         
-        # Convertir campos de tiempo a string para evitar errores de serialización JSON
-        for tarja in tarjas:
-            if tarja.get('horas_trabajadas'):
-                tarja['horas_trabajadas'] = str(tarja['horas_trabajadas'])
-            if tarja.get('horas_extras'):
-                tarja['horas_extras'] = str(tarja['horas_extras'])
-        
         cursor.close()
         conn.close()
         
@@ -123,16 +163,11 @@ def obtener_resumen_tarjas_propios():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener información del usuario autenticado
-        cursor.execute("""
-            SELECT id_sucursalactiva FROM general_dim_usuario 
-            WHERE id = %s
-        """, (get_jwt_identity(),))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(get_jwt_identity())
         
-        if not usuario:
+        if not id_sucursal:
             return jsonify({"error": "Usuario no encontrado"}), 404
             
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Obtener parámetros de consulta opcionales
         fecha_desde = request.args.get('fecha_desde')
@@ -170,13 +205,6 @@ def obtener_resumen_tarjas_propios():
         cursor.execute(query, params)
         resumen = cursor.fetchall()
         
-        # Convertir campos de tiempo a string para evitar errores de serialización JSON
-        for item in resumen:
-            if item.get('total_horas_trabajadas'):
-                item['total_horas_trabajadas'] = str(item['total_horas_trabajadas'])
-            if item.get('total_horas_extras'):
-                item['total_horas_extras'] = str(item['total_horas_extras'])
-        
         cursor.close()
         conn.close()
         
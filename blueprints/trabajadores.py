@@ -1,6 +1,9 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.db import get_db_connection
+from utils.paralelo import consultar_en_paralelo
+from utils.sucursal import obtener_sucursal_activa
+from utils.cambios import registrar_cambio, ELIMINACION
 from utils.validar_rut import validar_rut
 import uuid
 
@@ -21,11 +24,9 @@ def obtener_trabajadores():
 
         # Si no se pasa id_sucursal, usar la sucursal activa del usuario
         if not id_sucursal:
-            cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-            usuario = cursor.fetchone()
-            if not usuario or usuario['id_sucursalactiva'] is None:
+            id_sucursal = obtener_sucursal_activa(usuario_id)
+            if id_sucursal is None:
                 return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
-            id_sucursal = usuario['id_sucursalactiva']
 
         base_query = """
             SELECT t.id, t.rut, t.codigo_verificador, t.nombre, t.apellido_paterno, t.apellido_materno,
@@ -79,13 +80,11 @@ def crear_trabajador():
         cursor = conn.cursor(dictionary=True)
 
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
+        id_sucursal = obtener_sucursal_activa(usuario_id)
 
-        if not usuario or not usuario['id_sucursalactiva']:
+        if not id_sucursal:
             return jsonify({"error": "No se pudo obtener la sucursal activa"}), 400
 
-        id_sucursal = usuario['id_sucursalactiva']
 
         # Validar que el contratista existe, está activo y pertenece a la sucursal del usuario
         cursor.execute("""
@@ -127,6 +126,7 @@ def crear_trabajador():
             data['id_estado'],
             id_sucursal
         ))
+        registrar_cambio(cursor, 'trabajador', trabajador_id)
 
         conn.commit()
         cursor.close()
@@ -184,6 +184,7 @@ def editar_trabajador(trabajador_id):
             id_contratista, id_porcentaje, id_estado,
             trabajador_id
         ))
+        registrar_cambio(cursor, 'trabajador', trabajador_id)
 
         conn.commit()
         cursor.close()
@@ -223,50 +224,37 @@ def obtener_opciones_crear_trabajador():
     try:
         usuario_id = get_jwt_identity()
         
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se pudo obtener la sucursal activa"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
-        
-        # Obtener contratistas disponibles (solo de la sucursal del usuario)
-        cursor.execute("""
-            SELECT c.id, c.nombre, c.rut, c.codigo_verificador
-            FROM general_dim_contratista c
-            INNER JOIN general_pivot_contratista_sucursal cs ON c.id = cs.id_contratista
-            WHERE c.id_estado = 1 AND cs.id_sucursal = %s
-            ORDER BY c.nombre ASC
-        """, (id_sucursal,))
-        contratistas = cursor.fetchall()
-        
-        # Obtener porcentajes disponibles
-        cursor.execute("""
-            SELECT id, porcentaje
-            FROM general_dim_porcentajecontratista
-            ORDER BY porcentaje ASC
-        """)
-        porcentajes = cursor.fetchall()
-        
-        # Obtener estados disponibles
-        cursor.execute("""
-            SELECT id, nombre
-            FROM general_dim_estado
-            ORDER BY nombre ASC
-        """)
-        estados = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
+        # Catálogos independientes: se consultan en paralelo
+        opciones = consultar_en_paralelo({
+            # Contratistas disponibles (solo de la sucursal del usuario)
+            'contratistas': ("""
+                SELECT c.id, c.nombre, c.rut, c.codigo_verificador
+                FROM general_dim_contratista c
+                INNER JOIN general_pivot_contratista_sucursal cs ON c.id = cs.id_contratista
+                WHERE c.id_estado = 1 AND cs.id_sucursal = %s
+                ORDER BY c.nombre ASC
+            """, (id_sucursal,)),
+            'porcentajes': ("""
+                SELECT id, porcentaje
+                FROM general_dim_porcentajecontratista
+                ORDER BY porcentaje ASC
+            """, None),
+            'estados': ("""
+                SELECT id, nombre
+                FROM general_dim_estado
+                ORDER BY nombre ASC
+            """, None),
+        })
         
         return jsonify({
-            "contratistas": contratistas,
-            "porcentajes": porcentajes,
-            "estados": estados,
+            "contratistas": opciones['contratistas'],
+            "porcentajes": opciones['porcentajes'],
+            "estados": opciones['estados'],
             "sucursal_activa": id_sucursal
         }), 200
         
@@ -284,12 +272,10 @@ def obtener_opciones_editar_trabajador(trabajador_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se pudo obtener la sucursal activa"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Obtener trabajador actual
         cursor.execute("""
@@ -355,12 +341,10 @@ def eliminar_trabajador(trabajador_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se pudo obtener la sucursal activa"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que el trabajador existe y pertenece a la sucursal del usuario
         cursor.execute("""
@@ -373,6 +357,7 @@ def eliminar_trabajador(trabajador_id):
             return jsonify({"error": "Trabajador no encontrado o no tienes permisos para eliminarlo"}), 404
         
         # Eliminar el trabajador
+        registrar_cambio(cursor, 'trabajador', trabajador_id, ELIMINACION)
         cursor.execute("DELETE FROM general_dim_trabajador WHERE id = %s", (trabajador_id,))
         conn.commit()
         cursor.close()
@@ -1,45 +1,27 @@
 from flask import Blueprint, jsonify, request
 from utils.db import get_db_connection
+from utils.sucursal import obtener_sucursal_activa as sucursal_activa_de, invalidar_sucursal_activa
+from utils.pivot import sincronizar_pivot
+from utils.permisos import requiere_permiso, invalidar_permisos, ID_PERMISO_FULL, PERFIL_ADMIN
+from utils.claves import hashear_clave, ServicioClavesOcupado
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import bcrypt
 from datetime import date
 import uuid
 
 
 usuarios_bp = Blueprint('usuarios_bp', __name__)
 
-def verificar_admin(usuario_id):
-    """Verifica si el usuario tiene perfil de administrador (id_perfil = 3)"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id_perfil FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-    usuario = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    return usuario and usuario['id_perfil'] == 3
-
-def verificar_permiso_full(usuario_id):
-    """Verifica si el usuario tiene permiso Full (id=6) para gestionar usuarios"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("""
-        SELECT up.id_permiso 
-        FROM usuario_pivot_permiso_usuario up
-        WHERE up.id_usuario = %s AND up.id_permiso = '6'
-    """, (usuario_id,))
-    permiso = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    return permiso is not None
+# Acceso a la gestión de usuarios (permiso Full) y a la de sucursales/apps (perfil administrador)
+requiere_permiso_full = requiere_permiso(
+    id_permiso=ID_PERMISO_FULL, mensaje="No autorizado. Se requiere permiso Full para gestionar usuarios"
+)
+requiere_admin = requiere_permiso(perfil=PERFIL_ADMIN)
 
 # 🔹 Obtener todos los usuarios
 @usuarios_bp.route('/', methods=['GET'])
 @jwt_required()
+@requiere_permiso_full
 def obtener_usuarios():
-    usuario_id = get_jwt_identity()
-    if not verificar_permiso_full(usuario_id):
-        return jsonify({"error": "No autorizado. Se requiere permiso Full para gestionar usuarios"}), 403
-    
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
@@ -67,11 +49,8 @@ def obtener_usuarios():
 # 🔹 Crear nuevo usuario (solo admin)
 @usuarios_bp.route('/', methods=['POST'])
 @jwt_required()
+@requiere_permiso_full
 def crear_usuario():
-    usuario_id = get_jwt_identity()
-    if not verificar_permiso_full(usuario_id):
-        return jsonify({"error": "No autorizado. Se requiere permiso Full para gestionar usuarios"}), 403
-
     data = request.json
     
     usuario = data.get('usuario')
@@ -119,9 +98,8 @@ def crear_usuario():
             conn.close()
             return jsonify({"error": "Ya existe un usuario con ese nombre de usuario o correo"}), 400
 
-        # Generar hash bcrypt
-        salt = bcrypt.gensalt()
-        clave_encriptada = bcrypt.hashpw(clave.encode('utf-8'), salt).decode('utf-8')
+        # Generar hash bcrypt (en el pool de claves)
+        clave_encriptada = hashear_clave(clave)
 
         # Valores por defecto para campos ocultos
         id_estado = 1  # Activo por defecto
@@ -154,19 +132,11 @@ def crear_usuario():
         
         # Asignar permisos opcionales si se proporcionan
         if permisos and isinstance(permisos, list):
-            for permiso_id in permisos:
-                cursor.execute("""
-                    INSERT INTO usuario_pivot_permiso_usuario (id_usuario, id_permiso)
-                    VALUES (%s, %s)
-                """, (usuario_id, permiso_id))
+            sincronizar_pivot(cursor, 'usuario_pivot_permiso_usuario', 'id_permiso', usuario_id, permisos)
         
         # Asignar sucursales adicionales si se proporcionan
         if sucursales_adicionales and isinstance(sucursales_adicionales, list):
-            for sucursal_id in sucursales_adicionales:
-                cursor.execute("""
-                    INSERT INTO usuario_pivot_sucursal_usuario (id_sucursal, id_usuario)
-                    VALUES (%s, %s)
-                """, (sucursal_id, usuario_id))
+            sincronizar_pivot(cursor, 'usuario_pivot_sucursal_usuario', 'id_sucursal', usuario_id, sucursales_adicionales)
         
         conn.commit()
         cursor.close()
@@ -185,17 +155,16 @@ def crear_usuario():
             "sucursales_adicionales": sucursales_adicionales
         }), 201
         
+    except ServicioClavesOcupado as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # Editar usuarios
 @usuarios_bp.route('/<string:usuario_id>', methods=['PUT'])
 @jwt_required()
+@requiere_permiso_full
 def editar_usuario(usuario_id):
-    usuario_logueado = get_jwt_identity()
-    if not verificar_permiso_full(usuario_logueado):
-        return jsonify({"error": "No autorizado. Se requiere permiso Full para gestionar usuarios"}), 403
-
     data = request.json
     
     # Validar que el usuario_id sea válido
@@ -271,8 +240,7 @@ def editar_usuario(usuario_id):
         
         # Preparar la actualización
         if clave:  # Solo si se envió una nueva clave
-            salt = bcrypt.gensalt()
-            clave_encriptada = bcrypt.hashpw(clave.encode('utf-8'), salt).decode('utf-8')
+            clave_encriptada = hashear_clave(clave)
             sql = """
                 UPDATE general_dim_usuario 
                 SET usuario = %s, correo = %s, clave = %s, id_sucursalactiva = %s, id_estado = %s,
@@ -317,35 +285,17 @@ def editar_usuario(usuario_id):
         
         # Manejar permisos si se proporcionan
         if permisos is not None and isinstance(permisos, list):
-            # Eliminar permisos existentes del usuario
-            cursor.execute("""
-                DELETE FROM usuario_pivot_permiso_usuario 
-                WHERE id_usuario = %s
-            """, (usuario_id,))
-            
-            # Asignar nuevos permisos
-            for permiso_id in permisos:
-                cursor.execute("""
-                    INSERT INTO usuario_pivot_permiso_usuario (id_usuario, id_permiso)
-                    VALUES (%s, %s)
-                """, (usuario_id, permiso_id))
+            # Solo se borran los permisos quitados y se insertan los nuevos
+            sincronizar_pivot(cursor, 'usuario_pivot_permiso_usuario', 'id_permiso', usuario_id, permisos)
         
         # Manejar sucursales adicionales si se proporcionan
         if sucursales_adicionales is not None and isinstance(sucursales_adicionales, list):
-            # Eliminar sucursales adicionales existentes del usuario
-            cursor.execute("""
-                DELETE FROM usuario_pivot_sucursal_usuario 
-                WHERE id_usuario = %s
-            """, (usuario_id,))
-            
-            # Asignar nuevas sucursales adicionales
-            for sucursal_id in sucursales_adicionales:
-                cursor.execute("""
-                    INSERT INTO usuario_pivot_sucursal_usuario (id_sucursal, id_usuario)
-                    VALUES (%s, %s)
-                """, (sucursal_id, usuario_id))
+            # Solo se borran las sucursales quitadas y se insertan las nuevas
+            sincronizar_pivot(cursor, 'usuario_pivot_sucursal_usuario', 'id_sucursal', usuario_id, sucursales_adicionales)
         
         conn.commit()
+        invalidar_sucursal_activa(usuario_id)
+        invalidar_permisos(usuario_id)
         cursor.close()
         conn.close()
 
@@ -363,18 +313,17 @@ def editar_usuario(usuario_id):
             "filas_afectadas": filas_afectadas
         }), 200
         
+    except ServicioClavesOcupado as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # 🔹 Obtener sucursales de un usuario específico
 @usuarios_bp.route('/<string:usuario_id>/sucursales', methods=['GET'])
 @jwt_required()
+@requiere_permiso_full
 def obtener_sucursales_usuario(usuario_id):
     """Obtener sucursales adicionales de un usuario específico"""
-    usuario_logueado = get_jwt_identity()
-    if not verificar_permiso_full(usuario_logueado):
-        return jsonify({"error": "No autorizado. Se requiere permiso Full para gestionar usuarios"}), 403
-    
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
@@ -417,12 +366,9 @@ def obtener_sucursales_usuario(usuario_id):
 # 🔹 Obtener permisos de un usuario específico
 @usuarios_bp.route('/<string:usuario_id>/permisos', methods=['GET'])
 @jwt_required()
+@requiere_permiso_full
 def obtener_permisos_usuario(usuario_id):
     """Obtener permisos actuales de un usuario específico"""
-    usuario_logueado = get_jwt_identity()
-    if not verificar_permiso_full(usuario_logueado):
-        return jsonify({"error": "No autorizado. Se requiere permiso Full para gestionar usuarios"}), 403
-    
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
@@ -464,25 +410,17 @@ def obtener_permisos_usuario(usuario_id):
 #Eliminar usuario
 @usuarios_bp.route('/<string:usuario_id>', methods=['DELETE'])
 @jwt_required()
+@requiere_permiso_full
+@requiere_admin
 def eliminar_usuario(usuario_id):
-    usuario_logueado = get_jwt_identity()
-    if not verificar_permiso_full(usuario_logueado):
-        return jsonify({"error": "No autorizado. Se requiere permiso Full para gestionar usuarios"}), 403
-
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
 
-    # Verificar si el usuario logueado es administrador
-    cursor.execute("SELECT id_perfil FROM general_dim_usuario WHERE id = %s", (usuario_logueado,))
-    usuario = cursor.fetchone()
-    if not usuario or usuario['id_perfil'] != 3:
-        cursor.close()
-        conn.close()
-        return jsonify({"error": "No autorizado"}), 403
-
     try:
         cursor.execute("DELETE FROM general_dim_usuario WHERE id = %s", (usuario_id,))
         conn.commit()
+        invalidar_sucursal_activa(usuario_id)
+        invalidar_permisos(usuario_id)
         cursor.close()
         conn.close()
 
@@ -493,12 +431,9 @@ def eliminar_usuario(usuario_id):
 # 🔹 Obtener permisos disponibles para la app (id_app = 3)
 @usuarios_bp.route('/permisos-disponibles', methods=['GET'])
 @jwt_required()
+@requiere_permiso_full
 def obtener_permisos_disponibles():
     """Obtener permisos disponibles para la app (id_app = 3)"""
-    usuario_id = get_jwt_identity()
-    if not verificar_permiso_full(usuario_id):
-        return jsonify({"error": "No autorizado. Se requiere permiso Full para gestionar usuarios"}), 403
-    
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
@@ -525,12 +460,9 @@ def obtener_permisos_disponibles():
 # 🔹 Obtener sucursales disponibles
 @usuarios_bp.route('/sucursales-disponibles', methods=['GET'])
 @jwt_required()
+@requiere_permiso_full
 def obtener_sucursales_disponibles():
     """Obtener sucursales disponibles para asignar a usuarios"""
-    usuario_id = get_jwt_identity()
-    if not verificar_permiso_full(usuario_id):
-        return jsonify({"error": "No autorizado. Se requiere permiso Full para gestionar usuarios"}), 403
-    
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
@@ -560,19 +492,12 @@ def obtener_sucursal_usuario():
     try:
         usuario_id = get_jwt_identity()
 
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-
-        cursor.close()
-        conn.close()
+        id_sucursal = sucursal_activa_de(usuario_id)
 
-        if not usuario or not usuario['id_sucursalactiva']:
+        if not id_sucursal:
             return jsonify({"error": "Usuario no encontrado o sin sucursal asignada"}), 404
 
-        return jsonify({"id_sucursal": usuario['id_sucursalactiva']}), 200
+        return jsonify({"id_sucursal": id_sucursal}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -610,6 +535,7 @@ def actualizar_sucursal_activa():
             """, (nueva_sucursal, usuario_id))
             
         conn.commit()
+        invalidar_sucursal_activa(usuario_id)
 
             # Obtener el nombre de la sucursal para la respuesta
         cursor.execute("""
@@ -639,19 +565,12 @@ def obtener_sucursal_activa():
     usuario_id = get_jwt_identity()
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        id_sucursal = sucursal_activa_de(usuario_id)
 
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-
-        cursor.close()
-        conn.close()
-
-        if not usuario or usuario['id_sucursalactiva'] is None:
+        if id_sucursal is None:
             return jsonify({"error": "No se encontró la sucursal activa"}), 404
 
-        return jsonify({"sucursal_activa": usuario['id_sucursalactiva']}), 200
+        return jsonify({"sucursal_activa": id_sucursal}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -666,13 +585,11 @@ def obtener_colaboradores():
     cursor = conn.cursor(dictionary=True)
     if not id_sucursal:
         # Buscar sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = sucursal_activa_de(usuario_id)
+        if not id_sucursal:
             cursor.close()
             conn.close()
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
-        id_sucursal = usuario['id_sucursalactiva']
     # Buscar colaboradores activos de la sucursal
     cursor.execute("""
         SELECT id, nombre, apellido_paterno, apellido_materno, rut, codigo_verificador, id_cargo
@@ -688,11 +605,8 @@ def obtener_colaboradores():
 # Obtener todas las sucursales disponibles (para crear usuarios)
 @usuarios_bp.route('/sucursales', methods=['GET'])
 @jwt_required()
+@requiere_admin
 def obtener_sucursales():
-    usuario_id = get_jwt_identity()
-    if not verificar_admin(usuario_id):
-        return jsonify({"error": "No autorizado"}), 403
-
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
@@ -716,11 +630,8 @@ def obtener_sucursales():
 # Obtener sucursales permitidas de un usuario
 @usuarios_bp.route('/<string:usuario_id>/sucursales-permitidas', methods=['GET'])
 @jwt_required()
+@requiere_admin
 def obtener_sucursales_permitidas(usuario_id):
-    usuario_logueado = get_jwt_identity()
-    if not verificar_admin(usuario_logueado):
-        return jsonify({"error": "No autorizado"}), 403
-
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
@@ -745,11 +656,8 @@ def obtener_sucursales_permitidas(usuario_id):
 # Asignar sucursales permitidas a un usuario
 @usuarios_bp.route('/<string:usuario_id>/sucursales-permitidas', methods=['POST'])
 @jwt_required()
+@requiere_admin
 def asignar_sucursales_permitidas(usuario_id):
-    usuario_logueado = get_jwt_identity()
-    if not verificar_admin(usuario_logueado):
-        return jsonify({"error": "No autorizado"}), 403
-
     data = request.json
     sucursales_ids = data.get('sucursales_ids', [])  # Lista de IDs de sucursales
 
@@ -782,16 +690,10 @@ def asignar_sucursales_permitidas(usuario_id):
                 conn.close()
                 return jsonify({"error": "Una o más sucursales no existen o no son del tipo correcto"}), 400
 
-        # Eliminar todas las asignaciones actuales del usuario
-        cursor.execute("DELETE FROM usuario_pivot_sucursal_usuario WHERE id_usuario = %s", (usuario_id,))
-        
-        # Insertar las nuevas asignaciones
-        if sucursales_ids:
-            for sucursal_id in sucursales_ids:
-                cursor.execute("""
-                    INSERT INTO usuario_pivot_sucursal_usuario (id_sucursal, id_usuario)
-                    VALUES (%s, %s)
-                """, (sucursal_id, usuario_id))
+        # Aplicar solo la diferencia con las asignaciones actuales
+        agregadas, quitadas = sincronizar_pivot(
+            cursor, 'usuario_pivot_sucursal_usuario', 'id_sucursal', usuario_id, sucursales_ids
+        )
         
         conn.commit()
         cursor.close()
@@ -800,7 +702,9 @@ def asignar_sucursales_permitidas(usuario_id):
         return jsonify({
             "message": "Sucursales permitidas asignadas correctamente",
             "usuario_id": usuario_id,
-            "sucursales_asignadas": len(sucursales_ids)
+            "sucursales_asignadas": len(sucursales_ids),
+            "agregadas": agregadas,
+            "quitadas": quitadas
         }), 200
         
     except Exception as e:
@@ -809,11 +713,8 @@ def asignar_sucursales_permitidas(usuario_id):
 # Eliminar todas las sucursales permitidas de un usuario
 @usuarios_bp.route('/<string:usuario_id>/sucursales-permitidas', methods=['DELETE'])
 @jwt_required()
+@requiere_admin
 def eliminar_sucursales_permitidas(usuario_id):
-    usuario_logueado = get_jwt_identity()
-    if not verificar_admin(usuario_logueado):
-        return jsonify({"error": "No autorizado"}), 403
-
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -846,11 +747,8 @@ def eliminar_sucursales_permitidas(usuario_id):
 # Obtener todas las aplicaciones disponibles
 @usuarios_bp.route('/apps', methods=['GET'])
 @jwt_required()
+@requiere_admin
 def obtener_apps():
-    usuario_id = get_jwt_identity()
-    if not verificar_admin(usuario_id):
-        return jsonify({"error": "No autorizado"}), 403
-
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
@@ -872,11 +770,8 @@ def obtener_apps():
 # Obtener aplicaciones permitidas de un usuario
 @usuarios_bp.route('/<string:usuario_id>/apps-permitidas', methods=['GET'])
 @jwt_required()
+@requiere_admin
 def obtener_apps_permitidas(usuario_id):
-    usuario_logueado = get_jwt_identity()
-    if not verificar_admin(usuario_logueado):
-        return jsonify({"error": "No autorizado"}), 403
-
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
@@ -901,11 +796,8 @@ def obtener_apps_permitidas(usuario_id):
 # Asignar aplicaciones permitidas a un usuario
 @usuarios_bp.route('/<string:usuario_id>/apps-permitidas', methods=['POST'])
 @jwt_required()
+@requiere_admin
 def asignar_apps_permitidas(usuario_id):
-    usuario_logueado = get_jwt_identity()
-    if not verificar_admin(usuario_logueado):
-        return jsonify({"error": "No autorizado"}), 403
-
     data = request.json
     apps_ids = data.get('apps_ids', [])  # Lista de IDs de aplicaciones
 
@@ -938,18 +830,10 @@ def asignar_apps_permitidas(usuario_id):
                 conn.close()
                 return jsonify({"error": "Una o más aplicaciones no existen"}), 400
 
-        # Eliminar todas las asignaciones actuales del usuario
-        cursor.execute("DELETE FROM usuario_pivot_app_usuario WHERE id_usuario = %s", (usuario_id,))
-        
-        # Insertar las nuevas asignaciones
-        if apps_ids:
-            for app_id in apps_ids:
-                # Generar UUID para el id de la tabla pivote
-                pivot_id = str(uuid.uuid4())
-                cursor.execute("""
-                    INSERT INTO usuario_pivot_app_usuario (id, id_usuario, id_app)
-                    VALUES (%s, %s, %s)
-                """, (pivot_id, usuario_id, app_id))
+        # Aplicar solo la diferencia con las asignaciones actuales (la tabla pivote lleva un UUID por fila)
+        agregadas, quitadas = sincronizar_pivot(
+            cursor, 'usuario_pivot_app_usuario', 'id_app', usuario_id, apps_ids, generar_id=True
+        )
         
         conn.commit()
         cursor.close()
@@ -958,7 +842,9 @@ def asignar_apps_permitidas(usuario_id):
         return jsonify({
             "message": "Aplicaciones permitidas asignadas correctamente",
             "usuario_id": usuario_id,
-            "apps_asignadas": len(apps_ids)
+            "apps_asignadas": len(apps_ids),
+            "agregadas": agregadas,
+            "quitadas": quitadas
         }), 200
         
     except Exception as e:
@@ -967,11 +853,8 @@ def asignar_apps_permitidas(usuario_id):
 # Eliminar todas las aplicaciones permitidas de un usuario
 @usuarios_bp.route('/<string:usuario_id>/apps-permitidas', methods=['DELETE'])
 @jwt_required()
+@requiere_admin
 def eliminar_apps_permitidas(usuario_id):
-    usuario_logueado = get_jwt_identity()
-    if not verificar_admin(usuario_logueado):
-        return jsonify({"error": "No autorizado"}), 403
-
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
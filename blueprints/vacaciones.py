@@ -1,100 +1,21 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.db import get_db_connection
+from utils.sucursal import obtener_sucursal_activa
+from utils.calendario import calendario, contar_dias_habiles
 import uuid
 from datetime import datetime
 
 vacaciones_bp = Blueprint('vacaciones_bp', __name__)
 
-def calcular_dias_habiles(fecha_inicio, fecha_fin, cursor):
+def calcular_dias_habiles(fecha_inicio, fecha_fin):
     """
     Calcula los días hábiles entre dos fechas usando la tabla general_dim_fecha
-    SOLO cuenta días marcados como 'dia habil' (excluye fines de semana y festivos)
+    SOLO cuenta días marcados como 'dia habil' (excluye fines de semana y festivos).
+    Se resuelve contra el calendario en memoria (utils/calendario.py), sin consultas por llamada.
     """
     try:
-        # Convertir fechas a formato date si vienen como datetime
-        if hasattr(fecha_inicio, 'date'):
-            fecha_inicio = fecha_inicio.date()
-        if hasattr(fecha_fin, 'date'):
-            fecha_fin = fecha_fin.date()
-        
-        print(f"DEBUG - Calculando días hábiles de {fecha_inicio} a {fecha_fin}")
-        
-        # Verificar si hay datos en el rango
-        cursor.execute("""
-            SELECT COUNT(*) as total_dias
-            FROM general_dim_fecha 
-            WHERE fecha BETWEEN %s AND %s
-        """, (fecha_inicio, fecha_fin))
-        
-        total_dias = cursor.fetchone()['total_dias']
-        print(f"DEBUG - Total días en rango: {total_dias}")
-        
-        if total_dias == 0:
-            print(f"DEBUG - No hay datos en la tabla para el rango {fecha_inicio} a {fecha_fin}")
-            print(f"DEBUG - Retornando 0 días hábiles (no se puede calcular sin datos de la tabla)")
-            return 0
-        
-        # Verificar qué categorías existen en el rango
-        cursor.execute("""
-            SELECT DISTINCT categoria, COUNT(*) as cantidad
-            FROM general_dim_fecha 
-            WHERE fecha BETWEEN %s AND %s
-            GROUP BY categoria
-        """, (fecha_inicio, fecha_fin))
-        
-        categorias = cursor.fetchall()
-        print(f"DEBUG - Categorías encontradas: {categorias}")
-        
-        # Buscar SOLO días hábiles usando la categoría 'dia habil'
-        cursor.execute("""
-            SELECT COUNT(*) as dias_habiles
-            FROM general_dim_fecha 
-            WHERE fecha BETWEEN %s AND %s AND categoria = 'dia habil'
-        """, (fecha_inicio, fecha_fin))
-        
-        resultado = cursor.fetchone()
-        dias_habiles = resultado['dias_habiles'] if resultado else 0
-        
-        print(f"DEBUG - Días hábiles encontrados (categoría 'dia habil'): {dias_habiles}")
-        
-        # Si no encuentra con 'dia habil', probar con otras variaciones similares
-        if dias_habiles == 0:
-            print(f"DEBUG - Probando otras categorías similares...")
-            cursor.execute("""
-                SELECT COUNT(*) as dias_habiles
-                FROM general_dim_fecha 
-                WHERE fecha BETWEEN %s AND %s 
-                AND (categoria LIKE '%habil%' OR categoria LIKE '%laboral%' OR categoria LIKE '%trabajo%')
-            """, (fecha_inicio, fecha_fin))
-            
-            resultado = cursor.fetchone()
-            dias_habiles = resultado['dias_habiles'] if resultado else 0
-            print(f"DEBUG - Días hábiles con LIKE: {dias_habiles}")
-        
-        # Si no encuentra datos en la tabla, usar fallback que al menos excluye fines de semana
-        # pero con advertencia de que no excluye festivos
-        if dias_habiles == 0:
-            print(f"DEBUG - No se encontraron días hábiles en la tabla de fechas")
-            print(f"DEBUG - Usando fallback que excluye solo fines de semana (NO excluye festivos)")
-            
-            from datetime import timedelta
-            
-            dias_habiles = 0
-            fecha_actual = fecha_inicio
-            
-            while fecha_actual <= fecha_fin:
-                # Lunes = 0, Domingo = 6
-                if fecha_actual.weekday() < 5:  # Lunes a Viernes
-                    dias_habiles += 1
-                fecha_actual += timedelta(days=1)
-            
-            print(f"DEBUG - Días hábiles calculados por semana (fallback): {dias_habiles}")
-            print(f"DEBUG - ADVERTENCIA: Este cálculo NO excluye festivos, solo fines de semana")
-        
-        print(f"DEBUG - Días hábiles finales: {dias_habiles}")
-        return dias_habiles
-        
+        return contar_dias_habiles(fecha_inicio, fecha_fin)
     except Exception as e:
         print(f"ERROR - Error calculando días hábiles: {e}")
         return 0
@@ -111,12 +32,10 @@ def listar_vacaciones():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Construir query base
         base_query = """
@@ -147,7 +66,7 @@ def listar_vacaciones():
         
         # Calcular días hábiles para cada vacación
         for vacacion in vacaciones:
-            dias_habiles = calcular_dias_habiles(vacacion['fecha_inicio'], vacacion['fecha_fin'], cursor)
+            dias_habiles = calcular_dias_habiles(vacacion['fecha_inicio'], vacacion['fecha_fin'])
             vacacion['dias_habiles'] = dias_habiles
         
         cursor.close()
@@ -169,12 +88,10 @@ def obtener_vacacion_por_id(vacacion_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Obtener vacación con información del colaborador
         cursor.execute("""
@@ -200,7 +117,7 @@ def obtener_vacacion_por_id(vacacion_id):
             return jsonify({"error": "Vacación no encontrada"}), 404
         
         # Calcular días hábiles
-        dias_habiles = calcular_dias_habiles(vacacion['fecha_inicio'], vacacion['fecha_fin'], cursor)
+        dias_habiles = calcular_dias_habiles(vacacion['fecha_inicio'], vacacion['fecha_fin'])
         vacacion['dias_habiles'] = dias_habiles
         
         cursor.close()
@@ -238,12 +155,10 @@ def crear_vacacion():
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que el colaborador existe y pertenece a la sucursal
         cursor.execute("""
@@ -278,7 +193,7 @@ def crear_vacacion():
         vacacion_id = cursor.lastrowid
         
         # Calcular días hábiles
-        dias_habiles = calcular_dias_habiles(fecha_inicio, fecha_fin, cursor)
+        dias_habiles = calcular_dias_habiles(fecha_inicio, fecha_fin)
         
         conn.commit()
         cursor.close()
@@ -305,12 +220,10 @@ def editar_vacacion(vacacion_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Obtener vacación actual
         cursor.execute("""
@@ -366,7 +279,7 @@ def editar_vacacion(vacacion_id):
         cursor.execute(sql, (fecha_inicio, fecha_fin, vacacion_id))
         
         # Calcular días hábiles
-        dias_habiles = calcular_dias_habiles(fecha_inicio, fecha_fin, cursor)
+        dias_habiles = calcular_dias_habiles(fecha_inicio, fecha_fin)
         
         conn.commit()
         cursor.close()
@@ -391,12 +304,10 @@ def eliminar_vacacion(vacacion_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Verificar que la vacación existe y pertenece a un colaborador de la sucursal
         cursor.execute("""
@@ -432,12 +343,10 @@ def obtener_vacaciones_colaborador(id_colaborador):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener sucursal activa del usuario
-        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
-        usuario = cursor.fetchone()
-        if not usuario or not usuario['id_sucursalactiva']:
+        id_sucursal = obtener_sucursal_activa(usuario_id)
+        if not id_sucursal:
             return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
         
-        id_sucursal = usuario['id_sucursalactiva']
         
         # Obtener vacaciones del colaborador
         cursor.execute("""
@@ -460,7 +369,7 @@ def obtener_vacaciones_colaborador(id_colaborador):
         
         # Calcular días hábiles para cada vacación
         for vacacion in vacaciones:
-            dias_habiles = calcular_dias_habiles(vacacion['fecha_inicio'], vacacion['fecha_fin'], cursor)
+            dias_habiles = calcular_dias_habiles(vacacion['fecha_inicio'], vacacion['fecha_fin'])
             vacacion['dias_habiles'] = dias_habiles
         
         cursor.close()
@@ -493,24 +402,11 @@ def calcular_dias_habiles_rango():
         if fecha_fin <= fecha_inicio:
             return jsonify({"error": "La fecha de fin debe ser posterior a la fecha de inicio"}), 400
         
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         # Calcular días hábiles
-        dias_habiles = calcular_dias_habiles(fecha_inicio, fecha_fin, cursor)
+        dias_habiles = calcular_dias_habiles(fecha_inicio, fecha_fin)
         
         # Obtener información adicional de los días
-        cursor.execute("""
-            SELECT fecha, nombre_dia, categoria
-            FROM general_dim_fecha 
-            WHERE fecha BETWEEN %s AND %s
-            ORDER BY fecha
-        """, (fecha_inicio, fecha_fin))
-        
-        dias_detalle = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
+        dias_detalle = calendario.detalle(fecha_inicio, fecha_fin)
         
         return jsonify({
             "fecha_inicio": data['fecha_inicio'],
@@ -21,6 +21,51 @@ class Config:
     DB_USER = os.getenv("DB_USER", "UserApp")
     DB_PASSWORD = os.getenv("DB_PASSWORD", "&8y7c()tu9t/+,6`")
     DB_NAME = os.getenv("DB_NAME", "lahornilla_base_normalizada")
+
+    # Hilos del worker gunicorn (el Dockerfile pasa este mismo valor a --threads)
+    GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", "8"))
+    # Hilos para consultas de lectura independientes en paralelo (utils/paralelo.py)
+    DB_PARALELO_HILOS = int(os.getenv("DB_PARALELO_HILOS", "4"))
+    # bcrypt: hash simultáneos por proceso (cada rehash al iniciar sesión usa una conexión propia)
+    BCRYPT_MAX_CONCURRENCIA = int(os.getenv("BCRYPT_MAX_CONCURRENCIA", "2"))
+
+    # Pool de conexiones por proceso (mysql.connector admite como máximo 32). Cada hilo de
+    # gunicorn retiene su conexión hasta el fin de la request y además puede tomar otra
+    # (utils/paralelo, exportaciones sin buffer, rehash de claves): por defecto alcanza para
+    # GUNICORN_THREADS + DB_PARALELO_HILOS + BCRYPT_MAX_CONCURRENCIA. Si se sube uno, subir el pool.
+    DB_POOL_SIZE = int(os.getenv(
+        "DB_POOL_SIZE", str(min(32, GUNICORN_THREADS + DB_PARALELO_HILOS + BCRYPT_MAX_CONCURRENCIA))
+    ))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+    # Segundos que se conserva en caché la sucursal activa de cada usuario
+    SUCURSAL_CACHE_TTL = int(os.getenv("SUCURSAL_CACHE_TTL", "60"))
+
+    # Segundos que se conservan en caché el perfil y los permisos de cada usuario
+    PERMISOS_CACHE_TTL = int(os.getenv("PERMISOS_CACHE_TTL", "60"))
+
+    # Segundos entre recargas del calendario de días hábiles (general_dim_fecha)
+    CALENDARIO_TTL = int(os.getenv("CALENDARIO_TTL", "3600"))
+
+    # Segundos que se conservan en memoria los catálogos de opciones (labores, unidades, etc.)
+    CATALOGO_CACHE_TTL = int(os.getenv("CATALOGO_CACHE_TTL", "300"))
+
+    # Si se define, /api/metrics exige este valor en el header X-Metrics-Token
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+    # bcrypt: costo de los hash nuevos (los de otro costo se recalculan al iniciar sesión),
+    # solicitudes que pueden esperar turno y segundos de espera máxima (la concurrencia va junto al pool)
+    BCRYPT_COSTO = int(os.getenv("BCRYPT_COSTO", "12"))
+    BCRYPT_MAX_EN_ESPERA = int(os.getenv("BCRYPT_MAX_EN_ESPERA", "32"))
+    BCRYPT_TIMEOUT = float(os.getenv("BCRYPT_TIMEOUT", "5"))
+
+    # Proxies de confianza delante de la app (Cloud Run: 1). La IP del cliente es la que agrega
+    # el último de ellos a X-Forwarded-For; las entradas anteriores las escribe el cliente. 0 sin proxy
+    PROXY_SALTOS = int(os.getenv("PROXY_SALTOS", "1"))
+
+    # Login: intentos fallidos permitidos por IP y por par (usuario, IP) dentro de la ventana (segundos)
+    LOGIN_MAX_INTENTOS = int(os.getenv("LOGIN_MAX_INTENTOS", "10"))
+    LOGIN_VENTANA_INTENTOS = int(os.getenv("LOGIN_VENTANA_INTENTOS", "300"))
     
     JWT_SECRET_KEY = 'Inicio01*'  # ✅ Esta clave es usada por Flask-JWT-Extended
     SECRET_KEY = 'Inicio01*'
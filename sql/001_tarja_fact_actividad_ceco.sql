@@ -0,0 +1,10 @@
+-- CECO resuelto por actividad (según id_tipoceco y la tabla tarja_fact_ceco* correspondiente).
+-- Lo mantienen los endpoints /api/opciones/cecos* y /api/actividades; para poblarlo
+-- o reconstruirlo: flask --app app backfill-cecos-actividad
+CREATE TABLE IF NOT EXISTS tarja_fact_actividad_ceco (
+    id_actividad VARCHAR(64) NOT NULL,
+    id_ceco INT NULL,
+    fecha_actualizacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_actividad),
+    KEY idx_actividad_ceco_ceco (id_ceco)
+);
@@ -0,0 +1,4 @@
+-- Índice para listar actividades por sucursal y estado con filtro de fechas y
+-- paginación keyset sobre (fecha, id) en GET /api/actividades/sucursal/<id_sucursal>
+CREATE INDEX idx_actividad_sucursal_estado_fecha
+    ON tarja_fact_actividad (id_sucursalactiva, id_estadoactividad, fecha, id);
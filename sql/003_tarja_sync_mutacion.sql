@@ -0,0 +1,12 @@
+-- Mutaciones offline ya aplicadas por POST /api/sync/push (deduplicación por id de mutación).
+-- Un reintento del mismo lote devuelve el resultado guardado en vez de aplicarlo otra vez.
+CREATE TABLE IF NOT EXISTS tarja_sync_mutacion (
+    id_mutacion VARCHAR(64) NOT NULL,
+    id_usuario VARCHAR(64) NOT NULL,
+    entidad VARCHAR(32) NOT NULL,
+    operacion VARCHAR(16) NOT NULL,
+    resultado JSON NULL,
+    fecha_aplicacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_mutacion),
+    KEY idx_sync_mutacion_usuario_fecha (id_usuario, fecha_aplicacion)
+);
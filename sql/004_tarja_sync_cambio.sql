@@ -0,0 +1,17 @@
+-- Log de cambios para GET /api/sync/changes: cada alta/edición (upsert) o eliminación (delete)
+-- de actividades, rendimientos, colaboradores y trabajadores, con una versión creciente por sucursal.
+CREATE TABLE IF NOT EXISTS tarja_sync_version (
+    id_sucursal INT NOT NULL,
+    version BIGINT NOT NULL,
+    PRIMARY KEY (id_sucursal)
+);
+
+CREATE TABLE IF NOT EXISTS tarja_sync_cambio (
+    id_sucursal INT NOT NULL,
+    version BIGINT NOT NULL,
+    entidad VARCHAR(32) NOT NULL,
+    id_registro VARCHAR(64) NOT NULL,
+    operacion VARCHAR(8) NOT NULL,
+    fecha TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_sucursal, version)
+);
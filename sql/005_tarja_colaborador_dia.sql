@@ -0,0 +1,18 @@
+-- Horas por colaborador y día, agregadas desde tarja_fact_rendimientopropio. Las horas esperadas
+-- no se guardan: se leen de tarja_dim_horaspordia al consultar. La mantienen los endpoints que
+-- escriben rendimientos propios o cambian la fecha de una actividad; para poblarla o
+-- reconstruirla: flask --app app rebuild-colaborador-dia
+CREATE TABLE IF NOT EXISTS tarja_colaborador_dia (
+    id_colaborador VARCHAR(64) NOT NULL,
+    fecha DATE NOT NULL,
+    total_horas_trabajadas DECIMAL(10, 2) NOT NULL DEFAULT 0,
+    total_horas_extras DECIMAL(10, 2) NOT NULL DEFAULT 0,
+    cantidad_actividades INT NOT NULL DEFAULT 0,
+    cantidad_rendimientos INT NOT NULL DEFAULT 0,
+    fecha_actualizacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_colaborador, fecha),
+    KEY idx_colaborador_dia_fecha (fecha)
+);
+
+-- Si la tabla se creó con la columna horas_esperadas (versión anterior de este script)
+-- ALTER TABLE tarja_colaborador_dia DROP COLUMN horas_esperadas;
@@ -0,0 +1,142 @@
+from array import array
+from collections import namedtuple
+from datetime import datetime
+from itertools import accumulate
+from config import Config
+from utils.db import get_db_connection
+import threading
+import time
+import unicodedata
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _normalizar(texto):
+    """Igual que la collation de MySQL: sin mayúsculas, acentos ni espacios finales"""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower().rstrip()
+
+
+def _como_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    return valor
+
+
+def _dias_semana_habiles(desde, hasta):
+    """Días lunes a viernes entre dos fechas (inclusive), sin recorrerlas"""
+    if hasta < desde:
+        return 0
+    total = (hasta - desde).days + 1
+    semanas, resto = divmod(total, 7)
+    dias = semanas * 5
+    inicio = desde.weekday()
+    dias += sum(1 for i in range(resto) if (inicio + i) % 7 < 5)
+    return dias
+
+
+# Estado completo del calendario; se publica con una sola asignación para que los lectores
+# (sin lock) nunca mezclen los días de una carga con las sumas acumuladas de otra
+_Estado = namedtuple('_Estado', 'base dias acum_presentes acum_habiles acum_similares cargado_en')
+
+
+class CalendarioHabil:
+    """
+    Copia en memoria de general_dim_fecha indexada por ordinal de fecha, con sumas
+    acumuladas para contar cualquier rango en O(1). Se recarga al vencer el TTL.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Sumas acumuladas (longitud n + 1): filas presentes, 'dia habil' y categorías similares
+        self._estado = _Estado(0, [], array('l', [0]), array('l', [0]), array('l', [0]), None)
+
+    def _cargar(self):
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT fecha, nombre_dia, categoria FROM general_dim_fecha ORDER BY fecha")
+        filas = cursor.fetchall()
+        cursor.close()
+        conn.close()
+
+        if not filas:
+            base, dias = 0, []
+        else:
+            base = _como_fecha(filas[0]['fecha']).toordinal()
+            fin = _como_fecha(filas[-1]['fecha']).toordinal()
+            dias = [None] * (fin - base + 1)
+            for fila in filas:
+                dias[_como_fecha(fila['fecha']).toordinal() - base] = fila
+
+        presentes, habiles, similares = [], [], []
+        for fila in dias:
+            categoria = _normalizar(fila['categoria']) if fila else ''
+            presentes.append(1 if fila else 0)
+            habiles.append(1 if categoria == 'dia habil' else 0)
+            similares.append(1 if any(p in categoria for p in ('habil', 'laboral', 'trabajo')) else 0)
+
+        self._estado = _Estado(
+            base, dias,
+            array('l', accumulate(presentes, initial=0)),
+            array('l', accumulate(habiles, initial=0)),
+            array('l', accumulate(similares, initial=0)),
+            time.monotonic()
+        )
+        logger.info(f"📅 Calendario cargado: {len(filas)} fechas")
+
+    def _vencido(self, estado):
+        return estado.cargado_en is None or time.monotonic() - estado.cargado_en > self.ttl
+
+    def _snapshot(self):
+        """Estado vigente (recargado si venció); cada consulta usa un único snapshot"""
+        if self._vencido(self._estado):
+            with self._lock:
+                if self._vencido(self._estado):
+                    self._cargar()
+        return self._estado
+
+    def invalidar(self):
+        with self._lock:
+            self._estado = self._estado._replace(cargado_en=None)
+
+    @staticmethod
+    def _indices(estado, fecha_inicio, fecha_fin):
+        """Rango [i, j) de posiciones del calendario cubiertas por las fechas"""
+        n = len(estado.dias)
+        i = min(max(fecha_inicio.toordinal() - estado.base, 0), n)
+        j = min(max(fecha_fin.toordinal() - estado.base + 1, 0), n)
+        return i, max(i, j)
+
+    def dias_habiles(self, fecha_inicio, fecha_fin):
+        """
+        Días hábiles entre dos fechas (inclusive) según general_dim_fecha, con los mismos
+        criterios que antes: categoría 'dia habil'; si no hay, categorías similares; si
+        tampoco, lunes a viernes (sin excluir festivos). 0 si el rango no está en la tabla.
+        """
+        estado = self._snapshot()
+        fecha_inicio, fecha_fin = _como_fecha(fecha_inicio), _como_fecha(fecha_fin)
+        i, j = self._indices(estado, fecha_inicio, fecha_fin)
+
+        if estado.acum_presentes[j] - estado.acum_presentes[i] == 0:
+            return 0
+        dias = estado.acum_habiles[j] - estado.acum_habiles[i]
+        if dias == 0:
+            dias = estado.acum_similares[j] - estado.acum_similares[i]
+        if dias == 0:
+            dias = _dias_semana_habiles(fecha_inicio, fecha_fin)
+        return dias
+
+    def detalle(self, fecha_inicio, fecha_fin):
+        """Filas de general_dim_fecha (fecha, nombre_dia, categoria) del rango"""
+        estado = self._snapshot()
+        i, j = self._indices(estado, _como_fecha(fecha_inicio), _como_fecha(fecha_fin))
+        return [dict(fila) for fila in estado.dias[i:j] if fila]
+
+
+calendario = CalendarioHabil(Config.CALENDARIO_TTL)
+
+
+def contar_dias_habiles(fecha_inicio, fecha_fin):
+    return calendario.dias_habiles(fecha_inicio, fecha_fin)
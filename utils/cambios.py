@@ -0,0 +1,68 @@
+from collections import defaultdict
+
+# Entidad -> consulta (id, id_sucursal) de sus filas; define a qué sucursal va cada cambio
+ENTIDADES_CAMBIO = {
+    'actividad': "SELECT id, id_sucursalactiva AS id_sucursal FROM tarja_fact_actividad WHERE id IN ({})",
+    'rendimiento_propio': """
+        SELECT r.id, a.id_sucursalactiva AS id_sucursal FROM tarja_fact_rendimientopropio r
+        INNER JOIN tarja_fact_actividad a ON a.id = r.id_actividad WHERE r.id IN ({})
+    """,
+    'rendimiento_contratista': """
+        SELECT r.id, a.id_sucursalactiva AS id_sucursal FROM tarja_fact_rendimientocontratista r
+        INNER JOIN tarja_fact_actividad a ON a.id = r.id_actividad WHERE r.id IN ({})
+    """,
+    'rendimiento_grupal': """
+        SELECT r.id, a.id_sucursalactiva AS id_sucursal FROM tarja_fact_redimientogrupal r
+        INNER JOIN tarja_fact_actividad a ON a.id = r.id_actividad WHERE r.id IN ({})
+    """,
+    'colaborador': "SELECT id, id_sucursal FROM general_dim_colaborador WHERE id IN ({})",
+    'trabajador': "SELECT id, id_sucursal_activa AS id_sucursal FROM general_dim_trabajador WHERE id IN ({})",
+}
+
+# Tabla de rendimientos -> entidad del log (para los endpoints que eligen la tabla por tipo)
+ENTIDAD_POR_TABLA_RENDIMIENTO = {
+    'tarja_fact_rendimientopropio': 'rendimiento_propio',
+    'tarja_fact_rendimientocontratista': 'rendimiento_contratista',
+    'tarja_fact_redimientogrupal': 'rendimiento_grupal',
+}
+
+UPSERT = 'upsert'
+ELIMINACION = 'delete'
+
+
+def registrar_cambio(cursor, entidad, ids, operacion=UPSERT):
+    """
+    Anota en tarja_sync_cambio que las filas cambiaron, con una versión creciente por sucursal.
+    Usa el cursor del llamador y no hace commit. Para eliminaciones hay que llamarla ANTES del
+    DELETE, porque la sucursal se lee de la propia fila.
+
+    El contador de tarja_sync_version queda bloqueado hasta el commit, así que dentro de una
+    sucursal las versiones se confirman en orden y un cliente que lee ?since=N no se salta cambios.
+    """
+    if isinstance(ids, (str, int)):
+        ids = [ids]
+    ids = list({str(i) for i in ids if i is not None})
+    if not ids:
+        return
+    cursor.execute(ENTIDADES_CAMBIO[entidad].format(', '.join(['%s'] * len(ids))), tuple(ids))
+    por_sucursal = defaultdict(list)
+    for fila in cursor.fetchall():
+        id_registro, id_sucursal = (fila['id'], fila['id_sucursal']) if isinstance(fila, dict) else fila
+        if id_sucursal is not None:
+            por_sucursal[id_sucursal].append(str(id_registro))
+
+    # Orden fijo de sucursales para que dos transacciones no tomen los contadores en orden cruzado
+    for id_sucursal in sorted(por_sucursal):
+        filas = por_sucursal[id_sucursal]
+        cursor.execute("""
+            INSERT INTO tarja_sync_version (id_sucursal, version) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE version = version + VALUES(version)
+        """, (id_sucursal, len(filas)))
+        cursor.execute("SELECT version FROM tarja_sync_version WHERE id_sucursal = %s", (id_sucursal,))
+        fila = cursor.fetchone()
+        ultima = fila['version'] if isinstance(fila, dict) else fila[0]
+        primera = ultima - len(filas) + 1
+        cursor.executemany("""
+            INSERT INTO tarja_sync_cambio (id_sucursal, version, entidad, id_registro, operacion)
+            VALUES (%s, %s, %s, %s, %s)
+        """, [(id_sucursal, primera + i, entidad, id_registro, operacion) for i, id_registro in enumerate(filas)])
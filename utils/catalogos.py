@@ -0,0 +1,113 @@
+from flask import jsonify, request, make_response
+from config import Config
+from utils.db import get_db_connection
+from utils.paralelo import consultar_en_paralelo
+import hashlib
+import json
+import threading
+import time
+
+# Catálogos casi estáticos que se sirven desde memoria: nombre -> (tabla, consulta)
+CATALOGOS = {
+    'labores': ('general_dim_labor', "SELECT id, nombre FROM general_dim_labor ORDER BY nombre ASC"),
+    'unidades': ('tarja_dim_unidad', "SELECT id, nombre FROM tarja_dim_unidad WHERE id_estado = 1 ORDER BY nombre ASC"),
+    'tipos_ceco': ('general_dim_cecotipo', "SELECT id, nombre FROM general_dim_cecotipo ORDER BY nombre ASC"),
+    'especies': ('general_dim_especie', "SELECT id, nombre, caja_equivalente FROM general_dim_especie ORDER BY nombre ASC"),
+    'tipos_rendimiento': ('tarja_dim_tiporendimiento', "SELECT id, nombre FROM tarja_dim_tiporendimiento ORDER BY nombre ASC"),
+    'tipos_trabajador': ('general_dim_tipotrabajador', "SELECT id, nombre FROM general_dim_tipotrabajador ORDER BY nombre ASC"),
+    'porcentajes': ('Porcentaje_trabajador', "SELECT id, porcentaje FROM Porcentaje_trabajador ORDER BY porcentaje ASC"),
+    'bonos': ('general_dim_bono', "SELECT id, nombre FROM general_dim_bono ORDER BY nombre ASC"),
+}
+
+_lock = threading.Lock()
+_cache = {}      # nombre -> (versión, datos, etag, expira)
+_versiones = {}  # tabla -> versión
+
+
+def calcular_etag(datos):
+    """Hash estable del contenido (mismo contenido -> mismo ETag en todos los procesos)"""
+    serializado = json.dumps(datos, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha1(serializado.encode('utf-8')).hexdigest()
+
+
+def _vigente(nombre, ahora):
+    """(versión, entrada en caché si sigue vigente o None); llamar con _lock tomado"""
+    tabla, _ = CATALOGOS[nombre]
+    version = _versiones.get(tabla, 0)
+    entrada = _cache.get(nombre)
+    if entrada and entrada[0] == version and entrada[3] > ahora:
+        return version, entrada
+    return version, None
+
+
+def _guardar(nombre, version, datos, ahora):
+    tabla, _ = CATALOGOS[nombre]
+    etag = calcular_etag(datos)
+    with _lock:
+        # Si hubo una invalidación mientras se consultaba, no se guarda el dato viejo
+        if _versiones.get(tabla, 0) == version:
+            _cache[nombre] = (version, datos, etag, ahora + Config.CATALOGO_CACHE_TTL)
+    return datos, etag
+
+
+def obtener_catalogo(nombre):
+    """Devuelve (datos, etag) del catálogo, consultando MySQL solo si venció o fue invalidado"""
+    _, sql = CATALOGOS[nombre]
+    ahora = time.monotonic()
+    with _lock:
+        version, entrada = _vigente(nombre, ahora)
+    if entrada:
+        return entrada[1], entrada[2]
+
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(sql)
+    datos = cursor.fetchall() or []
+    cursor.close()
+    conn.close()
+    return _guardar(nombre, version, datos, ahora)
+
+
+def obtener_catalogos(*nombres):
+    """Como obtener_catalogo para varios: {nombre: (datos, etag)}, los vencidos se consultan en paralelo"""
+    ahora = time.monotonic()
+    resultado, pendientes = {}, {}
+    with _lock:
+        for nombre in nombres:
+            version, entrada = _vigente(nombre, ahora)
+            if entrada:
+                resultado[nombre] = (entrada[1], entrada[2])
+            else:
+                pendientes[nombre] = version
+
+    if pendientes:
+        filas = consultar_en_paralelo({nombre: (CATALOGOS[nombre][1], None) for nombre in pendientes})
+        for nombre, version in pendientes.items():
+            resultado[nombre] = _guardar(nombre, version, filas[nombre] or [], ahora)
+    return {nombre: resultado[nombre] for nombre in nombres}
+
+
+def invalidar_catalogo(tabla):
+    """Llamar tras escribir en una tabla cacheada (antes o después del commit)"""
+    with _lock:
+        _versiones[tabla] = _versiones.get(tabla, 0) + 1
+        for nombre, (tabla_catalogo, _) in CATALOGOS.items():
+            if tabla_catalogo == tabla:
+                _cache.pop(nombre, None)
+
+
+def respuesta_con_etag(datos, etag):
+    """200 con ETag, o 304 sin cuerpo si el cliente ya tiene esa versión (If-None-Match)"""
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(jsonify(datos), 200)
+    response.set_etag(etag)
+    # El cliente puede guardar la respuesta pero debe revalidarla siempre
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def respuesta_catalogo(nombre):
+    datos, etag = obtener_catalogo(nombre)
+    return respuesta_con_etag(datos, etag)
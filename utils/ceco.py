@@ -0,0 +1,178 @@
+from utils.db import get_db_connection
+from config import Config
+from collections import OrderedDict
+import click
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tipo de CECO (general_dim_cecotipo) -> tabla de asignación por actividad
+TABLAS_CECO_POR_TIPO = {
+    1: 'tarja_fact_cecoadministrativo',
+    2: 'tarja_fact_cecoproductivo',
+    3: 'tarja_fact_cecomaquinaria',
+    4: 'tarja_fact_cecoinversion',
+    5: 'tarja_fact_cecoriego',
+}
+
+# Columnas de cada tabla tarja_fact_ceco* además de id_actividad (las que piden los POST /api/opciones/cecos*)
+COLUMNAS_CECO_POR_TIPO = {
+    1: ('id_ceco',),
+    2: ('id_especie', 'id_variedad', 'id_cuartel', 'id_ceco'),
+    3: ('id_tipomaquinaria', 'id_maquinaria', 'id_ceco'),
+    4: ('id_tipoinversion', 'id_inversion', 'id_ceco'),
+    5: ('id_caseta', 'id_equiporiego', 'id_sectorriego', 'id_ceco'),
+}
+
+_SQL_REFRESCAR = """
+    REPLACE INTO tarja_fact_actividad_ceco (id_actividad, id_ceco)
+    SELECT a.id,
+           CASE a.id_tipoceco
+               {casos}
+               ELSE NULL
+           END
+    FROM tarja_fact_actividad a
+    WHERE a.id IN ({placeholders})
+""".replace('{casos}', '\n               '.join(
+    f"WHEN {tipo} THEN (SELECT x.id_ceco FROM {tabla} x WHERE x.id_actividad = a.id ORDER BY x.id LIMIT 1)"
+    for tipo, tabla in TABLAS_CECO_POR_TIPO.items()
+))
+
+
+def refrescar_ceco_actividad(cursor, ids_actividad):
+    """
+    Recalcula tarja_fact_actividad_ceco para las actividades indicadas.
+    Usa el cursor del llamador y no hace commit: debe ir en la misma transacción
+    que el cambio en tarja_fact_ceco* o en tarja_fact_actividad.
+    """
+    if isinstance(ids_actividad, (str, int)):
+        ids_actividad = [ids_actividad]
+    ids = list({str(i) for i in ids_actividad if i is not None})
+    if not ids:
+        return
+    sql = _SQL_REFRESCAR.replace('{placeholders}', ', '.join(['%s'] * len(ids)))
+    cursor.execute(sql, tuple(ids))
+
+
+def insertar_cecos_actividad(cursor, id_actividad, id_tipoceco, cecos):
+    """
+    Inserta las asignaciones de CECO de una actividad en la tabla de su tipo y devuelve los ids creados.
+    Lanza ValueError si el tipo no existe o falta un campo; no hace commit ni refresca el CECO resuelto.
+    """
+    tabla = TABLAS_CECO_POR_TIPO.get(int(id_tipoceco))
+    if not tabla:
+        raise ValueError(f"id_tipoceco {id_tipoceco} no válido")
+    columnas = COLUMNAS_CECO_POR_TIPO[int(id_tipoceco)]
+    for ceco in cecos:
+        faltantes = [c for c in columnas if not isinstance(ceco, dict) or ceco.get(c) in (None, '')]
+        if faltantes:
+            raise ValueError(f"Campo requerido faltante en ceco: {', '.join(faltantes)}")
+    ids = []
+    sql = f"INSERT INTO {tabla} (id_actividad, {', '.join(columnas)}) VALUES ({', '.join(['%s'] * (len(columnas) + 1))})"
+    for ceco in cecos:
+        cursor.execute(sql, (id_actividad,) + tuple(ceco[c] for c in columnas))
+        ids.append(cursor.lastrowid)
+    return ids
+
+
+def quitar_cecos_actividad(cursor, id_actividad):
+    """Borra las asignaciones de la actividad en todas las tablas tarja_fact_ceco* (el tipo puede cambiar)"""
+    for tabla in TABLAS_CECO_POR_TIPO.values():
+        cursor.execute(f"DELETE FROM {tabla} WHERE id_actividad = %s", (id_actividad,))
+
+
+def eliminar_ceco_actividad(cursor, id_actividad):
+    cursor.execute("DELETE FROM tarja_fact_actividad_ceco WHERE id_actividad = %s", (id_actividad,))
+
+
+def id_actividad_de_ceco(cursor, tabla, id_registro):
+    """Devuelve el id_actividad de una fila de tarja_fact_ceco* (antes de eliminarla)"""
+    cursor.execute(f"SELECT id_actividad FROM {tabla} WHERE id = %s", (id_registro,))
+    fila = cursor.fetchone()
+    if not fila:
+        return None
+    return fila['id_actividad'] if isinstance(fila, dict) else fila[0]
+
+
+# LRU id_ceco -> (nombre, expira); los nombres se refrescan al vencer CATALOGO_CACHE_TTL
+TAMANO_LRU_NOMBRES = 4096
+_nombres = OrderedDict()
+_nombres_lock = threading.Lock()
+
+
+def nombres_ceco(cursor, ids_ceco):
+    """
+    Devuelve {id_ceco: nombre} para los ids indicados. Los que no están en el LRU
+    se buscan en una sola consulta IN (...), sin importar cuántos sean.
+    """
+    ids = {i for i in ids_ceco if i is not None}
+    resultado = {}
+    faltantes = []
+    ahora = time.monotonic()
+    with _nombres_lock:
+        for id_ceco in ids:
+            entrada = _nombres.get(id_ceco)
+            if entrada and entrada[1] > ahora:
+                _nombres.move_to_end(id_ceco)
+                resultado[id_ceco] = entrada[0]
+            else:
+                faltantes.append(id_ceco)
+
+    if faltantes:
+        cursor.execute(
+            f"SELECT id, nombre FROM general_dim_ceco WHERE id IN ({', '.join(['%s'] * len(faltantes))})",
+            tuple(faltantes)
+        )
+        filas = cursor.fetchall()
+        with _nombres_lock:
+            for fila in filas:
+                id_ceco, nombre = (fila['id'], fila['nombre']) if isinstance(fila, dict) else fila
+                resultado[id_ceco] = nombre
+                _nombres[id_ceco] = (nombre, ahora + Config.CATALOGO_CACHE_TTL)
+                _nombres.move_to_end(id_ceco)
+            while len(_nombres) > TAMANO_LRU_NOMBRES:
+                _nombres.popitem(last=False)
+    return resultado
+
+
+def backfill_cecos_actividad(tamano_lote=1000):
+    """Reconstruye tarja_fact_actividad_ceco para todas las actividades, por lotes"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    total = 0
+    ultimo_id = ''
+    try:
+        while True:
+            cursor.execute(
+                "SELECT id FROM tarja_fact_actividad WHERE id > %s ORDER BY id LIMIT %s",
+                (ultimo_id, tamano_lote)
+            )
+            ids = [fila[0] for fila in cursor.fetchall()]
+            if not ids:
+                break
+            refrescar_ceco_actividad(cursor, ids)
+            conn.commit()
+            total += len(ids)
+            ultimo_id = ids[-1]
+        # Quitar filas de actividades que ya no existen
+        cursor.execute("""
+            DELETE ac FROM tarja_fact_actividad_ceco ac
+            LEFT JOIN tarja_fact_actividad a ON a.id = ac.id_actividad
+            WHERE a.id IS NULL
+        """)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    return total
+
+
+def init_app(app):
+    @app.cli.command('backfill-cecos-actividad')
+    @click.option('--lote', default=1000, show_default=True, help='Actividades por transacción')
+    def backfill_cecos_actividad_command(lote):
+        """Pobla o reconstruye tarja_fact_actividad_ceco"""
+        total = backfill_cecos_actividad(lote)
+        click.echo(f"✅ CECO resuelto para {total} actividades")
@@ -0,0 +1,156 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict, deque
+from config import Config
+from utils.db import get_pool_connection
+import bcrypt
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ServicioClavesOcupado(Exception):
+    """Hay demasiados hash de bcrypt en curso o en espera; el cliente debe reintentar"""
+
+
+class DemasiadosIntentos(Exception):
+    """Se superó el máximo de intentos fallidos para el usuario o la IP"""
+
+    def __init__(self, reintentar_en):
+        super().__init__("Demasiados intentos fallidos, intente más tarde")
+        self.reintentar_en = reintentar_en
+
+
+# bcrypt libera el GIL mientras calcula: con el worker gthread (ver Dockerfile) los demás
+# requests siguen atendiéndose en otros hilos. El pool limita cuántos hash corren a la vez
+# y el semáforo cuántos pueden esperar, para que una ráfaga de logins no acapare la CPU.
+_pool = ThreadPoolExecutor(max_workers=Config.BCRYPT_MAX_CONCURRENCIA, thread_name_prefix='bcrypt')
+_cupos = threading.BoundedSemaphore(Config.BCRYPT_MAX_CONCURRENCIA + Config.BCRYPT_MAX_EN_ESPERA)
+
+
+def _ejecutar(funcion, *args):
+    if not _cupos.acquire(timeout=Config.BCRYPT_TIMEOUT):
+        raise ServicioClavesOcupado("Servicio de autenticación ocupado, intente nuevamente")
+    try:
+        return _pool.submit(funcion, *args).result()
+    finally:
+        _cupos.release()
+
+
+def _hashear(clave):
+    return bcrypt.hashpw(clave.encode('utf-8'), bcrypt.gensalt(rounds=Config.BCRYPT_COSTO)).decode('utf-8')
+
+
+def _verificar(clave, hash_clave):
+    try:
+        return bcrypt.checkpw(clave.encode('utf-8'), hash_clave.encode('utf-8'))
+    except ValueError:
+        # Hash con formato inválido en la base
+        return False
+
+
+def hashear_clave(clave):
+    """Hash bcrypt (texto) con el costo configurado, calculado en el pool"""
+    return _ejecutar(_hashear, clave)
+
+
+def verificar_clave(clave, hash_clave):
+    if not hash_clave:
+        return False
+    return _ejecutar(_verificar, clave, hash_clave)
+
+
+def costo_de_hash(hash_clave):
+    """Costo de un hash $2b$12$...; None si no se reconoce"""
+    partes = (hash_clave or '').split('$')
+    if len(partes) < 4 or not partes[2].isdigit():
+        return None
+    return int(partes[2])
+
+
+def necesita_rehash(hash_clave):
+    return costo_de_hash(hash_clave) != Config.BCRYPT_COSTO
+
+
+def _rehashear(usuario_id, clave, hash_anterior):
+    nuevo = _hashear(clave)
+    conn = get_pool_connection()
+    try:
+        cursor = conn.cursor()
+        # Solo si la clave no cambió mientras tanto
+        cursor.execute(
+            "UPDATE general_dim_usuario SET clave = %s WHERE id = %s AND clave = %s",
+            (nuevo, usuario_id, hash_anterior)
+        )
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def rehashear_en_segundo_plano(usuario_id, clave, hash_anterior):
+    """
+    Tras un login correcto, recalcula el hash si su costo no es BCRYPT_COSTO. Corre en el pool
+    sin que el login lo espere; si el pool está lleno se deja para el próximo login.
+    """
+    if not _cupos.acquire(blocking=False):
+        return
+
+    def _tarea():
+        try:
+            _rehashear(usuario_id, clave, hash_anterior)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo actualizar el hash de la clave: {str(e)}")
+        finally:
+            _cupos.release()
+
+    _pool.submit(_tarea)
+
+
+# Claves (IPs o pares usuario-IP) con fallos recientes a partir de las cuales se barren las vencidas
+MAXIMO_CLAVES_LIMITADOR = 10000
+
+
+class LimitadorIntentos:
+    """Intentos fallidos por clave (IP o usuario-IP) en una ventana deslizante, en memoria del proceso"""
+
+    def __init__(self, maximo, ventana):
+        self.maximo = maximo
+        self.ventana = ventana
+        self._fallos = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def _vigentes(self, clave, ahora):
+        fallos = self._fallos[clave]
+        while fallos and fallos[0] <= ahora - self.ventana:
+            fallos.popleft()
+        return fallos
+
+    def verificar(self, *claves):
+        """Lanza DemasiadosIntentos si alguna de las claves agotó sus intentos"""
+        ahora = time.monotonic()
+        with self._lock:
+            for clave in claves:
+                fallos = self._vigentes(clave, ahora)
+                if len(fallos) >= self.maximo:
+                    raise DemasiadosIntentos(int(fallos[0] + self.ventana - ahora) + 1)
+                if not fallos:
+                    self._fallos.pop(clave, None)
+
+    def registrar_fallo(self, *claves):
+        ahora = time.monotonic()
+        with self._lock:
+            for clave in claves:
+                self._vigentes(clave, ahora).append(ahora)
+            # Barrido ocasional de claves sin fallos vigentes para que el dict no crezca sin límite
+            if len(self._fallos) > MAXIMO_CLAVES_LIMITADOR:
+                for vieja in [c for c in self._fallos if not self._vigentes(c, ahora)]:
+                    del self._fallos[vieja]
+
+    def limpiar(self, clave):
+        with self._lock:
+            self._fallos.pop(clave, None)
+
+
+limitador_login = LimitadorIntentos(Config.LOGIN_MAX_INTENTOS, Config.LOGIN_VENTANA_INTENTOS)
@@ -0,0 +1,193 @@
+from utils.db import get_db_connection
+import click
+
+# Nombre del día en tarja_dim_horaspordia según DAYOFWEEK de MySQL (1 = domingo)
+_NOMBRE_DIA = "ELT(DAYOFWEEK(cd.fecha), 'Domingo', 'Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado')"
+
+# Las horas esperadas no se guardan en la tabla: se leen al consultar (tarja_dim_horaspordia
+# tiene 7 filas por empresa), así siguen la sucursal actual del colaborador y las ediciones
+# de horaspordia sin tener que reconstruir
+_SQL_REFRESCAR = """
+    INSERT INTO tarja_colaborador_dia (
+        id_colaborador, fecha, total_horas_trabajadas, total_horas_extras,
+        cantidad_actividades, cantidad_rendimientos
+    )
+    SELECT rp.id_colaborador, a.fecha,
+           COALESCE(SUM(rp.horas_trabajadas), 0), COALESCE(SUM(rp.horas_extras), 0),
+           COUNT(DISTINCT a.id), COUNT(*)
+    FROM tarja_fact_rendimientopropio rp
+    INNER JOIN tarja_fact_actividad a ON a.id = rp.id_actividad
+    WHERE {filtro}
+    GROUP BY rp.id_colaborador, a.fecha
+    ON DUPLICATE KEY UPDATE
+        total_horas_trabajadas = VALUES(total_horas_trabajadas),
+        total_horas_extras = VALUES(total_horas_extras),
+        cantidad_actividades = VALUES(cantidad_actividades),
+        cantidad_rendimientos = VALUES(cantidad_rendimientos)
+"""
+
+
+def _dias(cursor, sql, ids):
+    if isinstance(ids, (str, int)):
+        ids = [ids]
+    ids = list({str(i) for i in ids if i is not None})
+    if not ids:
+        return set()
+    cursor.execute(sql.format(', '.join(['%s'] * len(ids))), tuple(ids))
+    return {
+        (fila['id_colaborador'], fila['fecha']) if isinstance(fila, dict) else tuple(fila)
+        for fila in cursor.fetchall()
+    }
+
+
+def dias_de_rendimientos(cursor, ids_rendimiento):
+    """Pares (id_colaborador, fecha) de los rendimientos propios indicados"""
+    return _dias(cursor, """
+        SELECT DISTINCT rp.id_colaborador, a.fecha FROM tarja_fact_rendimientopropio rp
+        INNER JOIN tarja_fact_actividad a ON a.id = rp.id_actividad WHERE rp.id IN ({})
+    """, ids_rendimiento)
+
+
+def dias_de_actividades(cursor, ids_actividad):
+    """Pares (id_colaborador, fecha) de los rendimientos propios de las actividades indicadas"""
+    return _dias(cursor, """
+        SELECT DISTINCT rp.id_colaborador, a.fecha FROM tarja_fact_rendimientopropio rp
+        INNER JOIN tarja_fact_actividad a ON a.id = rp.id_actividad WHERE a.id IN ({})
+    """, ids_actividad)
+
+
+def refrescar_colaborador_dia(cursor, dias):
+    """
+    Recalcula tarja_colaborador_dia para los pares (id_colaborador, fecha) indicados: borra los
+    que quedaron sin rendimientos y reescribe el resto desde tarja_fact_rendimientopropio.
+    Usa el cursor del llamador y no hace commit: debe ir en la misma transacción que el cambio.
+
+    Para ediciones y eliminaciones hay que incluir los pares de ANTES del cambio
+    (dias_de_rendimientos / dias_de_actividades), porque el rendimiento puede cambiar de
+    colaborador o la actividad de fecha.
+    """
+    dias = [(id_colaborador, fecha) for id_colaborador, fecha in set(dias) if id_colaborador and fecha]
+    if not dias:
+        return
+    pares = ', '.join(['(%s, %s)'] * len(dias))
+    valores = tuple(v for dia in dias for v in dia)
+    cursor.execute(f"DELETE FROM tarja_colaborador_dia WHERE (id_colaborador, fecha) IN ({pares})", valores)
+    cursor.execute(_SQL_REFRESCAR.format(filtro=f"(rp.id_colaborador, a.fecha) IN ({pares})"), valores)
+
+
+def refrescar_dias_de_rendimientos(cursor, ids_rendimiento, antes=()):
+    """Atajo tras insertar o editar rendimientos propios: sus pares actuales más los de `antes`"""
+    refrescar_colaborador_dia(cursor, set(antes) | dias_de_rendimientos(cursor, ids_rendimiento))
+
+
+def resumen_colaborador_dia(cursor, id_sucursal, fecha_inicio=None, fecha_fin=None, id_colaborador=None):
+    """Horas por colaborador y día de la sucursal, leídas de tarja_colaborador_dia (sin detalle)"""
+    sql = f"""
+        SELECT
+            cd.id_colaborador,
+            CONCAT(c.nombre, ' ', c.apellido_paterno,
+                   CASE WHEN c.apellido_materno IS NOT NULL THEN CONCAT(' ', c.apellido_materno) ELSE '' END) as colaborador,
+            cd.fecha,
+            DAYNAME(cd.fecha) as nombre_dia,
+            cd.total_horas_trabajadas,
+            cd.total_horas_extras,
+            h.horas_dia as horas_esperadas,
+            (cd.total_horas_trabajadas - h.horas_dia) as diferencia_horas,
+            CASE
+                WHEN cd.total_horas_trabajadas > h.horas_dia THEN 'MÁS'
+                WHEN cd.total_horas_trabajadas < h.horas_dia THEN 'MENOS'
+                ELSE 'EXACTO'
+            END as estado_trabajo,
+            cd.cantidad_actividades
+        FROM tarja_colaborador_dia cd
+        INNER JOIN general_dim_colaborador c ON c.id = cd.id_colaborador
+        LEFT JOIN general_dim_sucursal s ON s.id = c.id_sucursal
+        LEFT JOIN tarja_dim_horaspordia h ON h.id_empresa = s.id_empresa AND h.nombre_dia = {_NOMBRE_DIA}
+        WHERE c.id_sucursal = %s
+    """
+    params = [id_sucursal]
+    if fecha_inicio:
+        sql += " AND cd.fecha >= %s"
+        params.append(fecha_inicio)
+    if fecha_fin:
+        sql += " AND cd.fecha <= %s"
+        params.append(fecha_fin)
+    if id_colaborador:
+        sql += " AND cd.id_colaborador = %s"
+        params.append(id_colaborador)
+    sql += " ORDER BY cd.fecha DESC, c.nombre ASC"
+    cursor.execute(sql, tuple(params))
+    return cursor.fetchall()
+
+
+def detalle_colaborador_dia(cursor, id_sucursal, id_colaborador, fecha):
+    """Rendimientos propios de un colaborador en un día (el detalle que el resumen ya no incluye)"""
+    cursor.execute("""
+        SELECT
+            rp.id as id_rendimiento,
+            a.id as id_actividad,
+            l.nombre as labor,
+            ce.nombre as ceco,
+            ce.nombre as nombre_ceco,
+            COALESCE(rp.id_ceco, ac.id_ceco) as id_ceco,
+            rp.horas_trabajadas,
+            rp.horas_extras,
+            rp.rendimiento,
+            a.hora_inicio,
+            a.hora_fin,
+            rp.id_bono,
+            b.nombre as nombre_bono
+        FROM tarja_fact_rendimientopropio rp
+        INNER JOIN tarja_fact_actividad a ON rp.id_actividad = a.id
+        INNER JOIN general_dim_colaborador c ON rp.id_colaborador = c.id
+        LEFT JOIN general_dim_labor l ON a.id_labor = l.id
+        LEFT JOIN general_dim_bono b ON rp.id_bono = b.id
+        LEFT JOIN tarja_fact_actividad_ceco ac ON ac.id_actividad = a.id
+        LEFT JOIN general_dim_ceco ce ON ce.id = COALESCE(rp.id_ceco, ac.id_ceco)
+        WHERE rp.id_colaborador = %s AND a.fecha = %s AND c.id_sucursal = %s
+        ORDER BY a.hora_inicio ASC
+    """, (id_colaborador, fecha, id_sucursal))
+    return cursor.fetchall()
+
+
+def rebuild_colaborador_dia(tamano_lote=500):
+    """Reconstruye tarja_colaborador_dia completa, por lotes de colaboradores"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    total = 0
+    ultimo_id = ''
+    try:
+        while True:
+            cursor.execute(
+                "SELECT id FROM general_dim_colaborador WHERE id > %s ORDER BY id LIMIT %s",
+                (ultimo_id, tamano_lote)
+            )
+            ids = [fila[0] for fila in cursor.fetchall()]
+            if not ids:
+                break
+            marcadores = ', '.join(['%s'] * len(ids))
+            cursor.execute(f"DELETE FROM tarja_colaborador_dia WHERE id_colaborador IN ({marcadores})", tuple(ids))
+            cursor.execute(_SQL_REFRESCAR.format(filtro=f"rp.id_colaborador IN ({marcadores})"), tuple(ids))
+            conn.commit()
+            total += len(ids)
+            ultimo_id = ids[-1]
+        # Quitar filas de colaboradores que ya no existen
+        cursor.execute("""
+            DELETE cd FROM tarja_colaborador_dia cd
+            LEFT JOIN general_dim_colaborador c ON c.id = cd.id_colaborador
+            WHERE c.id IS NULL
+        """)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    return total
+
+
+def init_app(app):
+    @app.cli.command('rebuild-colaborador-dia')
+    @click.option('--lote', default=500, show_default=True, help='Colaboradores por transacción')
+    def rebuild_colaborador_dia_command(lote):
+        """Pobla o reconstruye tarja_colaborador_dia"""
+        total = rebuild_colaborador_dia(lote)
+        click.echo(f"✅ Horas por día recalculadas para {total} colaboradores")
@@ -1,169 +1,258 @@
-import mysql.connector
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
+from flask import g, has_app_context
 from config import Config
+from utils.metrics import registrar_consulta, registrar_filas
 import os
 import re
+import time
+import threading
 import logging
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
-def get_db_connection():
-    # Usar DATABASE_URL si está disponible (como la API de tickets)
-    if hasattr(Config, 'DATABASE_URL') and Config.DATABASE_URL:
-        logger.info(f"🔍 DATABASE_URL: {Config.DATABASE_URL}")
-        
-        # Parsear DATABASE_URL con formato de Cloud SQL
-        # Formato: mysql+pymysql://user:password@/database?unix_socket=/cloudsql/instance
-        url = Config.DATABASE_URL
-        
-        # Extraer componentes usando regex corregido
-        pattern = r'mysql\+pymysql://([^:]+):([^@]+)@/([^?]+)\?unix_socket=([^/]+)/(.+)'
-        match = re.match(pattern, url)
-        
-        if match:
-            user, password, database, socket_prefix, instance = match.groups()
-            logger.info(f"✅ Parseado correctamente:")
-            logger.info(f"   User: {user}")
-            logger.info(f"   Database: {database}")
-            logger.info(f"   Instance: {instance}")
-            
-            # Para Cloud SQL con unix_socket, usar localhost
-            connection_params = {
-                'host': 'localhost',
-                'user': user,
-                'password': password,
-                'database': database,
-                'port': 3306,
-                'unix_socket': f'/cloudsql/{instance}'
-            }
-            logger.info(f"🔗 Parámetros de conexión: {connection_params}")
-            
-            return mysql.connector.connect(**connection_params)
+
+def _parsear_database_url(url):
+    """Convierte DATABASE_URL en parámetros para mysql.connector (sin abrir conexión)"""
+    # Formato Cloud SQL: mysql+pymysql://user:password@/database?unix_socket=/cloudsql/instance
+    pattern = r'mysql\+pymysql://([^:]+):([^@]+)@/([^?]+)\?unix_socket=([^/]+)/(.+)'
+    match = re.match(pattern, url)
+
+    if match:
+        user, password, database, socket_prefix, instance = match.groups()
+        return {
+            'host': 'localhost',
+            'user': user,
+            'password': password,
+            'database': database,
+            'port': 3306,
+            'unix_socket': f'/cloudsql/{instance}'
+        }
+
+    url_clean = url.replace('mysql+pymysql://', '').replace('mysql://', '')
+
+    # Cloud SQL parseado manualmente (unix_socket con o sin prefijo /cloudsql/)
+    if '@/' in url_clean:
+        credentials, rest = url_clean.split('@/', 1)
+        user, password = credentials.split(':', 1)
+        if '?' in rest:
+            database, params = rest.split('?', 1)
+            if 'unix_socket=' in params:
+                socket_part = params.split('unix_socket=', 1)[1]
+                instance = socket_part.replace('/cloudsql/', '') if socket_part.startswith('/cloudsql/') else socket_part
+                return {
+                    'host': 'localhost',
+                    'user': user,
+                    'password': password,
+                    'database': database,
+                    'port': 3306,
+                    'unix_socket': f'/cloudsql/{instance}'
+                }
+
+    # Formato simple: user:password@host[:port]/database
+    if '@' in url_clean:
+        credentials, rest = url_clean.split('@', 1)
+        user, password = credentials.split(':', 1)
+        if '/' in rest:
+            host, database = rest.split('/', 1)
+            port = 3306
+            if ':' in host:
+                host, port_str = host.split(':', 1)
+                try:
+                    port = int(port_str)
+                except ValueError:
+                    port = 3306
         else:
-            logger.error(f"❌ No se pudo parsear DATABASE_URL con regex: {url}")
-            logger.error(f"❌ Pattern no coincidió")
-            
-            # Intentar parsear manualmente
-            try:
-                # Remover mysql+pymysql://
-                url_clean = url.replace('mysql+pymysql://', '').replace('mysql://', '')
-                
-                # Separar credenciales y resto
-                if '@/' in url_clean:
-                    credentials, rest = url_clean.split('@/', 1)
-                    user, password = credentials.split(':', 1)
-                    
-                    # Separar database y parámetros
-                    if '?' in rest:
-                        database, params = rest.split('?', 1)
-                        
-                        # Extraer unix_socket
-                        if 'unix_socket=' in params:
-                            socket_part = params.split('unix_socket=', 1)[1]
-                            # Remover /cloudsql/ si ya está presente
-                            if socket_part.startswith('/cloudsql/'):
-                                instance = socket_part.replace('/cloudsql/', '')
-                            else:
-                                instance = socket_part
-                            
-                            logger.info(f"✅ Parseado manualmente:")
-                            logger.info(f"   User: {user}")
-                            logger.info(f"   Database: {database}")
-                            logger.info(f"   Instance: {instance}")
-                            
-                            connection_params = {
-                                'host': 'localhost',
-                                'user': user,
-                                'password': password,
-                                'database': database,
-                                'port': 3306,
-                                'unix_socket': f'/cloudsql/{instance}'
-                            }
-                            logger.info(f"🔗 Parámetros de conexión: {connection_params}")
-                            
-                            return mysql.connector.connect(**connection_params)
-                
-                logger.error(f"❌ Parseado manual también falló")
-                
-            except Exception as e:
-                logger.error(f"❌ Error en parseado manual: {str(e)}")
-            
-            # Fallback para formato simple
-            try:
-                url_clean = url.replace('mysql+pymysql://', '').replace('mysql://', '')
-                if '@' in url_clean:
-                    credentials, rest = url_clean.split('@', 1)
-                    user, password = credentials.split(':', 1)
-                    if '/' in rest:
-                        host, database = rest.split('/', 1)
-                        # Verificar si hay puerto
-                        if ':' in host:
-                            host, port_str = host.split(':', 1)
-                            try:
-                                port = int(port_str)
-                            except ValueError:
-                                port = 3306
-                        else:
-                            port = 3306
-                        
-                        logger.info(f"🔄 Usando fallback con host: {host}, port: {port}")
-                        return mysql.connector.connect(
-                            host=host,
-                            user=user,
-                            password=password,
-                            database=database,
-                            port=port
-                        )
-                    else:
-                        # Formato sin host (localhost implícito)
-                        database = rest
-                        logger.info(f"🔄 Usando fallback localhost")
-                        return mysql.connector.connect(
-                            host='localhost',
-                            user=user,
-                            password=password,
-                            database=database,
-                            port=3306
-                        )
-            except Exception as e:
-                logger.error(f"❌ Error en fallback: {str(e)}")
-    
-    # Si no hay DATABASE_URL o falló todo, usar configuración anterior
-    logger.info("🔄 Usando configuración anterior (sin DATABASE_URL o falló parsing)")
-    
-    # Intentar usar variables de entorno directamente si están disponibles
-    # Priorizar variables de entorno sobre Config para Cloud Run
-    db_user = os.getenv('DB_USER')
-    if not db_user:
-        db_user = Config.DB_USER
-        
-    db_password = os.getenv('DB_PASSWORD')
-    if not db_password:
-        db_password = Config.DB_PASSWORD
-        
-    db_host = os.getenv('DB_HOST')
-    if not db_host:
-        db_host = Config.DB_HOST
-        
-    db_name = os.getenv('DB_NAME')
-    if not db_name:
-        db_name = Config.DB_NAME
-        
+            host, database, port = 'localhost', rest, 3306
+        return {
+            'host': host or 'localhost',
+            'user': user,
+            'password': password,
+            'database': database,
+            'port': port
+        }
+
+    return None
+
+
+def _parametros_desde_entorno():
+    """Configuración anterior: variables de entorno con respaldo en Config"""
     db_port_str = os.getenv('DB_PORT')
-    if db_port_str:
-        try:
-            db_port = int(db_port_str)
-        except ValueError:
-            db_port = Config.DB_PORT
-    else:
+    try:
+        db_port = int(db_port_str) if db_port_str else Config.DB_PORT
+    except ValueError:
         db_port = Config.DB_PORT
-    
-    logger.info(f"🔄 Usando configuración: host={db_host}, user={db_user}, database={db_name}, port={db_port}")
-    
-    return mysql.connector.connect(
-        host=db_host,
-        user=db_user,
-        password=db_password,
-        database=db_name,
-        port=db_port
-    )
+
+    return {
+        'host': os.getenv('DB_HOST') or Config.DB_HOST,
+        'user': os.getenv('DB_USER') or Config.DB_USER,
+        'password': os.getenv('DB_PASSWORD') or Config.DB_PASSWORD,
+        'database': os.getenv('DB_NAME') or Config.DB_NAME,
+        'port': db_port
+    }
+
+
+def _resolver_parametros_conexion():
+    # Usar DATABASE_URL si está disponible (como la API de tickets)
+    if getattr(Config, 'DATABASE_URL', None):
+        try:
+            params = _parsear_database_url(Config.DATABASE_URL)
+            if params:
+                return params
+            logger.error("❌ No se pudo parsear DATABASE_URL, usando configuración anterior")
+        except Exception as e:
+            logger.error(f"❌ Error parseando DATABASE_URL: {str(e)}")
+    return _parametros_desde_entorno()
+
+
+# El DSN se parsea una sola vez al importar el módulo
+CONNECTION_PARAMS = _resolver_parametros_conexion()
+logger.info(
+    f"🔗 Base de datos: user={CONNECTION_PARAMS['user']}, database={CONNECTION_PARAMS['database']}, "
+    f"{'unix_socket=' + CONNECTION_PARAMS['unix_socket'] if 'unix_socket' in CONNECTION_PARAMS else 'host=' + str(CONNECTION_PARAMS['host'])}"
+)
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Pool acotado por proceso (se recrea si gunicorn hace fork tras importar)"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name=f"tarjas_{pid}",
+                    pool_size=Config.DB_POOL_SIZE,
+                    pool_reset_session=True,
+                    # Cursores con buffer: varias consultas pueden compartir la conexión de la request
+                    buffered=True,
+                    **CONNECTION_PARAMS
+                )
+                _pool_pid = pid
+                logger.info(f"✅ Pool MySQL creado (pid={pid}, tamaño={Config.DB_POOL_SIZE})")
+    return _pool
+
+
+def get_pool_connection():
+    """
+    Toma una conexión del pool. El pool verifica la conexión (ping) al entregarla
+    y reconecta si el servidor la cerró. Si está agotado, espera hasta DB_POOL_TIMEOUT.
+    El llamador debe cerrarla con conn.close() para devolverla al pool.
+    """
+    pool = _get_pool()
+    limite = time.monotonic() + Config.DB_POOL_TIMEOUT
+    while True:
+        try:
+            return pool.get_connection()
+        except PoolError:
+            if time.monotonic() >= limite:
+                raise
+            time.sleep(0.05)
+
+
+def get_free_pool_connection():
+    """
+    Toma una conexión del pool solo si hay una libre en este momento; si no, devuelve None
+    sin esperar. Para trabajo opcional en paralelo que puede hacerse en la conexión de la request.
+    """
+    try:
+        return _get_pool().get_connection()
+    except PoolError:
+        return None
+
+
+class _CursorMedido:
+    """Cursor que informa a utils.metrics el tiempo de cada consulta y las filas leídas"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.execute(*args, **kwargs)
+        finally:
+            registrar_consulta(time.perf_counter() - inicio)
+
+    def executemany(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(*args, **kwargs)
+        finally:
+            registrar_consulta(time.perf_counter() - inicio)
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        if fila is not None:
+            registrar_filas(1)
+        return fila
+
+    def fetchmany(self, *args, **kwargs):
+        filas = self._cursor.fetchmany(*args, **kwargs)
+        registrar_filas(len(filas))
+        return filas
+
+    def fetchall(self):
+        filas = self._cursor.fetchall()
+        registrar_filas(len(filas))
+        return filas
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _RequestConnection:
+    """Conexión compartida por toda la request; close() se difiere al teardown"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return _CursorMedido(self._conn.cursor(*args, **kwargs))
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def get_db_connection():
+    # Dentro de Flask: una sola conexión por request, guardada en g
+    if has_app_context():
+        conn = g.get('_db_conn')
+        if conn is None:
+            conn = _RequestConnection(get_pool_connection())
+            g._db_conn = conn
+        return conn
+    # Fuera de Flask (scripts): conexión del pool que el llamador debe cerrar
+    return get_pool_connection()
+
+
+def release_db_connection(exception=None):
+    """Devuelve la conexión de la request al pool, descartando lo no confirmado"""
+    conn = g.pop('_db_conn', None)
+    if conn is None:
+        return
+    raw = conn._conn
+    try:
+        if raw.in_transaction:
+            raw.rollback()
+    except Exception as e:
+        logger.warning(f"⚠️ Error haciendo rollback al liberar conexión: {str(e)}")
+    try:
+        raw.close()
+    except Exception as e:
+        logger.warning(f"⚠️ Error devolviendo conexión al pool: {str(e)}")
+
+
+def init_app(app):
+    app.teardown_appcontext(release_db_connection)
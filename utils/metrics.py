@@ -0,0 +1,166 @@
+from flask import g, request, Response, has_app_context
+from config import Config
+from bisect import bisect_left
+import threading
+import time
+
+# Límites (segundos) del histograma de latencia por endpoint
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Límites del histograma de consultas SQL por request (para detectar N+1)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class _Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.conteos[bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+
+class _Registro:
+    """Métricas acumuladas del proceso, agrupadas por ruta y método"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}        # (ruta, método, status) -> cantidad
+        self.latencia = {}        # (ruta, método) -> _Histograma
+        self.consultas = {}       # (ruta, método) -> _Histograma
+        self.db_segundos = {}     # (ruta, método) -> segundos
+        self.db_consultas = {}    # (ruta, método) -> cantidad
+        self.db_filas = {}        # (ruta, método) -> cantidad
+
+    def registrar(self, ruta, metodo, status, duracion, medicion):
+        clave = (ruta, metodo)
+        with self._lock:
+            self.requests[(ruta, metodo, status)] = self.requests.get((ruta, metodo, status), 0) + 1
+            self.latencia.setdefault(clave, _Histograma(BUCKETS_LATENCIA)).observar(duracion)
+            self.consultas.setdefault(clave, _Histograma(BUCKETS_CONSULTAS)).observar(medicion['consultas'])
+            self.db_segundos[clave] = self.db_segundos.get(clave, 0.0) + medicion['db_segundos']
+            self.db_consultas[clave] = self.db_consultas.get(clave, 0) + medicion['consultas']
+            self.db_filas[clave] = self.db_filas.get(clave, 0) + medicion['filas']
+
+    def exportar(self):
+        """Formato de texto de Prometheus (exposition format 0.0.4)"""
+        lineas = []
+        with self._lock:
+            lineas += [
+                "# HELP tarjas_http_requests_total Requests atendidas por ruta, método y status.",
+                "# TYPE tarjas_http_requests_total counter",
+            ]
+            for (ruta, metodo, status), valor in sorted(self.requests.items()):
+                lineas.append(f'tarjas_http_requests_total{{{_etiquetas(ruta, metodo)},status="{status}"}} {valor}')
+
+            lineas += _exportar_histogramas(
+                "tarjas_http_request_duration_seconds", "Latencia de la request en segundos.", self.latencia)
+            lineas += _exportar_histogramas(
+                "tarjas_db_statements_per_request", "Consultas SQL ejecutadas por request.", self.consultas)
+
+            for nombre, ayuda, valores in (
+                ("tarjas_db_time_seconds_total", "Tiempo acumulado en consultas SQL.", self.db_segundos),
+                ("tarjas_db_statements_total", "Consultas SQL ejecutadas.", self.db_consultas),
+                ("tarjas_db_rows_fetched_total", "Filas leídas desde la base de datos.", self.db_filas),
+            ):
+                lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} counter"]
+                for (ruta, metodo), valor in sorted(valores.items()):
+                    lineas.append(f"{nombre}{{{_etiquetas(ruta, metodo)}}} {valor}")
+        return "\n".join(lineas) + "\n"
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(ruta, metodo):
+    return f'ruta="{_escapar(ruta)}",metodo="{_escapar(metodo)}"'
+
+
+def _exportar_histogramas(nombre, ayuda, histogramas):
+    lineas = [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} histogram"]
+    for (ruta, metodo), h in sorted(histogramas.items()):
+        etiquetas = _etiquetas(ruta, metodo)
+        acumulado = 0
+        for limite, conteo in zip(h.buckets, h.conteos):
+            acumulado += conteo
+            lineas.append(f'{nombre}_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+        lineas.append(f'{nombre}_bucket{{{etiquetas},le="+Inf"}} {h.total}')
+        lineas.append(f"{nombre}_sum{{{etiquetas}}} {h.suma}")
+        lineas.append(f"{nombre}_count{{{etiquetas}}} {h.total}")
+    return lineas
+
+
+registro = _Registro()
+
+
+def _medicion_actual():
+    if not has_app_context():
+        return None
+    return g.get('_metricas')
+
+
+def registrar_consulta(duracion):
+    """Llamado por la capa de BD tras cada execute()"""
+    medicion = _medicion_actual()
+    if medicion is not None:
+        medicion['consultas'] += 1
+        medicion['db_segundos'] += duracion
+
+
+def registrar_filas(cantidad):
+    """Llamado por la capa de BD tras cada fetch"""
+    medicion = _medicion_actual()
+    if medicion is not None:
+        medicion['filas'] += cantidad
+
+
+def _iniciar_medicion():
+    g._metricas = {'inicio': time.perf_counter(), 'consultas': 0, 'db_segundos': 0.0, 'filas': 0}
+
+
+def _cerrar_medicion(response):
+    medicion = g.pop('_metricas', None)
+    if medicion is None:
+        return response
+
+    duracion = time.perf_counter() - medicion['inicio']
+    # Ruta como plantilla (/api/vacaciones/<int:vacacion_id>) para no disparar la cardinalidad
+    ruta = request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+    registro.registrar(ruta, request.method, response.status_code, duracion, medicion)
+
+    response.headers['Server-Timing'] = (
+        f'app;dur={duracion * 1000:.1f}, '
+        f'db;dur={medicion["db_segundos"] * 1000:.1f};desc="{medicion["consultas"]} consultas, {medicion["filas"]} filas"'
+    )
+    return response
+
+
+def _medicion_sin_respuesta(exc):
+    """
+    Si la vista lanzó una excepción que se propaga (p. ej. con DEBUG), Flask no llama a
+    after_request y la medición sigue en g: se registra aquí como 500 para no perder ese error.
+    """
+    medicion = g.pop('_metricas', None)
+    if medicion is None:
+        return
+    duracion = time.perf_counter() - medicion['inicio']
+    ruta = request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+    registro.registrar(ruta, request.method, 500, duracion, medicion)
+
+
+def exponer_metricas():
+    # Si METRICS_TOKEN está definido, se exige en el header X-Metrics-Token
+    if Config.METRICS_TOKEN and request.headers.get('X-Metrics-Token') != Config.METRICS_TOKEN:
+        return Response("No autorizado\n", status=401, mimetype='text/plain')
+    return Response(registro.exportar(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    app.before_request(_iniciar_medicion)
+    app.after_request(_cerrar_medicion)
+    app.teardown_request(_medicion_sin_respuesta)
+    app.add_url_rule('/api/metrics', 'metrics', exponer_metricas, methods=['GET'])
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from utils.db import get_db_connection, get_free_pool_connection
+from utils.metrics import registrar_consulta, registrar_filas
+import time
+
+_pool = ThreadPoolExecutor(max_workers=Config.DB_PARALELO_HILOS, thread_name_prefix='consultas')
+
+
+def _ejecutar(conn, sql, params):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(sql, params or ())
+    filas = cursor.fetchall()
+    cursor.close()
+    return filas
+
+
+def _en_conexion_libre(sql, params):
+    """Corre la consulta en otra conexión del pool; None si no había una libre"""
+    conn = get_free_pool_connection()
+    if conn is None:
+        return None
+    try:
+        inicio = time.perf_counter()
+        filas = _ejecutar(conn, sql, params)
+        return filas, time.perf_counter() - inicio
+    finally:
+        conn.close()
+
+
+def consultar_en_paralelo(consultas):
+    """
+    Ejecuta consultas de lectura independientes {clave: (sql, params)} a la vez y devuelve
+    {clave: filas}. La primera corre en la conexión de la request y las demás en conexiones
+    libres del pool, así la latencia es la de la consulta más lenta y no la suma.
+    Si el pool no tiene conexiones libres, la consulta se hace después en la conexión de la
+    request: nunca se espera por el pool mientras se retiene una conexión.
+    Solo para SELECT: las otras conexiones no ven lo no confirmado de la request.
+    """
+    claves = list(consultas)
+    futuros = {clave: _pool.submit(_en_conexion_libre, *consultas[clave]) for clave in claves[1:]}
+
+    conn = get_db_connection()
+    datos = {}
+    if claves:
+        datos[claves[0]] = _ejecutar(conn, *consultas[claves[0]])
+
+    for clave, futuro in futuros.items():
+        resultado = futuro.result()
+        if resultado is None:
+            datos[clave] = _ejecutar(conn, *consultas[clave])
+        else:
+            # Los hilos no tienen contexto de request: sus métricas se registran aquí
+            datos[clave], duracion = resultado
+            registrar_consulta(duracion)
+            registrar_filas(len(datos[clave]))
+    conn.close()
+    return {clave: datos[clave] for clave in claves}
@@ -0,0 +1,124 @@
+from flask import g, jsonify, has_app_context
+from flask_jwt_extended import get_jwt_identity
+from functools import wraps
+from config import Config
+from utils.db import get_db_connection
+import threading
+import time
+
+# Perfil de administrador en general_dim_usuario.id_perfil
+PERFIL_ADMIN = 3
+# Permiso "Full" para gestionar usuarios (usuario_dim_permiso.id)
+ID_PERMISO_FULL = '6'
+
+# Caché en proceso de los permisos: usuario_id -> (versión, contexto, expira)
+_cache = {}
+# Versión vigente por usuario; se incrementa en cada invalidación
+_versiones = {}
+_lock = threading.Lock()
+
+
+class ContextoPermisos:
+    """Perfil y permisos de un usuario, cargados en una sola consulta"""
+
+    def __init__(self, id_perfil, filas):
+        self.id_perfil = id_perfil
+        # Ids asignados en el pivot (cualquier estado) y permisos activos por nombre
+        self.ids = {str(f['id']) for f in filas}
+        self.activos = sorted(
+            ({'id': f['id'], 'nombre': f['nombre'], 'id_app': f['id_app'], 'id_estado': f['id_estado']}
+             for f in filas if f['id_estado'] == 1),
+            key=lambda p: (p['nombre'] or '').lower()
+        )
+        # Sin distinguir mayúsculas, igual que la comparación por nombre en MySQL
+        self._por_nombre = {(p['nombre'] or '').lower(): p for p in self.activos}
+
+    def permiso(self, nombre):
+        """Fila del permiso activo con ese nombre, o None"""
+        return self._por_nombre.get((nombre or '').lower())
+
+    def tiene(self, nombre=None, id_permiso=None, perfil=None):
+        if nombre is not None and self.permiso(nombre) is None:
+            return False
+        if id_permiso is not None and str(id_permiso) not in self.ids:
+            return False
+        if perfil is not None and self.id_perfil != perfil:
+            return False
+        return True
+
+
+def _cargar(usuario_id):
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT u.id_perfil, p.id, p.nombre, p.id_app, p.id_estado
+        FROM general_dim_usuario u
+        LEFT JOIN usuario_pivot_permiso_usuario ppu ON ppu.id_usuario = u.id
+        LEFT JOIN usuario_dim_permiso p ON p.id = ppu.id_permiso
+        WHERE u.id = %s
+    """, (usuario_id,))
+    filas = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    if not filas:
+        return None
+    return ContextoPermisos(filas[0]['id_perfil'], [f for f in filas if f['id'] is not None])
+
+
+def obtener_permisos(usuario_id=None):
+    """
+    Devuelve el ContextoPermisos del usuario (o None si no existe). Se resuelve una sola vez
+    por request y se guarda en caché hasta que se invalide o expire el TTL.
+    """
+    if usuario_id is None:
+        usuario_id = get_jwt_identity()
+    usuario_id = str(usuario_id)
+
+    memo = g.setdefault('_permisos', {}) if has_app_context() else {}
+    if usuario_id in memo:
+        return memo[usuario_id]
+
+    ahora = time.monotonic()
+    with _lock:
+        version = _versiones.get(usuario_id, 0)
+        entrada = _cache.get(usuario_id)
+
+    if entrada and entrada[0] == version and entrada[2] > ahora:
+        contexto = entrada[1]
+    else:
+        contexto = _cargar(usuario_id)
+        with _lock:
+            # Si hubo una invalidación mientras consultábamos, no guardar el valor leído
+            if contexto is not None and _versiones.get(usuario_id, 0) == version:
+                _cache[usuario_id] = (version, contexto, ahora + Config.PERMISOS_CACHE_TTL)
+
+    memo[usuario_id] = contexto
+    return contexto
+
+
+def tiene_permiso(nombre=None, id_permiso=None, perfil=None, usuario_id=None):
+    """True si el usuario (por defecto el del JWT) cumple todas las condiciones indicadas"""
+    contexto = obtener_permisos(usuario_id)
+    return contexto is not None and contexto.tiene(nombre, id_permiso, perfil)
+
+
+def invalidar_permisos(usuario_id):
+    """Descarta los permisos en caché (llamar tras confirmar el cambio en BD)"""
+    usuario_id = str(usuario_id)
+    with _lock:
+        _versiones[usuario_id] = _versiones.get(usuario_id, 0) + 1
+        _cache.pop(usuario_id, None)
+    if has_app_context():
+        g.get('_permisos', {}).pop(usuario_id, None)
+
+
+def requiere_permiso(nombre=None, id_permiso=None, perfil=None, mensaje="No autorizado"):
+    """Decorador: responde 403 si el usuario del JWT no cumple el permiso/perfil indicado"""
+    def decorador(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not tiene_permiso(nombre, id_permiso, perfil):
+                return jsonify({"error": mensaje}), 403
+            return f(*args, **kwargs)
+        return wrapper
+    return decorador
@@ -0,0 +1,44 @@
+import uuid
+
+
+def sincronizar_pivot(cursor, tabla, columna, usuario_id, ids, generar_id=False):
+    """
+    Deja en una tabla usuario_pivot_* exactamente las filas (id_usuario, columna) de `ids`:
+    borra solo las que sobran (un DELETE ... IN) e inserta solo las que faltan (un executemany),
+    sin tocar las que ya estaban. Con generar_id=True cada fila nueva lleva un UUID en `id`.
+    Usa el cursor del llamador y no hace commit. Devuelve (agregados, quitados).
+    """
+    # Los ids pueden llegar como texto o número: se comparan como texto y se insertan tal cual
+    solicitados = {}
+    for valor in ids or []:
+        if valor not in (None, ''):
+            solicitados.setdefault(str(valor), valor)
+
+    # FOR UPDATE: dos cambios simultáneos del mismo usuario no calculan la diferencia sobre el mismo estado
+    cursor.execute(f"SELECT {columna} FROM {tabla} WHERE id_usuario = %s FOR UPDATE", (usuario_id,))
+    actuales = {
+        str(fila[columna] if isinstance(fila, dict) else fila[0]): (fila[columna] if isinstance(fila, dict) else fila[0])
+        for fila in cursor.fetchall()
+    }
+
+    quitar = [actuales[clave] for clave in actuales.keys() - solicitados.keys()]
+    agregar = [solicitados[clave] for clave in solicitados.keys() - actuales.keys()]
+
+    if quitar:
+        cursor.execute(
+            f"DELETE FROM {tabla} WHERE id_usuario = %s AND {columna} IN ({', '.join(['%s'] * len(quitar))})",
+            (usuario_id, *quitar)
+        )
+    if agregar:
+        # mysql.connector convierte el executemany de un INSERT en un solo INSERT multi-fila
+        if generar_id:
+            cursor.executemany(
+                f"INSERT INTO {tabla} (id, id_usuario, {columna}) VALUES (%s, %s, %s)",
+                [(str(uuid.uuid4()), usuario_id, valor) for valor in agregar]
+            )
+        else:
+            cursor.executemany(
+                f"INSERT INTO {tabla} (id_usuario, {columna}) VALUES (%s, %s)",
+                [(usuario_id, valor) for valor in agregar]
+            )
+    return len(agregar), len(quitar)
@@ -0,0 +1,55 @@
+from flask.json.provider import DefaultJSONProvider
+from datetime import time, timedelta
+
+# orjson es opcional: si no está instalado se usa el json estándar de Flask
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(o):
+    """
+    Tipos que entrega mysql.connector y que el json de Flask no serializa por sí solo.
+    Las fechas siguen el formato por defecto de Flask (RFC 822) para no alterar las respuestas existentes.
+    """
+    if isinstance(o, timedelta):
+        # Columnas TIME: mismo texto que str(timedelta), p. ej. "8:30:00"
+        return str(o)
+    if isinstance(o, time):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+if orjson is not None:
+    # Fechas pasan por _default para conservar el formato de Flask; claves ordenadas como sort_keys=True
+    _OPCIONES_ORJSON = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+
+class ProveedorJSON(DefaultJSONProvider):
+    """Proveedor JSON de la app: orjson cuando está disponible y soporte para timedelta/time"""
+
+    default = staticmethod(_default)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=_OPCIONES_ORJSON).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=_OPCIONES_ORJSON) + b"\n",
+            mimetype=self.mimetype
+        )
+
+
+def init_app(app):
+    app.json = ProveedorJSON(app)
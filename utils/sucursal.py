@@ -0,0 +1,73 @@
+from flask import g, jsonify, has_app_context
+from flask_jwt_extended import get_jwt_identity
+from functools import wraps
+from config import Config
+from utils.db import get_db_connection
+import threading
+import time
+
+# Caché en proceso de la sucursal activa: usuario_id -> (versión, id_sucursal, expira)
+_cache = {}
+# Versión vigente por usuario; se incrementa en cada invalidación
+_versiones = {}
+_lock = threading.Lock()
+
+
+def obtener_sucursal_activa(usuario_id=None):
+    """
+    Devuelve el id_sucursalactiva del usuario (o None). Se resuelve una sola vez
+    por request y se guarda en caché hasta que se invalide o expire el TTL.
+    """
+    if usuario_id is None:
+        usuario_id = get_jwt_identity()
+    usuario_id = str(usuario_id)
+
+    memo = g.setdefault('_sucursales_activas', {}) if has_app_context() else {}
+    if usuario_id in memo:
+        return memo[usuario_id]
+
+    ahora = time.monotonic()
+    with _lock:
+        version = _versiones.get(usuario_id, 0)
+        entrada = _cache.get(usuario_id)
+
+    if entrada and entrada[0] == version and entrada[2] > ahora:
+        id_sucursal = entrada[1]
+    else:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT id_sucursalactiva FROM general_dim_usuario WHERE id = %s", (usuario_id,))
+        usuario = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        id_sucursal = usuario['id_sucursalactiva'] if usuario else None
+
+        with _lock:
+            # Si hubo una invalidación mientras consultábamos, no guardar el valor leído
+            if id_sucursal is not None and _versiones.get(usuario_id, 0) == version:
+                _cache[usuario_id] = (version, id_sucursal, ahora + Config.SUCURSAL_CACHE_TTL)
+
+    memo[usuario_id] = id_sucursal
+    return id_sucursal
+
+
+def invalidar_sucursal_activa(usuario_id):
+    """Descarta la sucursal activa en caché (llamar tras confirmar el cambio en BD)"""
+    usuario_id = str(usuario_id)
+    with _lock:
+        _versiones[usuario_id] = _versiones.get(usuario_id, 0) + 1
+        _cache.pop(usuario_id, None)
+    if has_app_context():
+        g.get('_sucursales_activas', {}).pop(usuario_id, None)
+
+
+def requiere_sucursal_activa(f):
+    """Decorador: resuelve la sucursal activa del usuario del JWT y la deja en g.id_sucursal"""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        id_sucursal = obtener_sucursal_activa()
+        if not id_sucursal:
+            return jsonify({"error": "No se encontró la sucursal activa del usuario"}), 400
+        g.id_sucursal = id_sucursal
+        return f(*args, **kwargs)
+    return wrapper